@@ -1,4 +1,3 @@
-from apps.tree_viewer import FONT_SIZE
 import dash
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
@@ -7,6 +6,8 @@ import dash_html_components as html
 from apps import navbar
 from app import app
 
+FONT_SIZE = '20px'
+
 nav = navbar.Navbar()
 
 body = dbc.Container(
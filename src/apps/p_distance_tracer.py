@@ -16,19 +16,19 @@ import pandas as pd
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 
 # from flask_caching import Cache
 
 import plotly
 import plotly.graph_objects as go
-import plotly.express as px
 from plotly.subplots import make_subplots
 
 
 from app import app
-from apps import homepage, navbar
+from apps import navbar
 from apps.utils import p_dist_utils, graph_options, data_utils
 
 navbar = navbar.Navbar("p-Distance Tracer")
@@ -43,17 +43,20 @@ def get_max_range(file_path):
     return read_csv['Stop'].max()
 
 
+def xaxis_name(row):
+    """Return the layout x-axis name of a subplot row"""
+    return 'xaxis' if row == 1 else f'xaxis{row}'
+
+
 
 ############################### Data Collection ###############################
 # AVAILABLE_PROJECTS = [Path(name) for name in glob.glob("./src/data/p_distance_data/*")]
-PROJECT_NAMES = [{'label': f.stem, 'value': f.as_posix()} for f in Path("src/data/p_distance_data/").iterdir() if f.stem[0] != '.']
-INPUT_DF_PATH = PROJECT_NAMES[0]['value']
-INPUT_FILE_PATHS = [f for f in Path(INPUT_DF_PATH).iterdir() if f.stem[0] != '.']
-INPUT_FILE_OPTIONS = [{'label': t.stem, 'value': t.name} for t in INPUT_FILE_PATHS]
-INIT_PROJECT_NAME = PROJECT_NAMES[0]['value']
-INIT_DATA_FILE = INPUT_FILE_PATHS[0]
-INIT_INPUT_DF = data_utils.build_file_dataframe(INIT_DATA_FILE)
-COLUMNS = INIT_INPUT_DF.columns.to_list()
+# Projects are discovered on page visit
+P_DISTANCE_DATA_DIR = Path("src/data/p_distance_data/")
+
+
+def get_project_names():
+    return [{'label': f.stem, 'value': f.as_posix()} for f in data_utils.list_project_dirs(P_DISTANCE_DATA_DIR)]
 
 
 GRAPH_TEMPLATES = graph_options.graph_templates()
@@ -64,481 +67,490 @@ SCALE_OPTIONS = graph_options.figure_output_scales()
 FONT_SIZE = '15px'
 ############################################ BODY #############################################
 
-body = dbc.Container(
-    id='container',
-    children=[
-        dcc.Store(id='reference-name-store'),
-        # Control Panel
-        dbc.Row(
-            children=[
-                dbc.Col(
-                    id='control-panel',
-                    children=[
-                        dbc.Tabs(
-                            id="control-tabs",
-                            children=[
-                                # Data
-                                dbc.Tab(
-                                    label='Data',
-                                    label_style={
-                                        'color': 'white',
-                                        'border': '2px orange solid',
-                                        'border-radius': '5px',
-                                    },
-                                    style={'margin-left': '10px', 'margin-right': '10px'},
-                                    children=[
-                                        dbc.Row(
-                                            children=[
-                                                # Project ID
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=['Project ID:'], 
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id='project-options',
-                                                            options=PROJECT_NAMES,
-                                                            value=INIT_PROJECT_NAME,
-                                                            style={
-                                                                "color": "black",
-                                                                # "width": "75%",
-                                                            },
-                                                            persistence=True,
-                                                            persistence_type='session'
-                                                        ),
-                                                    ],
-                                                    style={
-                                                        'margin': '5px',
-                                                    },
-                                                ),
-                                                # Data file
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=['Data File:'], 
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id='pdist_file_options',                                                
-                                                            style={
-                                                                "color": "black",
-                                                                # "width": "75%",
-                                                            },
-                                                            persistence=True,
-                                                            persistence_type='session'
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                ),
-                                                # Chromosome View
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=['Chromosome View:'],
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id='chromosome-quantity',
-                                                            options=[
-                                                                {'label': 'Single Chromosome',
-                                                                    'value': 'single-chrom'},
-                                                                {'label': 'All Chromosomes',
-                                                                    'value': 'all-chroms'},
-                                                            ],
-                                                            value='single-chrom',
-                                                            style={
-                                                                "color": "black",
-                                                            },
-                                                            persistence=True,
-                                                            persistence_type='session'
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'}, 
-                                                ),
-                                                # Chromosome Choice
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            id='chromosome-choice-div',
-                                                            children=[
-                                                                # Drop down to show chromosome viewing choices
-                                                                html.Div(
-                                                                    children=[
-                                                                        'Chromosome Choice(s):'],
-                                                                    className='title',
-                                                                ),
-                                                                dcc.Dropdown(
-                                                                    id='chromosome-options',
-                                                                    style={"color": "black"},
-                                                                    persistence=True,
-                                                                    persistence_type='session'
-                                                                ),
-                                                            ],
-                                                            style={'display': 'none'}
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                ),
-                                                # # Sample Selection
-                                                # dbc.Col(
-                                                #     id='sample-selection-div',
-                                                #     children=[
-                                                #         html.Div(
-                                                #             children=[
-                                                #                 'Sample Choice(s):'],
-                                                #             className='title',
-                                                #         ),
-                                                #         dcc.Dropdown(
-                                                #             id='sample-options',
-                                                #             style={'color': 'black'},
-                                                #             multi=True,
-                                                #         ),                                                                                                                                                                 
-                                                #     ],
-                                                # ),
-                                            ],
-                                            style={'background': 'orange', 'border-radius': '5px', 'margin-bottom': '10px'},
-                                            no_gutters=True,
-                                        ),
-                                    ],
-                                ),
-                                # Graph Toggles
-                                dbc.Tab(
-                                    label="Graph Toggles",
-                                    label_style={
-                                        'border': '2px orange solid',
-                                        'border-radius': '5px',
-                                    },
-                                    style={'margin-left': '10px', 'margin-right': '10px'},
-                                    children=[
-                                        dbc.Row(
-                                            children=[
-                                                dbc.Col(
-                                                    # id="single_chrom_collapse_div",
-                                                    children=[
-                                                        html.Div(
-                                                            children=['Collapsed Sample View:'],
-                                                            className='title',
-                                                        ),
-                                                        html.Div(
-                                                            dbc.Checklist(
-                                                                id="collapse-single-chrom",
+def serve_layout():
+    """
+    Build the page layout on visit, so no project data is read at import time.
+    """
+    project_names = get_project_names()
+    init_project_name = project_names[0]['value'] if project_names else None
+    body = dbc.Container(
+        id='container',
+        children=[
+            dcc.Store(id='reference-name-store'),
+            # Used by the clientside restyle callback
+            dcc.Store(id='graph-template-store', data=graph_options.template_layouts()),
+            dcc.Store(id='color-swatch-store', data=COLOR_SWATCHES),
+            # Control Panel
+            dbc.Row(
+                children=[
+                    dbc.Col(
+                        id='control-panel',
+                        children=[
+                            dbc.Tabs(
+                                id="control-tabs",
+                                children=[
+                                    # Data
+                                    dbc.Tab(
+                                        label='Data',
+                                        label_style={
+                                            'color': 'white',
+                                            'border': '2px orange solid',
+                                            'border-radius': '5px',
+                                        },
+                                        style={'margin-left': '10px', 'margin-right': '10px'},
+                                        children=[
+                                            dbc.Row(
+                                                children=[
+                                                    # Project ID
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=['Project ID:'], 
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id='project-options',
+                                                                options=project_names,
+                                                                value=init_project_name,
+                                                                style={
+                                                                    "color": "black",
+                                                                    # "width": "75%",
+                                                                },
+                                                                persistence=True,
+                                                                persistence_type='session'
+                                                            ),
+                                                        ],
+                                                        style={
+                                                            'margin': '5px',
+                                                        },
+                                                    ),
+                                                    # Data file
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=['Data File:'], 
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id='pdist_file_options',                                                
+                                                                style={
+                                                                    "color": "black",
+                                                                    # "width": "75%",
+                                                                },
+                                                                persistence=True,
+                                                                persistence_type='session'
+                                                            ),
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                    ),
+                                                    # Chromosome View
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=['Chromosome View:'],
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id='chromosome-quantity',
                                                                 options=[
-                                                                    {"label": "On", "value": "collapse_view"},
+                                                                    {'label': 'Single Chromosome',
+                                                                        'value': 'single-chrom'},
+                                                                    {'label': 'All Chromosomes',
+                                                                        'value': 'all-chroms'},
                                                                 ],
-                                                                value=["collapse_view"],
-                                                                switch=True,
-                                                                style={'color': 'black', 'margin': '5px'},
+                                                                value='single-chrom',
+                                                                style={
+                                                                    "color": "black",
+                                                                },
+                                                                persistence=True,
+                                                                persistence_type='session'
                                                             ),
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                    width=2,
-                                                ), 
-                                                # Sample Selection
-                                                dbc.Col(
-                                                    id='sample-selection-div',
-                                                    children=[
-                                                        html.Div(
-                                                            children=[
-                                                                'Sample Choice(s):'],
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id='sample-options',
-                                                            style={'color': 'black'},
-                                                            multi=True,
-                                                        ),                                                                                                                                                                 
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                    width=5,
-                                                ),
-                                            ],
-                                            style={'background': 'orange', 'border-radius': '5px', 'margin-bottom': '10px'},
-                                            no_gutters=True,
-                                        ),
-                                    ],
-                                ),
-                                # Graph Options
-                                dbc.Tab(
-                                    label="Graph Optons",
-                                    label_style={
-                                        'border': '2px orange solid',
-                                        'border-radius': '5px',
-                                    },
-                                    style={'margin-left': '10px', 'margin-right': '10px'},
-                                    children=[
-                                        dbc.Row(
-                                            children=[
-                                                # Graph Theme
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=[
-                                                                'Graph Color Theme:'],
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id="template-option",
-                                                            options=[{'label': i, 'value': i}
-                                                                    for i in GRAPH_TEMPLATES],
-                                                            value="plotly_dark",
-                                                            persistence=True,
-                                                            persistence_type='session',
-                                                            style={
-                                                                "color": "black"
-                                                            }
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                ),
-                                                # Line Colors
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=[
-                                                                'Line Colors (Discrete):'],
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id="line-color-option",
-                                                            options=[{'label': "{} - {} colors".format(i, len(COLOR_SWATCHES[i])), 'value': i}
-                                                                    for i in COLOR_SWATCHES],
-                                                            value="Plotly",
-                                                            persistence=True,
-                                                            persistence_type='session',
-                                                            style={
-                                                                "color": "black"
-                                                            }
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                ),
-                                                # Snapshot fileType
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=['Snapshot File Type:'],
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id="snapshot-file-option",
-                                                            options=[{'label': i, 'value': i}
-                                                                    for i in SNAPSHOT_FILE_OPTIONS],
-                                                            value="jpeg",
-                                                            persistence=True,
-                                                            persistence_type='session',
-                                                            style={
-                                                                "color": "black"
-                                                            }
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                ),
-                                                # Snapshot Pixel Dimensions
-                                                # NOTE: Update this to have two input boxes
-                                                # ['length'] x ['width']
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=['Snapshot Pixel Size:'],
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id="snapshot-pixel-size",
-                                                            options=[{'label': i, 'value': i}
-                                                                    for i in OUTPUT_PIXEL_SIZES],
-                                                            persistence=True,
-                                                            persistence_type='session',
-                                                            value="1250x800",
-                                                            style={
-                                                                "color": "black"
-                                                            }
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                ),
-                                                # Snapshot Scale
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=['Snapshot Output Scale:'],
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id="snapshot-scale",
-                                                            options=[{'label': i, 'value': i}
-                                                                    for i in SCALE_OPTIONS],
-                                                            value=1,
-                                                            persistence=True,
-                                                            persistence_type='session',
-                                                            style={
-                                                                "color": "black"
-                                                            }
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                ),
-                                            ],
-                                            style={'background': 'orange', 'border-radius': '5px 5px 0px 0px'},
-                                            no_gutters=True,
-                                        ),
-                                        dbc.Row(
+                                                        ],
+                                                        style={'margin': '5px'}, 
+                                                    ),
+                                                    # Chromosome Choice
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                id='chromosome-choice-div',
+                                                                children=[
+                                                                    # Drop down to show chromosome viewing choices
+                                                                    html.Div(
+                                                                        children=[
+                                                                            'Chromosome Choice(s):'],
+                                                                        className='title',
+                                                                    ),
+                                                                    dcc.Dropdown(
+                                                                        id='chromosome-options',
+                                                                        style={"color": "black"},
+                                                                        persistence=True,
+                                                                        persistence_type='session'
+                                                                    ),
+                                                                ],
+                                                                style={'display': 'none'}
+                                                            ),
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                    ),
+                                                    # # Sample Selection
+                                                    # dbc.Col(
+                                                    #     id='sample-selection-div',
+                                                    #     children=[
+                                                    #         html.Div(
+                                                    #             children=[
+                                                    #                 'Sample Choice(s):'],
+                                                    #             className='title',
+                                                    #         ),
+                                                    #         dcc.Dropdown(
+                                                    #             id='sample-options',
+                                                    #             style={'color': 'black'},
+                                                    #             multi=True,
+                                                    #         ),                                                                                                                                                                 
+                                                    #     ],
+                                                    # ),
+                                                ],
+                                                style={'background': 'orange', 'border-radius': '5px', 'margin-bottom': '10px'},
+                                                no_gutters=True,
+                                            ),
+                                        ],
+                                    ),
+                                    # Graph Toggles
+                                    dbc.Tab(
+                                        label="Graph Toggles",
+                                        label_style={
+                                            'border': '2px orange solid',
+                                            'border-radius': '5px',
+                                        },
+                                        style={'margin-left': '10px', 'margin-right': '10px'},
+                                        children=[
+                                            dbc.Row(
+                                                children=[
+                                                    dbc.Col(
+                                                        # id="single_chrom_collapse_div",
+                                                        children=[
+                                                            html.Div(
+                                                                children=['Collapsed Sample View:'],
+                                                                className='title',
+                                                            ),
+                                                            html.Div(
+                                                                dbc.Checklist(
+                                                                    id="collapse-single-chrom",
+                                                                    options=[
+                                                                        {"label": "On", "value": "collapse_view"},
+                                                                    ],
+                                                                    value=["collapse_view"],
+                                                                    switch=True,
+                                                                    style={'color': 'black', 'margin': '5px'},
+                                                                ),
+                                                            ),
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                        width=2,
+                                                    ), 
+                                                    # Sample Selection
+                                                    dbc.Col(
+                                                        id='sample-selection-div',
+                                                        children=[
+                                                            html.Div(
+                                                                children=[
+                                                                    'Sample Choice(s):'],
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id='sample-options',
+                                                                style={'color': 'black'},
+                                                                multi=True,
+                                                            ),                                                                                                                                                                 
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                        width=5,
+                                                    ),
+                                                ],
+                                                style={'background': 'orange', 'border-radius': '5px', 'margin-bottom': '10px'},
+                                                no_gutters=True,
+                                            ),
+                                        ],
+                                    ),
+                                    # Graph Options
+                                    dbc.Tab(
+                                        label="Graph Optons",
+                                        label_style={
+                                            'border': '2px orange solid',
+                                            'border-radius': '5px',
+                                        },
+                                        style={'margin-left': '10px', 'margin-right': '10px'},
+                                        children=[
+                                            dbc.Row(
+                                                children=[
+                                                    # Graph Theme
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=[
+                                                                    'Graph Color Theme:'],
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id="template-option",
+                                                                options=[{'label': i, 'value': i}
+                                                                        for i in GRAPH_TEMPLATES],
+                                                                value="plotly_dark",
+                                                                persistence=True,
+                                                                persistence_type='session',
+                                                                style={
+                                                                    "color": "black"
+                                                                }
+                                                            ),
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                    ),
+                                                    # Line Colors
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=[
+                                                                    'Line Colors (Discrete):'],
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id="line-color-option",
+                                                                options=[{'label': "{} - {} colors".format(i, len(COLOR_SWATCHES[i])), 'value': i}
+                                                                        for i in COLOR_SWATCHES],
+                                                                value="Plotly",
+                                                                persistence=True,
+                                                                persistence_type='session',
+                                                                style={
+                                                                    "color": "black"
+                                                                }
+                                                            ),
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                    ),
+                                                    # Snapshot fileType
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=['Snapshot File Type:'],
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id="snapshot-file-option",
+                                                                options=[{'label': i, 'value': i}
+                                                                        for i in SNAPSHOT_FILE_OPTIONS],
+                                                                value="jpeg",
+                                                                persistence=True,
+                                                                persistence_type='session',
+                                                                style={
+                                                                    "color": "black"
+                                                                }
+                                                            ),
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                    ),
+                                                    # Snapshot Pixel Dimensions
+                                                    # NOTE: Update this to have two input boxes
+                                                    # ['length'] x ['width']
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=['Snapshot Pixel Size:'],
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id="snapshot-pixel-size",
+                                                                options=[{'label': i, 'value': i}
+                                                                        for i in OUTPUT_PIXEL_SIZES],
+                                                                persistence=True,
+                                                                persistence_type='session',
+                                                                value="1250x800",
+                                                                style={
+                                                                    "color": "black"
+                                                                }
+                                                            ),
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                    ),
+                                                    # Snapshot Scale
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=['Snapshot Output Scale:'],
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id="snapshot-scale",
+                                                                options=[{'label': i, 'value': i}
+                                                                        for i in SCALE_OPTIONS],
+                                                                value=1,
+                                                                persistence=True,
+                                                                persistence_type='session',
+                                                                style={
+                                                                    "color": "black"
+                                                                }
+                                                            ),
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                    ),
+                                                ],
+                                                style={'background': 'orange', 'border-radius': '5px 5px 0px 0px'},
+                                                no_gutters=True,
+                                            ),
+                                            dbc.Row(
+                                                children=[
+                                                    # Line Width
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=['Line Width:'],
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id='line_width_options',
+                                                                options=graph_options.line_width_options(),
+                                                                value=graph_options.line_width_options()[0]['value'],
+                                                                style={
+                                                                    "color": "black",
+                                                                    # "width": "75%",
+                                                                },
+                                                                persistence=True,
+                                                                persistence_type='session'
+                                                            ),
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                    ),
+                                                    # Font Size
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=['Graph Font Size:'],
+                                                                className='title',
+                                                            ),
+                                                            dcc.Dropdown(
+                                                                id='font_size_options',
+                                                                options=graph_options.font_size_options(),
+                                                                value=15,
+                                                                style={'color': 'black'},
+                                                                persistence=True,
+                                                                persistence_type='session'
+                                                            ),
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                    ),
+                                                    dbc.Col(
+                                                        children=[
+                                                            html.Div(
+                                                                children=['Number of Columns:'],
+                                                                className='title',
+                                                            ),
+                                                            # dcc.Dropdown(
+                                                            #     id='font_size_options',
+                                                            #     options=graph_options.font_size_options(),
+                                                            #     value=15,
+                                                            #     style={'color': 'black'},
+                                                            #     persistence=True,
+                                                            #     persistence_type='session'
+                                                            # ),
+                                                            dcc.RadioItems(
+                                                                id='facet_col_num',
+                                                                options=[
+                                                                    {'label': '1', 'value': 1},
+                                                                    {'label': '2', 'value': 2},
+                                                                ],
+                                                                value=1,
+                                                            )
+                                                        ],
+                                                        style={'margin': '5px'},
+                                                    ),
+                                                ],
+                                                style={'background': 'orange', 'border-radius': '0px 0px 5px 5px', 'margin-bottom': '10px'},
+                                                no_gutters=True,
+                                            ),
+                                        ],
+                                    ),
+                                    # Help
+                                    dbc.Tab(
+                                        label="Help",
+                                        label_style={
+                                            'border': '2px orange solid',
+                                            'border-radius': '5px',
+                                        },
+                                        style={'margin-left': '10px', 'margin-right': '10px'},
+                                        children=[dbc.Row(
                                             children=[
-                                                # Line Width
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=['Line Width:'],
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id='line_width_options',
-                                                            options=graph_options.line_width_options(),
-                                                            value=graph_options.line_width_options()[0]['value'],
-                                                            style={
-                                                                "color": "black",
-                                                                # "width": "75%",
-                                                            },
-                                                            persistence=True,
-                                                            persistence_type='session'
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                ),
-                                                # Font Size
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=['Graph Font Size:'],
-                                                            className='title',
-                                                        ),
-                                                        dcc.Dropdown(
-                                                            id='font_size_options',
-                                                            options=graph_options.font_size_options(),
-                                                            value=15,
-                                                            style={'color': 'black'},
-                                                            persistence=True,
-                                                            persistence_type='session'
-                                                        ),
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                ),
-                                                dbc.Col(
-                                                    children=[
-                                                        html.Div(
-                                                            children=['Number of Columns:'],
-                                                            className='title',
-                                                        ),
-                                                        # dcc.Dropdown(
-                                                        #     id='font_size_options',
-                                                        #     options=graph_options.font_size_options(),
-                                                        #     value=15,
-                                                        #     style={'color': 'black'},
-                                                        #     persistence=True,
-                                                        #     persistence_type='session'
-                                                        # ),
-                                                        dcc.RadioItems(
-                                                            id='facet_col_num',
-                                                            options=[
-                                                                {'label': '1', 'value': 1},
-                                                                {'label': '2', 'value': 2},
-                                                            ],
-                                                            value=1,
-                                                        )
-                                                    ],
-                                                    style={'margin': '5px'},
-                                                ),
+                                                dbc.Col(),
                                             ],
-                                            style={'background': 'orange', 'border-radius': '0px 0px 5px 5px', 'margin-bottom': '10px'},
-                                            no_gutters=True,
-                                        ),
-                                    ],
-                                ),
-                                # Help
-                                dbc.Tab(
-                                    label="Help",
-                                    label_style={
-                                        'border': '2px orange solid',
-                                        'border-radius': '5px',
-                                    },
-                                    style={'margin-left': '10px', 'margin-right': '10px'},
-                                    children=[dbc.Row(
+                                        )],
+                                    ),
+                                ],
+                                style={'margin': '10px'}
+                            ),
+                        ],
+                        width=12,
+                    ),
+                ],
+                style={
+                    'border': '2px orange solid',
+                    'border-radius': '5px',
+                    'padding-left': '5px',
+                    'padding-right': '5px',
+                    'margin-top': '5px',
+                    'margin-bottom': '5px',
+                },
+                no_gutters=True,
+            ),
+            # Graph
+            dbc.Row(
+                id='body',
+                children=[
+                    # Graphs
+                    dbc.Col(
+                        id='graph-column',
+                        children=[
+                            dcc.Loading(
+                                id="loading-1",
+                                children=[html.Div([
+                                    html.Div(
+                                        id='graphs',
                                         children=[
-                                            dbc.Col(),
+                                            dcc.Graph(
+                                                figure=go.Figure(layout=dict(template='plotly_dark')),
+                                                loading_state={"is_loading": True},                                    
+                                            )
                                         ],
-                                    )],
-                                ),
-                            ],
-                            style={'margin': '10px'}
-                        ),
-                    ],
-                    width=12,
-                ),
-            ],
-            style={
-                'border': '2px orange solid',
-                'border-radius': '5px',
-                'padding-left': '5px',
-                'padding-right': '5px',
-                'margin-top': '5px',
-                'margin-bottom': '5px',
-            },
-            no_gutters=True,
-        ),
-        # Graph
-        dbc.Row(
-            id='body',
-            children=[
-                # Graphs
-                dbc.Col(
-                    id='graph-column',
-                    children=[
-                        dcc.Loading(
-                            id="loading-1",
-                            children=[html.Div([
-                                html.Div(
-                                    id='graphs',
-                                    children=[
-                                        dcc.Graph(
-                                            figure=(px.bar(template='plotly_dark')),
-                                            loading_state={"is_loading": True},                                    
-                                        )
-                                    ],
-                                    loading_state={'is_loading':True},                            
-                                ),
-                            ])],
-                            type="cube",
-                        ),
-                    ],
-                    width=12,
-                    align="stretch",
-                    style={
-                        "border": "2px orange solid",
-                        "border-radius": "5px",
-                        "background": "primary",
-                    }
-                ),
-            ],
-            style={"margin-top": "10px"},
-            no_gutters=True
-        ),
-    ],
-    style={
-        'height': '100vh',
-        # 'margin-right': 0,
-        # 'margin-left': 0,
-        # 'max_width': 50000,
-    },
-    fluid=True,
-)
+                                        loading_state={'is_loading':True},                            
+                                    ),
+                                ])],
+                                type="cube",
+                            ),
+                        ],
+                        width=12,
+                        align="stretch",
+                        style={
+                            "border": "2px orange solid",
+                            "border-radius": "5px",
+                            "background": "primary",
+                        }
+                    ),
+                ],
+                style={"margin-top": "10px"},
+                no_gutters=True
+            ),
+        ],
+        style={
+            'height': '100vh',
+            # 'margin-right': 0,
+            # 'margin-left': 0,
+            # 'max_width': 50000,
+        },
+        fluid=True,
+    )
 
-layout = html.Div(
-    children=[
-        navbar,
-        body
-    ]
-)
+    return html.Div(
+        children=[
+            navbar,
+            body
+        ]
+    )
 
 # -----------------------------------------------------------------------------------------------
 ################################# Set display options ################################
@@ -588,14 +600,7 @@ def set_chromosome_choice(chrom_quantity, current_file, current_project):
         return [dict(label='All chromosomes selected', value='All chromosomes selected')]
     else:
         options = []
-        read_file = pd.read_csv(
-            current_file,
-            sep=',',
-            engine='python',
-            usecols=["Chromosome"],
-        )
-
-        for chrom in read_file['Chromosome'].unique():
+        for chrom in p_dist_utils.get_pdistance_chromosomes(current_file):
             options.append(
                 dict(label=chrom, value=chrom)
             )
@@ -610,17 +615,9 @@ def set_chromosome_choice(chrom_quantity, current_file, current_project):
      Input('project-options', 'value')]
 )
 def set_sample_choice(chrom_quantity, current_file, current_project):
-    read_csv = pd.read_csv(current_file, sep=',')
-    ref_sample_name = ""
     # Find Reference Sample and remove from dataset -------------------------------------------------
-    for sample in read_csv.columns[2:]:
-        if read_csv[sample].unique()[0] == 0:
-            read_csv.drop(columns=[sample], inplace=True)
-            ref_sample_name = str(sample)
-            break
-        else:
-            continue
-    sample_names = [name for name in read_csv.columns[3:]]
+    ref_sample_name = p_dist_utils.find_reference_sample(current_file)
+    sample_names = [name for name in p_dist_utils.get_pdistance_samples(current_file) if name != ref_sample_name]
     sample_names.sort()  # Sort names alphabetically
     return [{'label': i, 'value': i} for i in sample_names], ref_sample_name
 
@@ -698,34 +695,49 @@ def toggle_accordion(data_options_n, graph_options_n, data_options_is_open, grap
     [Input(component_id="sample-options", component_property='value'),
      Input(component_id='chromosome-options', component_property='value'),
      Input(component_id='pdist_file_options', component_property='value'),
-     Input(component_id='template-option', component_property='value'),
      Input(component_id='reference-name-store', component_property='data'),
      Input(component_id='project-options', component_property='value'),
-     Input(component_id="snapshot-file-option", component_property="value"),
-     Input(component_id="line_width_options", component_property="value"),
-     Input(component_id="line-color-option", component_property='value'),
      Input(component_id="collapse-single-chrom", component_property="value"),
-     Input(component_id="snapshot-pixel-size", component_property="value"),
-     Input(component_id="snapshot-scale", component_property="value"),
-     Input(component_id="font_size_options", component_property="value"),
-     Input(component_id="facet_col_num", component_property="value"),]
+     Input(component_id="facet_col_num", component_property="value"),
+     Input(component_id="subplot", component_property="relayoutData"),],
+    # Style only options are applied in the browser by restyle_pdistance
+    [State(component_id='template-option', component_property='value'),
+     State(component_id="snapshot-file-option", component_property="value"),
+     State(component_id="line_width_options", component_property="value"),
+     State(component_id="line-color-option", component_property='value'),
+     State(component_id="snapshot-pixel-size", component_property="value"),
+     State(component_id="snapshot-scale", component_property="value"),
+     State(component_id="font_size_options", component_property="value"),]
 )
 def update_main_graph(
     chosen_samples, 
     chromosome, 
     current_file, 
-    chosen_template,
     reference_name,
     current_project,
+    collapse_single_chrom,
+    facet_col_num,
+    subplot_relayout,
+    chosen_template,
     snapshot_file_value,
     line_width,
     line_color,
-    collapse_single_chrom,
     snapshot_pixel_size,
     snapshot_scale,
     font_size,
-    facet_col_num,
 ):
+    # Zooming re-fetches traces at a finer resolution for the new x-range, other -----------------------
+    # relayout events (e.g. autosize when the graph is first drawn) are ignored
+    x_ranges = dict()
+    ctx = dash.callback_context
+    if ctx.triggered and ctx.triggered[0]['prop_id'] == 'subplot.relayoutData':
+        x_ranges = data_utils.get_relayout_xranges(subplot_relayout)
+        if (not x_ranges) and (not data_utils.is_relayout_autorange(subplot_relayout)):
+            raise PreventUpdate
+        # Single chromosome rows share one x-axis range, take it from whichever axis was zoomed
+        if x_ranges and (chromosome != 'All chromosomes selected'):
+            x_ranges = {xaxis_name(1): next(iter(x_ranges.values()))}
+
     # if single sample given, this will put it into a list. ------------------------------------------
     if type(chosen_samples) != list:
         chosen_samples = [chosen_samples]
@@ -735,25 +747,31 @@ def update_main_graph(
     if len(chosen_samples) == 0:
         return None
 
-    # Load in data and clean data --------------------------------------------------------------------
-    read_csv = pd.read_csv(current_file, dtype={'Start': np.int32, "Stop": np.int32})
-    read_csv = read_csv.melt(id_vars=["Chromosome", "Start", "Stop"])
-    read_csv.columns = ["Chromosome", "Start", "Stop", "Sample", "p_distance"]
-    read_csv.sort_values(by=["Chromosome", "Start", "Stop"], inplace=True)
-
-    # Clean out unwanted samples
-    read_csv = read_csv[read_csv["Sample"] != reference_name]
+    # Revisited views are served from the figure cache with only their style re-applied ---------------
+    colors = COLOR_SWATCHES[line_color]
+    graph_config = p_dist_utils.make_graph_config(snapshot_file_value, snapshot_pixel_size, snapshot_scale)
+    figure_key = p_dist_utils.PDIST_FIGURES.figure_key(
+        current_file, chromosome, chosen_samples, reference_name, collapse_single_chrom, x_ranges)
+    graphs = p_dist_utils.PDIST_FIGURES.get(
+        figure_key, chosen_template, font_size, line_width, colors, graph_config)
+    if graphs is not None:
+        return graphs
 
-    # Get sample and chromosome data ----------------------------------------------------------------
-    chromosomes = [i for i in read_csv['Chromosome'].unique()]
-    samples = [i for i in read_csv['Sample'].unique()]
+    # Get sample data, the reference sample is left out ------------------------------------------------
+    samples = [i for i in p_dist_utils.get_pdistance_samples(current_file) if i != reference_name]
     samples.sort(reverse=True)
 
-    # Get overall max p_distance value to set y-axis ranges for all plots ---------------------------
-    y_max = float(read_csv["p_distance"].max() * 1.1)  # increase 10% above max
-    x_max = read_csv["Stop"].max() * 1.01  # increase 10% above max
+    # Get chromosome data, in sorted order -----------------------------------------------------------
+    maxima = p_dist_utils.read_pdistance_maxima(current_file)
+    if chromosome == 'All chromosomes selected':
+        chromosomes = sorted(maxima.index)
+    else:
+        chromosomes = [chromosome]
+        maxima = maxima.loc[chromosomes]
 
-    colors = COLOR_SWATCHES[line_color]
+    # Get max p_distance value over all samples to set y-axis ranges for all plots ---------------------
+    y_max = float(maxima[samples].to_numpy().max() * 1.1)  # increase 10% above max
+    x_max = maxima["Stop"].max() * 1.01  # increase 10% above max
 
     base_graph_height = 150
 
@@ -770,17 +788,23 @@ def update_main_graph(
             vertical_spacing=0.01,
             row_heights=[base_graph_height] * len(chromosomes),
         )
+        # Traces are reused from the trace cache, only new ones are read and downsampled
+        trace_points = p_dist_utils.PDIST_TRACES.get_points(
+            current_file,
+            chromosomes,
+            samples,
+            x_ranges={c: x_ranges.get(xaxis_name(row)) for row, c in enumerate(chromosomes, start=1)},
+            max_points=p_dist_utils.MAX_SUBPLOT_TRACE_POINTS,
+        )
         for placeholder, sample in enumerate(samples):
             legend_flag = True
             for row, current_chromosome in enumerate(chromosomes, start=1):
-                filt = (read_csv['Chromosome'] == current_chromosome) & (
-                    read_csv["Sample"] == sample)
-                sample_chromosome_data = read_csv[filt]
+                x_data, y_data = trace_points[(current_chromosome, sample)]
                 # Make figure
                 fig.add_trace(
                     go.Scatter(
-                        x=sample_chromosome_data['Stop'],
-                        y=sample_chromosome_data['p_distance'],
+                        x=x_data,
+                        y=y_data,
                         mode='lines',
                         legendgroup=str(sample),
                         name=sample,
@@ -832,24 +856,17 @@ def update_main_graph(
             range=[0.0, y_max],
             fixedrange=True,
         )
+        # Keep zoomed rows at their zoomed range
+        for row in range(1, len(chromosomes) + 1):
+            if xaxis_name(row) in x_ranges:
+                fig.update_xaxes(range=x_ranges[xaxis_name(row)], row=row, col=1)
         # fig.update_xaxes(range=[0, x_max])
         graphs.append(
             html.Div(
                 dcc.Graph(
                     id='subplot',
                     figure=fig,
-                    config=dict(
-                        # dragmode='zoom',
-                        responsive=True,
-                        displayModeBar=True,
-                        toImageButtonOptions=dict(
-                            format=snapshot_file_value,
-                            filename="Graph_Name",
-                            height=int(snapshot_pixel_size.split("x")[0]),
-                            width=int(snapshot_pixel_size.split("x")[1]),
-                            scale=snapshot_scale,
-                        ),                
-                    ),
+                    config=graph_config,
                     style={
                         "height": "{}px".format(base_graph_height*len(chromosomes)),
                         "border": "2px black solid",
@@ -859,9 +876,23 @@ def update_main_graph(
                 ),
             ),
         )
-        return graphs
+        # Swatch color index of each sample
+        color_order = samples
     # --- Single Chromosome Graph ---
     else:
+        # The expanded view only draws the chosen samples, adding or removing one only
+        # reads and downsamples the samples not in the trace cache
+        drawn_samples = samples if collapse_single_chrom else [i for i in chosen_samples if i in samples]
+        trace_points = p_dist_utils.PDIST_TRACES.get_points(
+            current_file,
+            chromosomes,
+            drawn_samples,
+            x_ranges={chromosome: x_ranges.get(xaxis_name(1))},
+        )
+        trace_points = {sample: points for (_, sample), points in trace_points.items()}
+        # Samples missing from the file (e.g. left over from the previous file) are drawn empty
+        for sample in chosen_samples:
+            trace_points.setdefault(sample, (np.empty(0, dtype=np.int32), np.empty(0)))
         if collapse_single_chrom == []:
             graphs = p_dist_utils.single_chrom_expanded(
                 chosen_samples,
@@ -876,12 +907,14 @@ def update_main_graph(
                 colors,
                 base_graph_height,
                 samples,
-                read_csv,
+                trace_points,
                 snapshot_pixel_size,
                 snapshot_scale,
                 font_size,
+                x_range=x_ranges.get(xaxis_name(1)),
+                y_max=y_max,
             )
-            return graphs
+            color_order = [None] + chosen_samples
         else:
             assert len(collapse_single_chrom) >= 1
             graphs = p_dist_utils.single_chrom_condensed(
@@ -897,11 +930,37 @@ def update_main_graph(
                     colors,
                     base_graph_height,
                     samples,
-                    read_csv,
+                    trace_points,
                     snapshot_pixel_size,
                     snapshot_scale,
                     font_size,
+                    x_range=x_ranges.get(xaxis_name(1)),
+                    y_max=y_max,
             )
-            return graphs
+            color_order = [None] + samples
+    p_dist_utils.PDIST_FIGURES.put(figure_key, graphs, color_order)
+    # Served through the cache so each trace carries its swatch color index
+    return p_dist_utils.PDIST_FIGURES.get(
+        figure_key, chosen_template, font_size, line_width, colors, graph_config)
+
+
+# Restyle the current graph in the browser ----------------------------------------------------------
+app.clientside_callback(
+    ClientsideFunction(namespace='graph_style', function_name='restyle_pdistance'),
+    [Output(component_id='subplot', component_property='figure'),
+     Output(component_id='subplot', component_property='config')],
+    [Input(component_id='template-option', component_property='value'),
+     Input(component_id="snapshot-file-option", component_property="value"),
+     Input(component_id="line_width_options", component_property="value"),
+     Input(component_id="line-color-option", component_property='value'),
+     Input(component_id="snapshot-pixel-size", component_property="value"),
+     Input(component_id="snapshot-scale", component_property="value"),
+     Input(component_id="font_size_options", component_property="value"),],
+    [State(component_id='subplot', component_property='figure'),
+     State(component_id='subplot', component_property='config'),
+     State(component_id='graph-template-store', component_property='data'),
+     State(component_id='color-swatch-store', component_property='data'),],
+    prevent_initial_call=True,
+)
 
 
@@ -1,48 +1,30 @@
 from pathlib import Path
-from io import StringIO
 
-from Bio import Phylo
-from ete3.coretype.tree import TreeError
 import dash
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ALL, ClientsideFunction, Input, Output, State
 from dash.exceptions import PreventUpdate
 import dash_table as dt
 import numpy as np
 import pandas as pd
-import plotly.express as px
+import plotly
 
 # from flask_caching import Cache
 
 from apps import navbar
 from app import app
-from apps.utils import tree_utils, data_utils, graph_options
+from apps.utils import tree_utils, data_utils, dataset_utils, graph_options, rf_utils
 
 # from tree_utils import DrawTree
 
-# --- Initial directory collection ---
+# --- Project directory, projects are discovered on page visit ---
 TREE_DATA_DIR = Path('src/data/tree_viewer_data/')
 
-# collect project names in tree_viewer_data
-PROJECT_NAMES = [{'label': f.stem, 'value': f.stem} for f in TREE_DATA_DIR.iterdir() if f.stem[0] != '.']
-# PROJECT_NAMES = [{'label': i, 'value': i} for i in DATA_DROPDOWN_OPTIONS]
-
-INPUT_DF_PATH = TREE_DATA_DIR / PROJECT_NAMES[0]['value'] / 'topology_files'
-INPUT_FILE_PATHS = [f for f in INPUT_DF_PATH.iterdir()]
-INPUT_FILE_OPTIONS = [{'label': t.stem, 'value': t.name} for t in INPUT_FILE_PATHS]
-# First project data
-INIT_PROJECT_NAME = PROJECT_NAMES[0]['value']
-INIT_DATA_FILE = INPUT_FILE_PATHS[0]
-INIT_INPUT_DF = data_utils.build_file_dataframe(INIT_DATA_FILE)
-COLUMNS = INIT_INPUT_DF.columns.to_list()
-INIT_CHROMS = [{'label': c, 'value': c} for c in INIT_INPUT_DF[COLUMNS[0]].unique()]
-INIT_TOPS = [{'label': t, 'value': t} for t in INIT_INPUT_DF[COLUMNS[3]].unique()]
-
 # --- Graph options ---
 GRAPH_TEMPLATES = graph_options.graph_templates()
-COLOR_OPTIONS = [c for c in px.colors.named_colorscales()]
+COLOR_OPTIONS = [c for c in plotly.colors.named_colorscales()]
 COLOR_SWATCHES = graph_options.color_swatches()
 OUTPUT_PIXEL_SIZES = graph_options.pixel_sizes()
 SCALE_OPTIONS = graph_options.figure_output_scales()
@@ -62,433 +44,503 @@ def write_windowsize_file(window_size, window_size_filepath):
 
 
 # ------------------------------- Body Structure ----------------------------------
-body = dbc.Container(
-    id='tree-viewer-container',
-    children=[
-        # Data storage
-        dcc.Store(id='current-file-memory', storage_type='memory'),
-        # dcc.Store(id='input-file-memory'),
-        dcc.Store(id='chromosome-length-memory-color-chart'),
-        dcc.Store(id='topology-color-chart'),
-        dcc.Store(id='window-size'),
-
-        # Modals
-        dbc.Modal(
-            [
-                dbc.ModalHeader("Window Size Required"),
-                dbc.ModalBody(
-                    children=[
-                        dcc.Input(placeholder="Window Size", id='windSize-input'),
-                        html.P("Provide Window Size as integer.")
-                    ],
-                ),
-                dbc.ModalFooter(
-                    dbc.Button("Submit", id="winsize-submit-button", className="ml-auto")
-                ),
-            ],
-            id="winSize-modal",
-            size="xl",
-        ),
-        dbc.Modal(
-            [
-                dbc.ModalHeader("New Project"),
-                dbc.ModalBody(
-                    children=[
-                        dbc.Label("Password", html_for="example-password"),
-                        dbc.Input(
-                            type="password",
-                            id="example-password",
-                            placeholder="Enter password",
-                        ),
-                        dbc.FormText(
-                            "A password stops mean people taking your stuff", color="secondary"
-                        ),
-                    ],
-                ),
-                dbc.ModalFooter(
-                    dbc.Button("Submit", id="new-project-submit-button", className="ml-auto")
-                ),
-            ],
-            id="new-project-modal",
-            size="xl",
-        ),
+def get_project_names():
+    return [{'label': f.stem, 'value': f.stem} for f in data_utils.list_project_dirs(TREE_DATA_DIR)]
 
-        # Input File DataFrame
-        html.Div(id="input_df", className='hidden-div'),
 
-        # Control Panel
-        dbc.Row(
-            id='control_panel',
-            children=[
-                dbc.Col(
-                    dbc.Tabs(
-                        id='control-tabs',
+nav = navbar.Navbar('Tree Viewer')
+
+
+def serve_layout():
+    """
+    Build the page layout on visit, so no project data is read at import time.
+    """
+    project_names = get_project_names()
+    init_project_name = project_names[0]['value'] if project_names else None
+    body = dbc.Container(
+        id='tree-viewer-container',
+        children=[
+            # Data storage
+            dcc.Store(id='current-file-memory', storage_type='memory'),
+            # dcc.Store(id='input-file-memory'),
+            dcc.Store(id='chromosome-length-memory-color-chart'),
+            dcc.Store(id='topology-color-chart'),
+            dcc.Store(id='window-size'),
+            # Used by the clientside restyle callbacks
+            dcc.Store(id='graph-template-store', data=graph_options.template_layouts()),
+
+            # Modals
+            dbc.Modal(
+                [
+                    dbc.ModalHeader("Window Size Required"),
+                    dbc.ModalBody(
                         children=[
-                            # Data Options
-                            dbc.Tab(
-                                children=[
-                                    # Data options
-                                    dbc.Row(
-                                        children=[
-                                            dbc.Col(
-                                                children=[
-                                                    dbc.Button(
-                                                        id='new-project',
-                                                        children=["New Project",]
-
-                                                    )
-                                                ],
-                                                style={'margin': '5px'},
-                                                width=0.5,
-                                            ),
-                                            # Project ID
-                                            dbc.Col(
-                                                children=[
-                                                    html.Div(
-                                                        children=['Project ID:'], 
-                                                        style={'color': 'black', 'font-size': FONT_SIZE}
-                                                    ),
-                                                    dcc.Dropdown(
-                                                        id='project-id',
-                                                        options=PROJECT_NAMES,
-                                                        value=INIT_PROJECT_NAME,
-                                                        style={'color': 'black'},
-                                                    ),
-                                                ],
-                                                style={'margin': '5px'},
-                                            ),
-                                            # Data file
-                                            dbc.Col(
-                                                children=[
-                                                    html.Div(
-                                                        children=['Data File:'], 
-                                                        style={'color': 'black', 'font-size': FONT_SIZE}
-                                                    ),
-                                                    dcc.Dropdown(
-                                                        id='data_file',
-                                                        style={'color': 'black'},
-                                                    ),
-                                                ],
-                                                style={'margin': '5px'},
-                                            ),
-                                            # Chromosomes
-                                            dbc.Col(
-                                                children=[
-                                                    html.Div(
-                                                        children=['Chromosome:'], 
-                                                        style={'color': 'black', 'font-size': FONT_SIZE}
-                                                    ),
-                                                    dcc.Dropdown(
-                                                        id='chromosome_options',
-                                                        style={'color': 'black'},
-                                                    ),
-                                                ],
-                                                style={'margin': '5px'},
-                                            ),
-                                            # Topologies
-                                            dbc.Col(
-                                                children=[
-                                                    html.Div(
-                                                        children=['Topology:'], 
-                                                        style={'color': 'black', 'font-size': FONT_SIZE}
-                                                    ),
-                                                    dcc.Dropdown(
-                                                        id='topology_options',
-                                                        style={'color': 'black'},
-                                                        multi=True,
-                                                    ),
-                                                ],
-                                                style={'margin': '5px'},
-                                            ),
-                                            # Alt. Data
-                                            dbc.Col(
-                                                children=[
-                                                    html.Div(
-                                                        children=['Additional Data:'], 
-                                                        style={'color': 'black', 'font-size': FONT_SIZE}
-                                                    ),
-                                                    dcc.Dropdown(
-                                                        id='alt_data',
-                                                        style={'color': 'black'},
-                                                        multi=True,
-                                                    ),
-                                                ],
-                                                style={'margin': '5px'},
-                                            ),
-                                        ],
-                                        style={'background': 'orange', 'border-radius': '5px', 'margin-bottom': '10px'},
-                                        no_gutters=True,
-                                    ),
-                                ],
-                                label='Data',
-                                label_style={
-                                    'color': 'white',
-                                    'border': '2px orange solid',
-                                    'border-radius': '5px',
-                                },
-                                style={'margin-left': '10px', 'margin-right': '10px'},
+                            dcc.Input(placeholder="Window Size", id='windSize-input'),
+                            html.P("Provide Window Size as integer.")
+                        ],
+                    ),
+                    dbc.ModalFooter(
+                        dbc.Button("Submit", id="winsize-submit-button", className="ml-auto")
+                    ),
+                ],
+                id="winSize-modal",
+                size="xl",
+            ),
+            dbc.Modal(
+                [
+                    dbc.ModalHeader("New Project"),
+                    dbc.ModalBody(
+                        children=[
+                            dbc.Label("Password", html_for="example-password"),
+                            dbc.Input(
+                                type="password",
+                                id="example-password",
+                                placeholder="Enter password",
+                            ),
+                            dbc.FormText(
+                                "A password stops mean people taking your stuff", color="secondary"
                             ),
-                            dbc.Tab(
+                        ],
+                    ),
+                    dbc.ModalFooter(
+                        dbc.Button("Submit", id="new-project-submit-button", className="ml-auto")
+                    ),
+                ],
+                id="new-project-modal",
+                size="xl",
+            ),
+
+            # Input File DataFrame
+            html.Div(id="input_df", className='hidden-div'),
+
+            # Control Panel
+            dbc.Row(
+                id='control_panel',
+                children=[
+                    dbc.Col(
+                        dbc.Tabs(
+                            id='control-tabs',
+                            children=[
+                                # Data Options
+                                dbc.Tab(
+                                    children=[
+                                        # Data options
+                                        dbc.Row(
+                                            children=[
+                                                dbc.Col(
+                                                    children=[
+                                                        dbc.Button(
+                                                            id='new-project',
+                                                            children=["New Project",]
+
+                                                        )
+                                                    ],
+                                                    style={'margin': '5px'},
+                                                    width=0.5,
+                                                ),
+                                                # Project ID
+                                                dbc.Col(
+                                                    children=[
+                                                        html.Div(
+                                                            children=['Project ID:'], 
+                                                            style={'color': 'black', 'font-size': FONT_SIZE}
+                                                        ),
+                                                        dcc.Dropdown(
+                                                            id='project-id',
+                                                            options=project_names,
+                                                            value=init_project_name,
+                                                            style={'color': 'black'},
+                                                        ),
+                                                    ],
+                                                    style={'margin': '5px'},
+                                                ),
+                                                # Data file
+                                                dbc.Col(
+                                                    children=[
+                                                        html.Div(
+                                                            children=['Data File:'], 
+                                                            style={'color': 'black', 'font-size': FONT_SIZE}
+                                                        ),
+                                                        dcc.Dropdown(
+                                                            id='data_file',
+                                                            style={'color': 'black'},
+                                                        ),
+                                                    ],
+                                                    style={'margin': '5px'},
+                                                ),
+                                                # Chromosomes
+                                                dbc.Col(
+                                                    children=[
+                                                        html.Div(
+                                                            children=['Chromosome:'], 
+                                                            style={'color': 'black', 'font-size': FONT_SIZE}
+                                                        ),
+                                                        dcc.Dropdown(
+                                                            id='chromosome_options',
+                                                            style={'color': 'black'},
+                                                        ),
+                                                    ],
+                                                    style={'margin': '5px'},
+                                                ),
+                                                # Topologies
+                                                dbc.Col(
+                                                    children=[
+                                                        html.Div(
+                                                            children=['Topology:'], 
+                                                            style={'color': 'black', 'font-size': FONT_SIZE}
+                                                        ),
+                                                        dcc.Dropdown(
+                                                            id='topology_options',
+                                                            style={'color': 'black'},
+                                                            multi=True,
+                                                        ),
+                                                    ],
+                                                    style={'margin': '5px'},
+                                                ),
+                                                # Alt. Data
+                                                dbc.Col(
+                                                    children=[
+                                                        html.Div(
+                                                            children=['Additional Data:'], 
+                                                            style={'color': 'black', 'font-size': FONT_SIZE}
+                                                        ),
+                                                        dcc.Dropdown(
+                                                            id='alt_data',
+                                                            style={'color': 'black'},
+                                                            multi=True,
+                                                        ),
+                                                    ],
+                                                    style={'margin': '5px'},
+                                                ),
+                                            ],
+                                            style={'background': 'orange', 'border-radius': '5px', 'margin-bottom': '10px'},
+                                            no_gutters=True,
+                                        ),
+                                    ],
+                                    label='Data',
+                                    label_style={
+                                        'color': 'white',
+                                        'border': '2px orange solid',
+                                        'border-radius': '5px',
+                                    },
+                                    style={'margin-left': '10px', 'margin-right': '10px'},
+                                ),
+                                dbc.Tab(
+                                    children=[
+                                        # Graph Toggle Switches
+                                        dbc.Row(
+                                            children=[
+                                                dbc.FormGroup(
+                                                    [
+                                                        html.Div('Main Graphs:', style={'color': 'black', 'font-size': FONT_SIZE}),
+                                                        dbc.Checklist(
+                                                            id='graph-switches',
+                                                            options=[
+                                                                {'label': 'Topology Distribution', 'value': 'topo_g'},
+                                                                {'label': 'Additional Data', 'value': 'alt_d'},
+                                                                {'label': 'Trees', 'value': 'tree_g'}
+                                                            ],
+                                                            value=['topo_g'],
+                                                            switch=True,
+                                                            style={'color': 'black', 'display': 'inline'},
+                                                            inline=True,
+                                                        ),
+                                                    ],
+                                                    inline=True,
+                                                )
+                                            ],
+                                            style={
+                                                'background': 'orange', 
+                                                'padding': '5px',
+                                            },
+                                            no_gutters=True,
+                                        ),
+                                        dbc.Row(
+                                            children=[
+                                                dbc.FormGroup(
+                                                    [
+                                                        html.Div('Topology Distribution Additional Features:', style={'color': 'black', 'font-size': FONT_SIZE}),
+                                                        dbc.Checklist(
+                                                            id='graph_secondary_options',
+                                                            options=[
+                                                                {'label': 'Rug Plot Only', 'value': 'topo_gc',},
+                                                                {'label': 'Normalized RF-distance', 'value': 'rf_dist',},
+                                                                {'label': 'Topology Frequencies', 'value': 'topo_freq',},
+                                                                {'label': 'Topology Proportions', 'value': 'topo_prop',},
+                                                            ],
+                                                            value=[],
+                                                            switch=True,
+                                                            style={'color': 'black', 'display': 'inline'},
+                                                            inline=True,
+                                                        ),
+                                                    ],
+                                                    inline=True,
+                                                )
+                                            ],
+                                            style={
+                                                'background': 'orange',
+                                                'margin-bottom': '10px',
+                                                'padding-left': '5px',
+                                                'border-radius': '0px 0px 5px 5px',
+                                            },
+                                            no_gutters=True,
+                                        ),
+                                    ],
+                                    label='Graph Toggles',
+                                    label_style={
+                                        'color': 'white',
+                                        'border': '2px orange solid',
+                                        'border-radius': '5px',
+                                    },
+                                    style={'margin-left': '10px', 'margin-right': '10px'},
+                                ),
+                                # Graph Options
+                                dbc.Tab(
+                                    children=[
+                                        dbc.Row(
+                                            children=[
+                                                dbc.Col(
+                                                    children=[
+                                                        html.H6(
+                                                            children=[
+                                                                'Graph Color Theme:'],
+                                                            style={
+                                                                'color': 'black',
+                                                                'font-size': FONT_SIZE
+                                                            }
+                                                        ),
+                                                        dcc.Dropdown(
+                                                            id='template-option',
+                                                            options=[{'label': i, 'value': i}
+                                                                        for i in GRAPH_TEMPLATES],
+                                                            value='plotly_dark',
+                                                            style={
+                                                                'color': 'black'
+                                                            }
+                                                        ),
+                                                    ],
+                                                    style={
+                                                        'margin': '5px',
+                                                    },
+                                                ),
+                                                # -----------
+                                                dbc.Col(
+                                                    children=[
+                                                        html.H6(
+                                                            children=[
+                                                                'Tree Style:'],
+                                                            style={
+                                                                'color': 'black',
+                                                                'font-size': FONT_SIZE
+                                                            }
+                                                        ),
+                                                        dcc.Dropdown(
+                                                            id='tree-shape-option',
+                                                            options=[
+                                                                {'label': 'Rectangular', 'value': 'box'},
+                                                                {'label': 'Angular', 'value': 'angular'},
+                                                                        ],
+                                                            value='box',
+                                                            style={
+                                                                'color': 'black'
+                                                            }
+                                                        ),
+                                                    ],
+                                                    style={
+                                                        'margin': '5px',
+                                                    },
+                                                ),
+                                                # --- Tree Colors ---
+                                                dbc.Col(
+                                                    children=[
+                                                        html.H6(
+                                                            children=[
+                                                                'Tree Colors:'],
+                                                            style={
+                                                                'color': 'black',
+                                                                'font-size': FONT_SIZE
+                                                            }
+                                                        ),
+                                                        dcc.Dropdown(
+                                                            id='tree-color-option',
+                                                            options=[
+                                                                {'label': 'Single Color', 'value': 'single'},
+                                                                {'label': 'Color By Clade', 'value': 'clade'},
+                                                                        ],
+                                                            value='single',
+                                                            style={
+                                                                'color': 'black'
+                                                            }
+                                                        ),
+                                                    ],
+                                                    style={
+                                                        'margin': '5px',
+                                                    },
+                                                ),
+                                                # --- Topology Proportion Band ---
+                                                dbc.Col(
+                                                    children=[
+                                                        html.H6(
+                                                            children=[
+                                                                'Proportion Band (windows):'],
+                                                            style={
+                                                                'color': 'black',
+                                                                'font-size': FONT_SIZE
+                                                            }
+                                                        ),
+                                                        dcc.Input(
+                                                            id='topo-prop-band',
+                                                            type='number',
+                                                            value=tree_utils.DEFAULT_PROPORTION_BAND,
+                                                            min=1,
+                                                            step=1,
+                                                            debounce=True,
+                                                            style={
+                                                                'color': 'black',
+                                                                'width': '100%',
+                                                            }
+                                                        ),
+                                                    ],
+                                                    style={
+                                                        'margin': '5px',
+                                                    },
+                                                ),
+                                                # --- Line Colors ---
+                                                dbc.Col(
+                                                    children=[
+                                                        html.H6(
+                                                            children=[
+                                                                'Line Colors:'],
+                                                            style={
+                                                                'color': 'black',
+                                                                'font-size': FONT_SIZE
+                                                            }
+                                                        ),
+                                                        dcc.Dropdown(
+                                                            id='line_color',
+                                                            options=[{'label': f'{i} - {len(COLOR_SWATCHES[i])} colors', 'value': i} for i in COLOR_SWATCHES],
+                                                            value='Plotly',
+                                                            style={
+                                                                'color': 'black'
+                                                            }
+                                                        ),
+                                                    ],
+                                                    style={
+                                                        'margin': '5px',
+                                                    },
+                                                ),
+                                                # -----------
+                                                dbc.Col(
+                                                    children=[
+                                                        html.H6(
+                                                            children=[
+                                                                'Snapshot File Type:'],
+                                                            style={
+                                                                'color': 'black',
+                                                                'font-size': FONT_SIZE
+                                                            }
+                                                        ),
+                                                        dcc.Dropdown(
+                                                            id='snapshot-file-option',
+                                                            options=[{'label': i, 'value': i}
+                                                                        for i in SNAPSHOT_FILE_OPTIONS],
+                                                            value='jpeg',
+                                                            style={
+                                                                'color': 'black'
+                                                            }
+                                                        ),
+                                                    ],
+                                                    style={
+                                                        'margin': '5px',
+                                                    },
+                                                ),
+                                            ],
+                                            style={'background': 'orange', 'margin-bottom': '5px', 'border-radius': '5px'},
+                                            no_gutters=True,
+                                        ),
+                                    ],
+                                    label='Graph Options',
+                                    label_style={
+                                        'border': '2px orange solid',
+                                        'border-radius': '5px',
+                                    },
+                                    style={'margin-left': '10px', 'margin-right': '10px'},
+                                ),
+                            ],
+                            style={'margin': '10px'}
+                        ),
+                    ),
+                ],
+                className='control-panel',
+                no_gutters=True,
+            ),
+            # Graphs
+            dbc.Row(
+                id='graph_row',
+                children=[
+                    # --- Main Topology Graph + RF Graph ---
+                    dbc.Col(
+                        children=[
+                            html.Div(
+                                id='topology_graph_div',
                                 children=[
-                                    # Graph Toggle Switches
-                                    dbc.Row(
-                                        children=[
-                                            dbc.FormGroup(
-                                                [
-                                                    html.Div('Main Graphs:', style={'color': 'black', 'font-size': FONT_SIZE}),
-                                                    dbc.Checklist(
-                                                        id='graph-switches',
-                                                        options=[
-                                                            {'label': 'Topology Distribution', 'value': 'topo_g'},
-                                                            {'label': 'Additional Data', 'value': 'alt_d'},
-                                                            {'label': 'Trees', 'value': 'tree_g'}
-                                                        ],
-                                                        value=['topo_g'],
-                                                        switch=True,
-                                                        style={'color': 'black', 'display': 'inline'},
-                                                        inline=True,
-                                                    ),
-                                                ],
-                                                inline=True,
-                                            )
-                                        ],
+                                    dcc.Graph(
+                                        id='topology_graph',
+                                        figure=tree_utils.init_data_graph('plotly_dark'),
                                         style={
-                                            'background': 'orange', 
-                                            'padding': '5px',
+                                            'height': '30vh',
+                                            'margin-right': '50wv',
+                                            'margin-left': '50wv',
+                                            'margin-top': '50wv',
                                         },
-                                        no_gutters=True,
-                                    ),
-                                    dbc.Row(
-                                        children=[
-                                            dbc.FormGroup(
-                                                [
-                                                    html.Div('Topology Distribution Additional Features:', style={'color': 'black', 'font-size': FONT_SIZE}),
-                                                    dbc.Checklist(
-                                                        id='graph_secondary_options',
-                                                        options=[
-                                                            {'label': 'Rug Plot Only', 'value': 'topo_gc',},
-                                                            {'label': 'Normalized RF-distance', 'value': 'rf_dist',},
-                                                            {'label': 'Topology Frequencies', 'value': 'topo_freq',},
-                                                        ],
-                                                        value=[],
-                                                        switch=True,
-                                                        style={'color': 'black', 'display': 'inline'},
-                                                        inline=True,
-                                                    ),
-                                                ],
-                                                inline=True,
-                                            )
-                                        ],
-                                        style={
-                                            'background': 'orange',
-                                            'margin-bottom': '10px',
-                                            'padding-left': '5px',
-                                            'border-radius': '0px 0px 5px 5px',
+                                        loading_state={
+                                            'is_loading': True
                                         },
-                                        no_gutters=True,
-                                    ),
-                                ],
-                                label='Graph Toggles',
-                                label_style={
-                                    'color': 'white',
-                                    'border': '2px orange solid',
-                                    'border-radius': '5px',
-                                },
-                                style={'margin-left': '10px', 'margin-right': '10px'},
-                            ),
-                            # Graph Options
-                            dbc.Tab(
-                                children=[
-                                    dbc.Row(
-                                        children=[
-                                            dbc.Col(
-                                                children=[
-                                                    html.H6(
-                                                        children=[
-                                                            'Graph Color Theme:'],
-                                                        style={
-                                                            'color': 'black',
-                                                            'font-size': FONT_SIZE
-                                                        }
-                                                    ),
-                                                    dcc.Dropdown(
-                                                        id='template-option',
-                                                        options=[{'label': i, 'value': i}
-                                                                    for i in GRAPH_TEMPLATES],
-                                                        value='plotly_dark',
-                                                        style={
-                                                            'color': 'black'
-                                                        }
-                                                    ),
-                                                ],
-                                                style={
-                                                    'margin': '5px',
-                                                },
-                                            ),
-                                            # -----------
-                                            dbc.Col(
-                                                children=[
-                                                    html.H6(
-                                                        children=[
-                                                            'Tree Style:'],
-                                                        style={
-                                                            'color': 'black',
-                                                            'font-size': FONT_SIZE
-                                                        }
-                                                    ),
-                                                    dcc.Dropdown(
-                                                        id='tree-shape-option',
-                                                        options=[
-                                                            {'label': 'Rectangular', 'value': 'box'},
-                                                            {'label': 'Angular', 'value': 'angular'},
-                                                                    ],
-                                                        value='box',
-                                                        style={
-                                                            'color': 'black'
-                                                        }
-                                                    ),
-                                                ],
-                                                style={
-                                                    'margin': '5px',
-                                                },
-                                            ),
-                                            # --- Line Colors ---
-                                            dbc.Col(
-                                                children=[
-                                                    html.H6(
-                                                        children=[
-                                                            'Line Colors:'],
-                                                        style={
-                                                            'color': 'black',
-                                                            'font-size': FONT_SIZE
-                                                        }
-                                                    ),
-                                                    dcc.Dropdown(
-                                                        id='line_color',
-                                                        options=[{'label': f'{i} - {len(COLOR_SWATCHES[i])} colors', 'value': i} for i in COLOR_SWATCHES],
-                                                        value='Plotly',
-                                                        style={
-                                                            'color': 'black'
-                                                        }
-                                                    ),
-                                                ],
-                                                style={
-                                                    'margin': '5px',
-                                                },
-                                            ),
-                                            # -----------
-                                            dbc.Col(
-                                                children=[
-                                                    html.H6(
-                                                        children=[
-                                                            'Snapshot File Type:'],
-                                                        style={
-                                                            'color': 'black',
-                                                            'font-size': FONT_SIZE
-                                                        }
-                                                    ),
-                                                    dcc.Dropdown(
-                                                        id='snapshot-file-option',
-                                                        options=[{'label': i, 'value': i}
-                                                                    for i in SNAPSHOT_FILE_OPTIONS],
-                                                        value='jpeg',
-                                                        style={
-                                                            'color': 'black'
-                                                        }
-                                                    ),
-                                                ],
-                                                style={
-                                                    'margin': '5px',
-                                                },
-                                            ),
-                                        ],
-                                        style={'background': 'orange', 'margin-bottom': '5px', 'border-radius': '5px'},
-                                        no_gutters=True,
-                                    ),
+                                        config=dict(responsive=False, displayModeBar=False),
+                                    )
                                 ],
-                                label='Graph Options',
-                                label_style={
-                                    'border': '2px orange solid',
-                                    'border-radius': '5px',
-                                },
-                                style={'margin-left': '10px', 'margin-right': '10px'},
                             ),
+                            html.Div(id='rfdist_div'),
+                            html.Div(id='topoFreq_div'),
+                            html.Div(id='topoProp_div'),
                         ],
-                        style={'margin': '10px'}
+                        width=12,
                     ),
-                ),
-            ],
-            className='control-panel',
-            no_gutters=True,
-        ),
-        # Graphs
-        dbc.Row(
-            id='graph_row',
-            children=[
-                # --- Main Topology Graph + RF Graph ---
-                dbc.Col(
-                    children=[
+                    # --- Alt. Data Graph ---
+                    dbc.Col(
                         html.Div(
-                            id='topology_graph_div',
-                            children=[
-                                dcc.Graph(
-                                    id='topology_graph',
-                                    figure=tree_utils.init_data_graph('plotly_dark'),
-                                    style={
-                                        'height': '30vh',
-                                        'margin-right': '50wv',
-                                        'margin-left': '50wv',
-                                        'margin-top': '50wv',
-                                    },
-                                    loading_state={
-                                        'is_loading': True
-                                    },
-                                    config=dict(responsive=False, displayModeBar=False),
-                                )
-                            ],
+                            id='alt_data_div',
+                            style={
+                                'height': '20vh',
+                                'display': 'none',
+                                # 'margin-bottom': '5px'
+                                # 'padding-left': '10px',
+                                # 'padding-right': '10px',
+                                # 'margin': '10px',
+                            },
                         ),
-                        html.Div(id='rfdist_div'),
-                        html.Div(id='topoFreq_div'),
-                    ],
-                    width=12,
-                ),
-                # --- Alt. Data Graph ---
-                dbc.Col(
-                    html.Div(
-                        id='alt_data_div',
-                        style={
-                            'height': '20vh',
-                            'display': 'none',
-                            # 'margin-bottom': '5px'
-                            # 'padding-left': '10px',
-                            # 'padding-right': '10px',
-                            # 'margin': '10px',
-                        },
+                        width=12,
                     ),
-                    width=12,
-                ),
-                # --- Trees ---
-                dbc.Col(
-                    html.Div(
-                        id='tree_div',
-                        children=[],
-                        style={
-                            # 'padding': '5px',
-                        },
+                    # --- Trees ---
+                    dbc.Col(
+                        html.Div(
+                            id='tree_div',
+                            children=[],
+                            style={
+                                # 'padding': '5px',
+                            },
+                        ),
+                        width=12,
                     ),
-                    width=12,
-                ),
-            ],
-            className='div-boxes',
-            no_gutters=True,
-        ),
-    ],
-    className='container-div',
-    fluid=True,
-)
-
-nav = navbar.Navbar('Tree Viewer')
-layout = html.Div([nav, body])
+                ],
+                className='div-boxes',
+                no_gutters=True,
+            ),
+        ],
+        className='container-div',
+        fluid=True,
+    )
+    return html.Div([nav, body])
 
 ##################################### Callbacks #####################################
 # ----------------------- All graph display and style controls -----------------------
@@ -497,7 +549,8 @@ layout = html.Div([nav, body])
     Output(component_id='alt_data_div', component_property='style'),
     Output(component_id='tree_div', component_property='style'),
     Output(component_id='rfdist_div', component_property='style'),
-    Output(component_id='topoFreq_div', component_property='style'),],
+    Output(component_id='topoFreq_div', component_property='style'),
+    Output(component_id='topoProp_div', component_property='style'),],
     [Input(component_id='graph-switches', component_property='value'),
     Input(component_id='topology_options', component_property='value'),
     Input(component_id='alt_data', component_property='value'),
@@ -562,6 +615,16 @@ def hide_graph_divs(open_graphs, topos, alt_data_vals, secondary_options):
         rfdist_style={'display': 'none'}
         topoFreq_style={'display': 'none'}
 
+    # Topology proportion track style
+    if ('topo_g' in open_graphs) and ('topo_prop' in secondary_options):
+        topoProp_style = {
+            'display': True,
+            'height': '25vh',
+            'margin-bottom': '5px',
+        }
+    else:
+        topoProp_style = {'display': 'none'}
+
     # Alternative Data Graph style
     if 'alt_d' in open_graphs:
         alt_data_graph_style = {
@@ -581,7 +644,7 @@ def hide_graph_divs(open_graphs, topos, alt_data_vals, secondary_options):
     else:
         tree_graph_style = {'display': 'none'}
     
-    return topology_graph_style, alt_data_graph_style, tree_graph_style, rfdist_style, topoFreq_style
+    return topology_graph_style, alt_data_graph_style, tree_graph_style, rfdist_style, topoFreq_style, topoProp_style
     
 
 # 1. Set data file options with init project ID
@@ -601,11 +664,8 @@ def set_data_file_dropdown_options(p):
               [Input(component_id='project-id', component_property='value'),
               Input(component_id='data_file', component_property='value')])
 def set_data_file_dropdown_options(project_id, datafile):
-    tree_file = Path('src/data/tree_viewer_data') / str(project_id) /'topology_files' / str(datafile)
-    df = pd.read_excel(tree_file)
-    df[['TopologyID']] = df[['TopologyID']].fillna(value="NoData")
-    # print(df)
-    return df.to_json()
+    # Only the dataset key is stored in the browser, the data itself stays in the registry
+    return dataset_utils.dataset_key(project_id, datafile)
 
 
 
@@ -615,19 +675,20 @@ def set_data_file_dropdown_options(project_id, datafile):
               Input(component_id='project-id', component_property='value'),
               Input(component_id='line_color', component_property='value'),])
 def set_topology_colors(datafile_value, project_id, line_color):
-    tree_file = Path('src/data/tree_viewer_data') / str(project_id) /'topology_files' / str(datafile_value)
+    dataset = dataset_utils.get_dataset(dataset_utils.dataset_key(project_id, datafile_value))
     color_set = COLOR_SWATCHES[line_color]
-    topo_colors = tree_utils.set_topology_colors(tree_file, color_set)
+    topo_colors = tree_utils.set_topology_colors(dataset.sorted_topologies(), color_set)
     return topo_colors
 
 
 # 3. Set chromosome dropdown options + value 
 @app.callback(Output(component_id='chromosome_options', component_property='options'),
               [Input(component_id='current-file-memory', component_property='data')])
-def set_chromosome_options(df):
-    df = pd.read_json(df)
-    unique_chroms = df["Chromosome"].unique()
-    chromosome_options = [{'label': i, 'value': i} for i in sorted(unique_chroms)]
+def set_chromosome_options(dataset_key):
+    dataset = dataset_utils.get_dataset(dataset_key)
+    # Start computing RF-distance tracks in the background as soon as a file is loaded
+    rf_utils.start_rf_precompute(dataset)
+    chromosome_options = [{'label': i, 'value': i} for i in sorted(dataset.chromosomes)]
     return chromosome_options
 
 
@@ -641,11 +702,10 @@ def set_chromosome_value(chromOptions):
 @app.callback(Output(component_id='topology_options', component_property='options'),
               [Input(component_id='current-file-memory', component_property='data'),
               Input(component_id='chromosome_options', component_property='value')])
-def set_topology_options(df, chromValue):
-    df = pd.read_json(df)
-    df = df[df['Chromosome'] == chromValue]
-    sorted_topologies = df.assign(freq=df.groupby("TopologyID")["TopologyID"].transform('count')).sort_values(by=['freq',"TopologyID"],ascending=[False,True]).loc[:,["TopologyID"]]
-    topologyOptions = [{'label': i, 'value': i} for i in sorted_topologies["TopologyID"].unique() if i]
+def set_topology_options(dataset_key, chromValue):
+    # Most frequent first, served from the dataset's frequency table
+    sorted_topologies = dataset_utils.get_dataset(dataset_key).sorted_topologies(chromValue)
+    topologyOptions = [{'label': i, 'value': i} for i in sorted_topologies if i]
     return topologyOptions
 
 
@@ -659,8 +719,8 @@ def set_topology_values(topoOptions):
 @app.callback(Output(component_id='alt_data', component_property='options'),
               [Input(component_id='current-file-memory', component_property='data'),
               Input(component_id='chromosome_options', component_property='value')])
-def set_alt_data_options(df, chromValue):
-    df = pd.read_json(df)
+def set_alt_data_options(dataset_key, chromValue):
+    df = dataset_utils.get_dataset(dataset_key).dataframe
     alt_data_cols = [col for col in df.columns][4:]
     alt_data_options = [{'label': i, 'value': i} for i in alt_data_cols]
     return alt_data_options
@@ -734,12 +794,14 @@ def set_window_size(project_file, submit_button, window_size_input):
     Input(component_id='chromosome-length-memory-color-chart', component_property='data'),
     Input(component_id='chromosome_options', component_property='value'),
     Input(component_id='topology_options', component_property='value'),
-    Input(component_id='template-option', component_property='value'),
-    Input(component_id='snapshot-file-option', component_property='value'),
     Input(component_id='tree-shape-option', component_property='value'),
-    Input(component_id='topology-color-chart', component_property='data'),],
-    # States
-    [State("winSize-modal", "is_open")],)
+    Input(component_id='tree-color-option', component_property='value'),
+    Input(component_id='topology-color-chart', component_property='data'),
+    Input(component_id='topology_graph', component_property='relayoutData'),],
+    # States, template and snapshot changes are applied in the browser
+    [State("winSize-modal", "is_open"),
+    State(component_id='template-option', component_property='value'),
+    State(component_id='snapshot-file-option', component_property='value'),],)
 def plot_graphs(
     graph_switches,
     graph_switch_options,
@@ -749,20 +811,29 @@ def plot_graphs(
     chromosome_length_data,
     chromosome,
     topology,
-    template,
-    snapshot_file_type,
     tree_shape,
+    tree_color,
     color_mapping,
+    topology_relayout,
     windSize_modal,
+    template,
+    snapshot_file_type,
 ):
     # If window size modal is open, prevent update of graph
     if windSize_modal:
         raise PreventUpdate
 
+    # Zooming the topology graph redraws the graphs from the matching zoom pyramid level,
+    # other relayout events (e.g. autosize when the graph is first drawn) are ignored
+    x_range = None
+    ctx = dash.callback_context
+    if ctx.triggered and ctx.triggered[0]['prop_id'] == 'topology_graph.relayoutData':
+        x_range = data_utils.get_relayout_xrange(topology_relayout)
+        if (not x_range) and (not data_utils.is_relayout_autorange(topology_relayout)):
+            raise PreventUpdate
+
     # Read in topology data
-    tree_file = Path('src/data/tree_viewer_data') / str(project_id) /'topology_files' / str(datafile_val)
-    topology_df = pd.read_excel(tree_file)
-    topology_df[['TopologyID']] = topology_df[['TopologyID']].fillna(value="NoData")
+    dataset = dataset_utils.get_dataset(dataset_utils.dataset_key(project_id, datafile_val))
 
     # Put alt data option into list if only one selected.
     if type(alt_dropdown_options) == str:
@@ -782,13 +853,14 @@ def plot_graphs(
                 if 'topo_gc' not in graph_switch_options:
                     # Build histogram + Heatmap Figures
                     combined_histogram = tree_utils.build_combined_topology_graph(
-                        topology_df,
+                        dataset,
                         chromosome_length_data,
                         chromosome,
                         template,
                         topology,
                         num_of_graphs_to_plot,
                         color_mapping,
+                        x_range=x_range,
                     )
                     topology_graph = [
                         html.Div(
@@ -811,13 +883,14 @@ def plot_graphs(
                 else:
                     # Build histogram + Heatmap Figures
                     single_histogram = tree_utils.build_singular_topology_graph(
-                        topology_df,
+                        dataset,
                         chromosome_length_data,
                         chromosome,
                         template,
                         topology,
                         num_of_graphs_to_plot,
                         color_mapping,
+                        x_range=x_range,
                     )
                     topology_graph = [
                         html.Div(
@@ -841,16 +914,18 @@ def plot_graphs(
             for alt_data in alt_dropdown_options:
                 alt_graph = tree_utils.build_alt_data_graph(
                     alt_data,
-                    topology_df,
+                    dataset,
                     chromosome_length_data,
                     chromosome,
                     template,
                     topology,
                     num_of_graphs_to_plot,
+                    x_range=x_range,
                 )
                 alt_graphs.append(
                     html.Div(
                         dcc.Graph(
+                            id={'type': 'styled-graph', 'index': f'alt-{alt_data}'},
                             figure=alt_graph,
                             config=dict(
                                 editable=True,
@@ -866,8 +941,6 @@ def plot_graphs(
                     )
                 )
         elif graph == 'tree_g':
-            tree_cols = topology_df.columns.to_list()
-
             if type(topology) == str:
                 topologies = [topology]
             elif type(topology) == int:
@@ -879,8 +952,7 @@ def plot_graphs(
 
             for tops in topologies:
                 # Filter data
-                wanted_chroms = topology_df[topology_df["Chromosome"] == chromosome]
-                wanted_rows = wanted_chroms[wanted_chroms["TopologyID"] == tops]
+                wanted_rows = dataset.chromosome_topology_rows(chromosome, tops)
 
                 # Grab tree (Should only be one possible tree to use!!!)
                 try:
@@ -888,14 +960,9 @@ def plot_graphs(
                 except IndexError:
                     first_tree = '();'
 
-                tree = tree_utils.DrawTree(StringIO(data_utils.newick_semicolon_check(first_tree.strip())))
-
-                if tree_shape == 'box':
-                    fig = tree.create_square_tree()
-
-                elif tree_shape == 'angular':
-                    # Build nodes and edges of graph
-                    fig = tree.create_angular_tree()
+                # Tree layouts are memoized, only new trees or shapes are drawn
+                fig = tree_utils.TREE_FIGURES.get(
+                    first_tree, tree_shape, tree_cache=dataset.tree_cache, tree_color=tree_color)
 
                 tree_divs.append(
                     
@@ -910,6 +977,7 @@ def plot_graphs(
                             html.Div(
                                 children=[
                                     dcc.Graph(
+                                        id={'type': 'tree-graph', 'index': str(tops)},
                                         figure=fig,
                                         style={'width': '100%', 'background-color': 'black'},
                                         config=dict(
@@ -958,154 +1026,184 @@ def plot_graphs(
                 )
     return topology_graph, alt_graphs, tree_graphs
 
+
+# ---------------------- Clientside restyling of the current graphs ---------------------
+app.clientside_callback(
+    ClientsideFunction(namespace='graph_style', function_name='restyle_template'),
+    [Output(component_id='topology_graph', component_property='figure'),
+    Output(component_id='topology_graph', component_property='config'),],
+    [Input(component_id='template-option', component_property='value'),
+    Input(component_id='snapshot-file-option', component_property='value'),],
+    [State(component_id='topology_graph', component_property='figure'),
+    State(component_id='topology_graph', component_property='config'),
+    State(component_id='graph-template-store', component_property='data'),],
+    prevent_initial_call=True,
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='graph_style', function_name='restyle_templates'),
+    [Output(component_id={'type': 'styled-graph', 'index': ALL}, component_property='figure'),
+    Output(component_id={'type': 'styled-graph', 'index': ALL}, component_property='config'),],
+    [Input(component_id='template-option', component_property='value'),
+    Input(component_id='snapshot-file-option', component_property='value'),],
+    [State(component_id={'type': 'styled-graph', 'index': ALL}, component_property='figure'),
+    State(component_id={'type': 'styled-graph', 'index': ALL}, component_property='config'),
+    State(component_id='graph-template-store', component_property='data'),],
+    prevent_initial_call=True,
+)
+
+# Tree figures have a fixed template, only the snapshot format changes
+app.clientside_callback(
+    ClientsideFunction(namespace='graph_style', function_name='restyle_snapshot_formats'),
+    Output(component_id={'type': 'tree-graph', 'index': ALL}, component_property='config'),
+    [Input(component_id='snapshot-file-option', component_property='value'),],
+    [State(component_id={'type': 'tree-graph', 'index': ALL}, component_property='config'),],
+    prevent_initial_call=True,
+)
+
 # ---------------------- Topology Distribution Alt Calculations ---------------------
 @app.callback(
     Output(component_id='rfdist_div', component_property='children'),
     [Input(component_id='graph_secondary_options', component_property='value'),
-    Input(component_id='topology_graph', component_property='hoverData'),
-    Input(component_id='data_file', component_property='value'),
-    Input(component_id='project-id', component_property='value'),
     Input(component_id='chromosome_options', component_property='value'),
-    Input(component_id='template-option', component_property='value'),
-    Input(component_id='snapshot-file-option', component_property='value'),
-    Input(component_id='window-size', component_property='data'),
-    Input(component_id='topology-color-chart', component_property='data'),
-    Input(component_id='topology_options', component_property='value'),
-    Input(component_id='current-file-memory', component_property='data'),])
+    Input(component_id='current-file-memory', component_property='data'),],
+    [State(component_id='template-option', component_property='value'),
+    State(component_id='snapshot-file-option', component_property='value'),])
 def calc_rf_distance(
     graph_options,
-    hoverdata,
-    datafile_val,
-    project_id,
     curr_chrom,
+    dataset_key,
     template,
     snapshot_file_type,
-    window_size,
-    color_mapping,
-    topoology_options,
-    df
 ):
-    rf_plot = []
     if 'rf_dist' not in graph_options:
         return None
-    elif not hoverdata:
-        rf_plot.append(
-            dbc.Row(
-                children=[
-                    dbc.Col(
-                        children=[
-                            html.Div(
-                                children=[
-                                    dcc.Graph(
-                                        figure=tree_utils.init_RF_graph(template),
-                                        style={'height': '25vh', 'width': '100%', 'background-color': 'black'},
-                                        config=dict(
-                                            toImageButtonOptions=dict(
-                                                format=snapshot_file_type,
-                                                filename="Graph_Name",
-                                            ),
-                                        ),
-                                    )
-                                ],
-                                style={
-                                    'width': '100%',
-                                }
-                            ),
-                        ],
-                        width=12
-                    ),
-                ],
-                style={
-                    # 'border': '2px black solid',
-                    # 'margin': '5px',
-                },
-                no_gutters=True
-            )
-        )
-        return rf_plot
-    else:
-        try:
-            print('start lookup')
-            # Collect window pos based on hoverdata
-            x_pos = tree_utils.get_RFxpos(hoverdata, window_size)
-            print('got xpos')
-            print(x_pos)
-            # Read in topology data
-            # tree_file = Path('src/data/tree_viewer_data') / str(project_id) /'topology_files' / str(datafile_val)
-            # input_data = query_data(tree_file)
-            # input_data = pd.read_excel(tree_file)
-            input_data = pd.read_json(df)
-            input_data[['TopologyID']] = input_data[['TopologyID']].fillna(value="NoData")
-            print('get chrom info')
-            chrom_info = input_data[(input_data['Chromosome'] == curr_chrom)]
-            chrom_info.sort_values(by='Window', inplace=True)
-            chrom_info.reset_index(drop=True, inplace=True)
-            print('get poi info')
-            poi_info = chrom_info[chrom_info['Window'] == x_pos]
-            print(poi_info)
-            poi = poi_info.index.to_list()[0]
-            
-            print('reduce df')
-            rfdist_df = chrom_info[(chrom_info.index >= poi - 10) & (chrom_info.index <= poi + 10) & (chrom_info.index != poi)]
-            rfdist_df = pd.concat([poi_info, rfdist_df])
-            rfdist_df.sort_values(by='Window', inplace=True)
-            rfdist_df.reset_index(drop=True, inplace=True)
-            t1 = poi_info['NewickTree'].to_list()[0]
-            rf_dist_collect = []
-            for t2 in rfdist_df['NewickTree']:
-                try:
-                    rfd = tree_utils.RFDistance(t1, t2).NormRF()
-                except TreeError:
-                    # raise modal
-                    raise PreventUpdate
-                
-                if type(rfd) == str:
-                    rfd = np.nan
-                    # rfd = -1
-                rf_dist_collect.append(rfd)
-                continue
-            rfdist_df['NormRF'] = rf_dist_collect
-            print("building graphs")
-            heatmap = tree_utils.build_RF_heatmap(
-                rfdist_df,
-                template,
-                color_mapping,
-            )
-            rf_plot.append(
-                dbc.Row(
+    dataset = dataset_utils.get_dataset(dataset_key)
+    try:
+        # Track is precomputed in the background, only waits if the job is still running
+        rf_track = rf_utils.get_chromosome_rf(dataset, curr_chrom)
+    except ValueError:
+        # raise modal
+        raise PreventUpdate
+    rf_plot = [
+        dbc.Row(
+            children=[
+                dbc.Col(
                     children=[
-                        dbc.Col(
+                        html.Div(
                             children=[
+                                dcc.Graph(
+                                    id={'type': 'styled-graph', 'index': 'rf-track'},
+                                    figure=tree_utils.make_RF_track_figure(rf_track, template),
+                                    style={'height': '25vh', 'width': '100%', 'background-color': 'black'},
+                                    config=dict(
+                                        toImageButtonOptions=dict(
+                                            format=snapshot_file_type,
+                                            filename="Graph_Name",
+                                        ),
+                                    ),
+                                ),
                                 html.Div(
-                                    children=[
-                                        dcc.Graph(
-                                            figure=heatmap,
-                                            style={'height': '25vh', 'width': '100%', 'background-color': 'black'},
-                                            config=dict(
-                                                toImageButtonOptions=dict(
-                                                    format=snapshot_file_type,
-                                                    filename="Graph_Name",
-                                                ),
-                                            ),
-                                        )
-                                    ],
-                                    style={
-                                        'width': '100%',
-                                    }
+                                    id='rf-hover-info',
+                                    children="Hover over data to look up a window's RF-distance",
+                                    style={'color': 'white', 'padding': '2px 5px'},
                                 ),
                             ],
-                            width=12
+                            style={
+                                'width': '100%',
+                            }
                         ),
                     ],
-                    style={'border': '2px black solid'},
-                    no_gutters=True
-                )
-            )
-            print('end lookup')
-            return rf_plot
-        except IndexError:
-            return None
-    
+                    width=12
+                ),
+            ],
+            style={'border': '2px black solid'},
+            no_gutters=True
+        )
+    ]
+    return rf_plot
+
+
+@app.callback(
+    Output(component_id='rf-hover-info', component_property='children'),
+    [Input(component_id='topology_graph', component_property='hoverData')],
+    [State(component_id='current-file-memory', component_property='data'),
+    State(component_id='chromosome_options', component_property='value'),
+    State(component_id='window-size', component_property='data'),])
+def lookup_rf_distance(hoverdata, dataset_key, curr_chrom, window_size):
+    if not hoverdata:
+        raise PreventUpdate
+    # Collect window pos based on hoverdata
+    x_pos = tree_utils.get_RFxpos(hoverdata, window_size)
+    dataset = dataset_utils.get_dataset(dataset_key)
+    try:
+        rf_track = rf_utils.get_chromosome_rf(dataset, curr_chrom)
+    except ValueError:
+        raise PreventUpdate
+    window_rf = rf_utils.lookup_window_rf(rf_track, x_pos)
+    if window_rf is None:
+        raise PreventUpdate
+    return (
+        f"Window {window_rf['Window']} ({window_rf['TopologyID']}) NormRF - "
+        f"Previous window: {window_rf['PrevRF']:.2f} | "
+        f"Next window: {window_rf['NextRF']:.2f} | "
+        f"Most frequent topology: {window_rf['MajorityRF']:.2f}"
+    )
+
+
+@app.callback(
+    Output(component_id='topoProp_div', component_property='children'),
+    [Input(component_id='graph_secondary_options', component_property='value'),
+    Input(component_id='chromosome_options', component_property='value'),
+    Input(component_id='current-file-memory', component_property='data'),
+    Input(component_id='topo-prop-band', component_property='value'),
+    Input(component_id='topology-color-chart', component_property='data'),],
+    [State(component_id='template-option', component_property='value'),
+    State(component_id='snapshot-file-option', component_property='value'),])
+def calc_topology_proportions(
+    graph_options,
+    curr_chrom,
+    dataset_key,
+    band,
+    color_mapping,
+    template,
+    snapshot_file_type,
+):
+    if 'topo_prop' not in graph_options:
+        return None
+    if (not band) or (int(band) < 1):
+        raise PreventUpdate
+    dataset = dataset_utils.get_dataset(dataset_key)
+    # Proportions are cached per chromosome and band width
+    windows, topologies, proportions = dataset.rolling_topology_proportions(curr_chrom, int(band))
+    topoProp_plot = [
+        dbc.Row(
+            children=[
+                dbc.Col(
+                    children=[
+                        dcc.Graph(
+                            id={'type': 'styled-graph', 'index': 'topology-proportions'},
+                            figure=tree_utils.make_topology_proportion_figure(
+                                windows, topologies, proportions, int(band), template, color_mapping),
+                            style={'height': '25vh', 'width': '100%', 'background-color': 'black'},
+                            config=dict(
+                                toImageButtonOptions=dict(
+                                    format=snapshot_file_type,
+                                    filename="Graph_Name",
+                                ),
+                            ),
+                        ),
+                    ],
+                    width=12
+                ),
+            ],
+            style={'border': '2px black solid'},
+            no_gutters=True
+        )
+    ]
+    return topoProp_plot
+
+
 @app.callback(
     Output(component_id='topoFreq_div', component_property='children'),
     [Input(component_id='graph_secondary_options', component_property='value'),
@@ -1123,13 +1221,9 @@ def calc_topology_frequencies(
         return None
     else:
         # --- Collect topop frequency data
-        tree_file = Path('src/data/tree_viewer_data') / str(project_id) /'topology_files' / str(datafile)
-        # df = query_data(tree_file)
-        df = pd.read_excel(tree_file)
-        chrom_df = df[df["Chromosome"] == curr_chrom]
-        topoCounts = chrom_df["TopologyID"].value_counts()
-        totalTopologies = sum([c for c in topoCounts])
-        frequencies = {t: round((f/totalTopologies), 4) for t, f in zip(topoCounts.index, topoCounts)}
+        dataset = dataset_utils.get_dataset(dataset_utils.dataset_key(project_id, datafile))
+        topoFreqs = dataset.topology_frequencies(curr_chrom)
+        frequencies = {t: round(float(f), 4) for t, f in zip(topoFreqs['TopologyID'], topoFreqs['Fraction'])}
         # --- Ouput data into DataTable
         topoFreq_plot.append(
             dbc.Row(
@@ -0,0 +1,178 @@
+"""
+On-disk columnar cache for input data files.
+
+The first time a data file is loaded it is converted into a typed columnar
+file (Parquet when pyarrow is available, pickle otherwise) inside CACHE_DIR.
+Cache entries are keyed by the source path plus its modification time and
+size, so replacing or editing a file automatically invalidates the old entry.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+CACHE_DIR = Path('src/data/.thex_cache')
+
+# One lock per cache entry, so concurrent callbacks build an entry once
+_path_locks = dict()
+_path_locks_lock = threading.Lock()
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def file_version(file):
+    """
+    Return a short hash of the file's absolute path, mtime and size.
+    """
+    file = Path(file)
+    stat = file.stat()
+    key = f"{file.resolve().as_posix()}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def source_id(file):
+    """
+    Return a short hash of the file's absolute path.
+    """
+    return hashlib.sha1(Path(file).resolve().as_posix().encode()).hexdigest()[:12]
+
+
+def cache_prefix(file, tag):
+    """
+    Return the prefix shared by every cache entry of a given file + tag.
+    """
+    file = Path(file)
+    return f"{file.stem}-{source_id(file)}-{tag}-"
+
+
+def cache_path(file, tag='data'):
+    """
+    Return the suffix-less cache path for the current version of a file.
+    """
+    return CACHE_DIR / f"{cache_prefix(file, tag)}{file_version(file)}"
+
+
+def path_lock(path):
+    """
+    Return the lock guarding the build of a cache entry.
+    """
+    with _path_locks_lock:
+        return _path_locks.setdefault(Path(path).as_posix(), threading.Lock())
+
+
+def temp_path(path):
+    """
+    Return a new, uniquely named temp file next to path. The name starts
+    with a dot so remove_stale_entries never matches another writer's file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    os.close(fd)
+    return Path(tmp_file)
+
+
+def remove_stale_entries(file, tag='data'):
+    """
+    Remove cache entries of older versions of a file.
+    """
+    if not CACHE_DIR.exists():
+        return
+    current = cache_path(file, tag).name
+    for entry in CACHE_DIR.glob(f"{cache_prefix(file, tag)}*"):
+        if not entry.name.startswith(f"{current}."):
+            try:
+                entry.unlink()
+            except FileNotFoundError:
+                continue
+    return
+
+
+def _write_dataframe(dataframe, path, row_group_size=None):
+    """
+    Write DataFrame to Parquet, falling back to pickle when the frame
+    can't be represented in Parquet (e.g. mixed type object columns).
+    Files are written to a temp name first so readers never see a partial file.
+    """
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    if HAS_PYARROW:
+        out_file = path.parent / f"{path.name}.parquet"
+        tmp_file = temp_path(path)
+        try:
+            if row_group_size:
+                dataframe.to_parquet(tmp_file, row_group_size=row_group_size)
+            else:
+                dataframe.to_parquet(tmp_file)
+            os.replace(tmp_file, out_file)
+            return out_file
+        except Exception:
+            tmp_file.unlink(missing_ok=True)
+    out_file = path.parent / f"{path.name}.pkl"
+    tmp_file = temp_path(path)
+    try:
+        dataframe.to_pickle(tmp_file)
+        os.replace(tmp_file, out_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+    return out_file
+
+
+def _read_dataframe(path):
+    """
+    Read a cached DataFrame, returns None if no cache entry exists.
+    """
+    parquet_file = path.parent / f"{path.name}.parquet"
+    pickle_file = path.parent / f"{path.name}.pkl"
+    try:
+        if parquet_file.exists():
+            return pd.read_parquet(parquet_file)
+        elif pickle_file.exists():
+            return pd.read_pickle(pickle_file)
+    except Exception:
+        # Corrupt or unreadable entry, rebuild it
+        return None
+    return None
+
+
+def read_cached_dataframe(file, loader, tag='data', row_group_size=None):
+    """
+    Return loader(file) served from the columnar cache. The loader is only
+    called when there is no cache entry for the current version of the file.
+    """
+    path = cache_path(file, tag)
+    dataframe = _read_dataframe(path)
+    if dataframe is not None:
+        return dataframe
+    with path_lock(path):
+        # Another thread may have built the entry while we waited
+        dataframe = _read_dataframe(path)
+        if dataframe is not None:
+            return dataframe
+        dataframe = loader(file)
+        remove_stale_entries(file, tag)
+        _write_dataframe(dataframe, path, row_group_size=row_group_size)
+    return dataframe
+
+
+def cached_file(file, loader, tag='data', row_group_size=None):
+    """
+    Return the cache file of loader(file), building it first when there is
+    no entry for the current version of the file. Lets callers read parts of
+    the cached Parquet file instead of loading the whole DataFrame.
+    """
+    path = cache_path(file, tag)
+    with path_lock(path):
+        for suffix in ['.parquet', '.pkl']:
+            entry = path.parent / f"{path.name}{suffix}"
+            if entry.exists():
+                return entry
+        dataframe = loader(file)
+        remove_stale_entries(file, tag)
+        return _write_dataframe(dataframe, path, row_group_size=row_group_size)
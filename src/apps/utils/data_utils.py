@@ -1,6 +1,31 @@
+import functools
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 import plotly
 
+from apps.utils import cache_utils, xlsx_utils
+
+TOPOLOGY_FILE_TYPES = ['.csv', '.tsv', '.xlsx']
+# Topology columns stored as categoricals, NewickTree categories are the unique tree table
+CATEGORICAL_COLUMNS = ['Chromosome', 'TopologyID', 'NewickTree']
+
+
+def list_project_dirs(data_dir):
+    """
+    Return the project folders of a data directory, hidden folders are
+    skipped. The scan is cached until the directory's contents change.
+    """
+    data_dir = Path(data_dir)
+    return list(_scan_project_dirs(data_dir.as_posix(), data_dir.stat().st_mtime_ns))
+
+
+@functools.lru_cache(maxsize=16)
+def _scan_project_dirs(data_dir, dir_mtime):
+    return tuple(f for f in sorted(Path(data_dir).iterdir()) if f.stem[0] != '.')
+
+
 def check_input_columns(cols):
     expected = {
         'Chromosome': str,
@@ -8,15 +33,14 @@ def check_input_columns(cols):
         'NewickTree': str,
         'TopologyID': str,
     }
-    final_cols = []
-    # Double check standard column names, change if wrong
-    for key, value, col in zip(expected.keys(), expected.values(), cols[:4]):
-        try:
-            assert type(col) == value
-            assert col == key
-            final_cols.append(col)
-        except AssertionError:
-            final_cols.append(key)
+    # Double check standard column names, change if wrong.
+    # Correctly named columns keep their name, the others get the missing names in order.
+    named = [col for col in cols[:4] if col in expected]
+    missing = [key for key in expected if key not in named]
+    final_cols = [col if col in expected else missing.pop(0) for col in cols[:4]]
+    duplicates = sorted({col for col in final_cols + cols[4:] if (final_cols + cols[4:]).count(col) > 1}, key=str)
+    if duplicates:
+        raise ValueError(f"Duplicate column name(s) {duplicates}")
     # Add additional data column names
     if len(cols[4:]) == 0:
         final_cols.append('None')
@@ -39,7 +63,7 @@ def build_file_json(file=None):
         open_file.sort_values(by=[cols[0], cols[2]], inplace=True) # sort by chromosome and topology #
         return open_file.to_json()
     elif file.suffix == '.xlsx':
-        open_file = pd.read_excel(file, engine='openpyxl')
+        open_file = xlsx_utils.read_xlsx_columns(file)
         cols = check_input_columns(open_file.columns.to_list())
         print(cols)
         if "None" in cols:
@@ -58,8 +82,83 @@ def build_file_json(file=None):
 
 def build_file_dataframe(file=None):
     """
-    Load in file depending on file type, return pandas DataFrame in json format
+    Load in file depending on file type, return pandas DataFrame.
+    Topology files are served compacted from the columnar on-disk cache.
+    """
+    if file.suffix in TOPOLOGY_FILE_TYPES:
+        # Entries cached before compaction are compacted on read
+        return compact_topology_dataframe(cache_utils.read_cached_dataframe(file, load_topology_dataframe))
+    return load_file_dataframe(file)
+
+
+def load_topology_dataframe(file=None):
+    return compact_topology_dataframe(load_file_dataframe(file))
+
+
+def compact_topology_dataframe(dataframe):
+    """
+    Store Chromosome, TopologyID and NewickTree as categoricals with sorted
+    categories and Window as int32 when it fits. Each distinct tree string is
+    then held once, rows only keep its integer code. Already compact columns
+    are left as they are.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if (col in dataframe.columns) and (not isinstance(dataframe[col].dtype, pd.CategoricalDtype)):
+            categories = pd.unique(dataframe[col].dropna())
+            try:
+                categories = np.sort(categories)
+            except TypeError:
+                # Mixed value types keep first seen order
+                pass
+            dataframe[col] = pd.Categorical(dataframe[col], categories=categories)
+    if ('Window' in dataframe.columns) and (dataframe['Window'].dtype.kind in 'iu') and len(dataframe):
+        int32_info = np.iinfo(np.int32)
+        if (dataframe['Window'].min() >= int32_info.min) and (dataframe['Window'].max() <= int32_info.max):
+            dataframe['Window'] = dataframe['Window'].astype(np.int32)
+    return dataframe
+
+
+def topology_column_names(header, columns):
+    """
+    Return {header name: standard name} of the header columns behind the
+    given standard topology column names.
+    """
+    names = check_input_columns(list(header))
+    return {col: name for col, name in zip(header, names) if name in columns}
+
+
+def load_topology_columns(file, columns):
+    """
+    Return only the given standard columns of a topology file (e.g.
+    Chromosome and TopologyID for frequencies). Cells of the other columns
+    are not converted.
     """
+    names = dict()
+
+    def select_columns(header):
+        names.update(topology_column_names(header, columns))
+        return list(names)
+
+    if file.suffix == '.xlsx':
+        open_file = xlsx_utils.read_xlsx_columns(file, columns=select_columns)
+    else:
+        sep = '\t' if file.suffix == '.tsv' else ','
+        header = pd.read_csv(file, sep=sep, nrows=0).columns.to_list()
+        open_file = pd.read_csv(file, sep=sep, usecols=select_columns(header))
+    open_file = open_file.rename(columns=names)[[c for c in columns if c in names.values()]]
+    if (file.suffix == '.xlsx') and ('TopologyID' in open_file.columns):
+        open_file['TopologyID'] = open_file['TopologyID'].fillna(value="NoData")
+    return open_file
+
+
+def load_file_dataframe(file=None, columns=None):
+    """
+    Load in file depending on file type, return pandas DataFrame.
+    Topology files are limited to the given standard columns when columns
+    is not None, see load_topology_columns.
+    """
+    if (columns is not None) and (file.suffix in TOPOLOGY_FILE_TYPES):
+        return load_topology_columns(file, columns)
     # Identify file type and open accordingly
     if file.suffix == '.csv':
         open_file = pd.read_csv(file, sep=',')
@@ -77,12 +176,13 @@ def build_file_dataframe(file=None):
         open_file.sort_values(by=[cols[0], cols[2]], inplace=True) # sort by chromosome and topology
         return open_file
     elif file.suffix == '.xlsx':
-        open_file = pd.read_excel(file, engine='openpyxl')
+        open_file = xlsx_utils.read_xlsx_columns(file)
         cols = check_input_columns(open_file.columns.to_list())
         if "None" in cols:
             open_file['None'] = [0]*len(open_file)
         open_file.columns = cols
-        open_file.sort_values(by=[cols[0], cols[1]], inplace=True)
+        open_file['TopologyID'] = open_file['TopologyID'].fillna(value="NoData")
+        open_file.sort_values(by=['Chromosome', 'Window'], inplace=True)
         open_file.reset_index(drop=True, inplace=True)
         return open_file
 
@@ -99,6 +199,39 @@ def newick_semicolon_check(tree_str):
         return tree_str
 
 
+def get_relayout_xranges(relayout_data):
+    """
+    Return {x-axis name: [x0, x1]} of the zoomed axes in a graph's relayoutData.
+    """
+    x_ranges = dict()
+    if not relayout_data:
+        return x_ranges
+    for key, value in relayout_data.items():
+        if key.startswith('xaxis') and key.endswith('.range[0]'):
+            x_ranges[key.split('.')[0]] = [value, relayout_data[key.replace('[0]', '[1]')]]
+        elif key.startswith('xaxis') and key.endswith('.range'):
+            x_ranges[key.split('.')[0]] = list(value)
+    return x_ranges
+
+
+def get_relayout_xrange(relayout_data):
+    """
+    Return the zoomed [x0, x1] range of a graph's relayoutData, None when the
+    graph is showing its full range.
+    """
+    x_ranges = get_relayout_xranges(relayout_data)
+    if not x_ranges:
+        return None
+    return list(x_ranges.values())[0]
+
+
+def is_relayout_autorange(relayout_data):
+    """
+    Return True if relayoutData resets any axis back to its full range.
+    """
+    return any(k.endswith('autorange') for k in (relayout_data or {}).keys())
+
+
 def fix_bed_file_chroms(start, stop):
     try:
         chrom_start = int(start)
@@ -123,7 +256,7 @@ def build_file_json_for_data_import(file=None):
         # open_file.sort_values(by=["topology"], inplace=True)
         return open_file
     elif file.suffix == '.xlsx':
-        open_file = pd.read_excel(file, engine='openpyxl')
+        open_file = xlsx_utils.read_xlsx_columns(file)
         open_file.sort_values(by=["topology"], inplace=True)
         open_file.reset_index(drop=True, inplace=True)
         return open_file
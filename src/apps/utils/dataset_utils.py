@@ -0,0 +1,448 @@
+"""
+Process-wide registry of loaded topology datasets.
+
+Callbacks pass around a small dataset key (project, file, version) instead of
+the full table. The key is resolved here into an already parsed LoadedDataset
+that is shared between callbacks and evicted in least-recently-used order once
+the registry grows past its memory budget.
+
+Datasets returned by the registry are shared, callers must copy any
+DataFrame before modifying it in place.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from apps.utils import cache_utils, data_utils, newick_utils
+
+TREE_DATA_DIR = Path('src/data/tree_viewer_data')
+
+logger = logging.getLogger(__name__)
+
+# Max bytes of datasets (tables and their caches) held in memory at once
+MEMORY_BUDGET = 2 * 1024**3
+
+# Window aggregation factor of each zoom pyramid level, finest first
+PYRAMID_FACTORS = [1, 10, 100]
+# Max bins drawn for the visible x-range before using a coarser level
+MAX_VISIBLE_BINS = 5000
+# TopologyIDs given their own proportion, rarer ones are summed into OTHER_TOPOLOGIES
+MAX_PROPORTION_TOPOLOGIES = 12
+OTHER_TOPOLOGIES = 'Other'
+# Max (chromosome, band) proportion tracks kept per dataset
+MAX_CACHED_PROPORTIONS = 4
+# Max zoom pyramid levels and alt data summaries kept per dataset
+MAX_CACHED_BIN_LEVELS = 64
+MAX_CACHED_ALT_SUMMARIES = 32
+
+
+def topology_file_path(project_id, datafile):
+    return TREE_DATA_DIR / str(project_id) / 'topology_files' / str(datafile)
+
+
+def dataset_key(project_id, datafile):
+    """
+    Build the dataset key stored in the browser for a project's data file.
+    """
+    tree_file = topology_file_path(project_id, datafile)
+    return {
+        'project': str(project_id),
+        'file': str(datafile),
+        'version': cache_utils.file_version(tree_file),
+    }
+
+
+def pick_pyramid_factor(visible_span, bin_width):
+    """
+    Return the finest pyramid level that keeps the visible bins under MAX_VISIBLE_BINS.
+    """
+    for factor in PYRAMID_FACTORS:
+        if visible_span / (max(bin_width, 1) * factor) <= MAX_VISIBLE_BINS:
+            return factor
+    return PYRAMID_FACTORS[-1]
+
+
+class LoadedDataset():
+    """
+    Topology table sorted once by Chromosome and Window. Rows of each
+    chromosome are contiguous, so selecting a chromosome is an O(1) slice
+    into the sorted arrays instead of a scan over the full table.
+    """
+
+    def __init__(self, dataframe, source_file=None):
+        self.source_file = source_file
+        dataframe = dataframe.sort_values(by=['Chromosome', 'Window'], kind='mergesort')
+        dataframe.reset_index(drop=True, inplace=True)
+        self.dataframe = dataframe
+        self.windows = dataframe['Window'].to_numpy()
+        # TopologyID codes index into self.topologies (sorted names), categorical
+        # columns are factorized from their codes without comparing strings
+        topology_codes, topologies = pd.factorize(dataframe['TopologyID'], sort=True)
+        self.topology_codes = topology_codes.astype(np.int32)
+        self.topologies = list(topologies)
+        self.topology_index = {t: i for i, t in enumerate(self.topologies)}
+        # Start/stop row offsets of each chromosome
+        chromosome_values, chromosome_names = pd.factorize(dataframe['Chromosome'], sort=True)
+        boundaries = np.flatnonzero(chromosome_values[1:] != chromosome_values[:-1]) + 1
+        starts = np.concatenate([[0], boundaries]) if len(dataframe) else np.array([], dtype=int)
+        stops = np.concatenate([boundaries, [len(dataframe)]]) if len(dataframe) else np.array([], dtype=int)
+        self.chromosomes = [chromosome_names[c] for c in chromosome_values[starts]]
+        self.offsets = {c: (int(s), int(e)) for c, s, e in zip(self.chromosomes, starts, stops)}
+        # Chromosome codes index into self.chromosomes
+        self.chromosome_codes = np.repeat(np.arange(len(starts), dtype=np.int32), stops - starts)
+        # Window metadata of the full table, used for graph bin sizes
+        self.max_window = int(self.windows.max()) if len(self.windows) else 0
+        self.window_size = int(abs(self.windows[1] - self.windows[0])) if len(self.windows) > 1 else 0
+        # Bytes of the DataFrame and code arrays, measured on first request
+        self.table_report = None
+        # Zoom pyramid levels, filled on first request
+        self.bin_cache = dict()
+        self.alt_data_cache = dict()
+        # Chromosome x TopologyID window counts, built on first request
+        self.frequency_counts = None
+        # Rolling topology proportions per (chromosome, band)
+        self.proportion_cache = dict()
+        # Parsed trees shared by tree drawing and RF-distance
+        self.tree_cache = newick_utils.NewickTreeCache()
+        # Background RF-distance track jobs per chromosome
+        self.rf_jobs = dict()
+
+    def chromosome_offsets(self, chromosome):
+        return self.offsets.get(chromosome, (0, 0))
+
+    def chromosome_slice(self, chromosome):
+        """
+        Return the Window sorted rows of a chromosome as a slice of the dataset.
+        """
+        start, stop = self.chromosome_offsets(chromosome)
+        return self.dataframe.iloc[start:stop]
+
+    def chromosome_windows(self, chromosome):
+        start, stop = self.chromosome_offsets(chromosome)
+        return self.windows[start:stop]
+
+    def chromosome_topology_codes(self, chromosome):
+        start, stop = self.chromosome_offsets(chromosome)
+        return self.topology_codes[start:stop]
+
+    def get_topology_codes(self, topology):
+        """
+        Return the codes of one or more TopologyIDs, unknown IDs are skipped.
+        """
+        if (type(topology) == str) or (type(topology) == int):
+            topology = [topology]
+        return np.array([self.topology_index[t] for t in topology if t in self.topology_index], dtype=np.int32)
+
+    def topology_frequency_counts(self):
+        """
+        Return window counts of each TopologyID (columns, in self.topologies
+        order) per chromosome (rows, in self.chromosomes order). Windows
+        without a TopologyID (code -1) are not counted.
+        """
+        if self.frequency_counts is None:
+            num_topologies = len(self.topologies)
+            has_topology = self.topology_codes >= 0
+            keys = self.chromosome_codes[has_topology].astype(np.int64) * num_topologies + self.topology_codes[has_topology]
+            counts = np.bincount(keys, minlength=len(self.chromosomes) * num_topologies)
+            self.frequency_counts = counts.reshape(len(self.chromosomes), num_topologies)
+        return self.frequency_counts
+
+    def topology_frequencies(self, chromosome=None):
+        """
+        Return the Count and Fraction of windows of each TopologyID found on a
+        chromosome, or genome-wide when chromosome is None. Rows are sorted
+        by Count, most frequent first, ties by TopologyID.
+        """
+        counts = self.topology_frequency_counts()
+        if chromosome is None:
+            topology_counts = counts.sum(axis=0)
+        elif chromosome in self.offsets:
+            topology_counts = counts[self.chromosomes.index(chromosome)]
+        else:
+            topology_counts = np.zeros(len(self.topologies), dtype=np.int64)
+        # Codes follow sorted TopologyID, so a stable sort breaks ties by TopologyID
+        order = np.argsort(-topology_counts, kind='stable')
+        order = order[topology_counts[order] > 0]
+        total = topology_counts.sum()
+        return pd.DataFrame({
+            'TopologyID': [self.topologies[i] for i in order],
+            'Count': topology_counts[order],
+            'Fraction': topology_counts[order] / total if total else np.zeros(len(order)),
+        })
+
+    def sorted_topologies(self, chromosome=None):
+        """
+        Return TopologyIDs found on a chromosome (genome-wide when None), most frequent first.
+        """
+        return self.topology_frequencies(chromosome)['TopologyID'].to_list()
+
+    def rolling_topology_proportions(self, chromosome, band):
+        """
+        Return the windows of a chromosome, its TopologyIDs (most frequent
+        first) and the proportion of each TopologyID among the band windows
+        centred on each window, as a windows x topologies float32 array.
+        Band counts are differences of cumulative per-topology counts, so the
+        cost doesn't depend on the band width. Bands are clipped at the
+        chromosome ends and windows without a TopologyID are left out. Only
+        the MAX_PROPORTION_TOPOLOGIES most frequent TopologyIDs are kept, the
+        rest are summed into OTHER_TOPOLOGIES.
+        """
+        cache_key = (chromosome, band)
+        if cache_key not in self.proportion_cache:
+            codes = self.chromosome_topology_codes(chromosome)
+            topologies = self.sorted_topologies(chromosome)
+            # Column of each topology code, rare topologies share the last column
+            columns = np.full(len(self.topologies), MAX_PROPORTION_TOPOLOGIES, dtype=np.int64)
+            if len(topologies) > MAX_PROPORTION_TOPOLOGIES:
+                topologies = topologies[:MAX_PROPORTION_TOPOLOGIES] + [OTHER_TOPOLOGIES]
+                columns[[self.topology_index[t] for t in topologies[:-1]]] = np.arange(len(topologies) - 1)
+            else:
+                columns[[self.topology_index[t] for t in topologies]] = np.arange(len(topologies))
+            # cumulative[i, t] = windows of topology t among the first i windows
+            cumulative = np.zeros((len(codes) + 1, len(topologies)), dtype=np.int32)
+            if len(codes):
+                has_topology = np.flatnonzero(codes >= 0)
+                cumulative[has_topology + 1, columns[codes[has_topology]]] = 1
+                np.cumsum(cumulative, axis=0, out=cumulative)
+            rows = np.arange(len(codes))
+            first = np.clip(rows - (band // 2), 0, len(codes))
+            last = np.clip(first + band, 0, len(codes))
+            counts = cumulative[last] - cumulative[first]
+            proportions = (counts / np.maximum(counts.sum(axis=1), 1)[:, None]).astype(np.float32)
+            self.proportion_cache[cache_key] = (self.chromosome_windows(chromosome), topologies, proportions)
+            while len(self.proportion_cache) > MAX_CACHED_PROPORTIONS:
+                # Drop the oldest track, dicts keep insertion order
+                self.proportion_cache.pop(next(iter(self.proportion_cache)))
+        return self.proportion_cache[cache_key]
+
+    def chromosome_topology_rows(self, chromosome, topology):
+        """
+        Return rows of a chromosome whose TopologyID is in topology.
+        """
+        wanted = np.isin(self.chromosome_topology_codes(chromosome), self.get_topology_codes(topology))
+        return self.chromosome_slice(chromosome)[wanted]
+
+    def sparse_bin_counts(self, chromosome, start, stop, nbins, factor=1):
+        """
+        Count windows of every TopologyID in a zoom pyramid level. Level 1 has
+        nbins equal width bins spanning start to stop, level N merges every N
+        bins of level 1. Windows outside of the range fall in the edge bins.
+
+        Levels are cached per chromosome and only non-empty (TopologyID, bin)
+        pairs are stored as (level_nbins, keys, counts, first_windows) where
+        key = code * level_nbins + bin.
+        """
+        cache_key = (chromosome, start, stop, nbins, factor)
+        if cache_key in self.bin_cache:
+            return self.bin_cache[cache_key]
+        if factor == 1:
+            bin_width = (stop - start) / nbins if stop > start else 1
+            windows = self.chromosome_windows(chromosome)
+            codes = self.chromosome_topology_codes(chromosome)
+            bins = np.clip((windows - start) // bin_width, 0, nbins - 1).astype(np.int64)
+            # Windows are sorted so the first index of a key is the first window of its bin
+            keys = codes.astype(np.int64) * nbins + bins
+            unique_keys, first_index, counts = np.unique(keys, return_index=True, return_counts=True)
+            level = (nbins, unique_keys, counts, windows[first_index])
+        else:
+            # Coarser levels are built by merging bins of level 1
+            base_nbins, base_keys, base_counts, base_first_windows = self.sparse_bin_counts(
+                chromosome, start, stop, nbins)
+            level_nbins = -(-base_nbins // factor)
+            keys = (base_keys // base_nbins) * level_nbins + ((base_keys % base_nbins) // factor)
+            unique_keys, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            counts = np.bincount(inverse, weights=base_counts).astype(np.int64)
+            level = (level_nbins, unique_keys, counts, base_first_windows[first_index])
+        self.bin_cache[cache_key] = level
+        while len(self.bin_cache) > MAX_CACHED_BIN_LEVELS:
+            # Drop the oldest level, dicts keep insertion order
+            self.bin_cache.pop(next(iter(self.bin_cache)))
+        return level
+
+    def topology_bin_counts(self, chromosome, topology, start, stop, nbins, factor=1, x_range=None):
+        """
+        Return the bin edges and {TopologyID: (bin_index, count, first_window)}
+        of the wanted topologies at a zoom pyramid level. Only non-empty bins
+        (and only bins overlapping x_range when given) are returned, so the
+        output is bounded by the number of visible bins rather than windows.
+        """
+        nbins = max(int(nbins), 1)
+        bin_width = ((stop - start) / nbins if stop > start else 1) * factor
+        level_nbins, keys, counts, first_windows = self.sparse_bin_counts(
+            chromosome, start, stop, nbins, factor)
+        bin_edges = start + np.arange(level_nbins + 1) * bin_width
+        key_codes = keys // level_nbins
+        key_bins = keys % level_nbins
+        visible = np.ones(len(keys), dtype=bool)
+        if x_range:
+            visible = (bin_edges[key_bins + 1] >= x_range[0]) & (bin_edges[key_bins] <= x_range[1])
+        binned_counts = dict()
+        for code in self.get_topology_codes(topology):
+            in_code = (key_codes == code) & visible
+            binned_counts[self.topologies[code]] = (
+                key_bins[in_code],
+                counts[in_code],
+                first_windows[in_code],
+            )
+        return bin_edges, binned_counts
+
+    def alt_data_summary(self, chromosome, column, factor=1, x_range=None):
+        """
+        Return Window + column values of a chromosome at a zoom pyramid level.
+        Level 1 is the raw windows, level N summarises every N windows into
+        their mean (in column), Min and Max at the bucket's mid point.
+        """
+        cache_key = (chromosome, column, factor)
+        if cache_key not in self.alt_data_cache:
+            chrom_df = self.chromosome_slice(chromosome)[['Window', column]].dropna()
+            if factor == 1:
+                summary = chrom_df.reset_index(drop=True)
+            else:
+                windows = chrom_df['Window'].to_numpy()
+                values = chrom_df[column].to_numpy(dtype=np.float64)
+                bucket_size = max(self.window_size, 1) * factor
+                buckets = (windows - windows[0]) // bucket_size if len(windows) else windows
+                # Windows are sorted, so buckets are contiguous runs
+                bucket_starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+                counts = np.diff(np.append(bucket_starts, len(values)))
+                summary = pd.DataFrame({
+                    # Summed as int64, int32 Windows would overflow
+                    'Window': np.add.reduceat(windows.astype(np.int64), bucket_starts) / counts if len(windows) else windows,
+                    column: np.add.reduceat(values, bucket_starts) / counts if len(values) else values,
+                    'Min': np.minimum.reduceat(values, bucket_starts) if len(values) else values,
+                    'Max': np.maximum.reduceat(values, bucket_starts) if len(values) else values,
+                })
+            self.alt_data_cache[cache_key] = summary
+            while len(self.alt_data_cache) > MAX_CACHED_ALT_SUMMARIES:
+                self.alt_data_cache.pop(next(iter(self.alt_data_cache)))
+        summary = self.alt_data_cache[cache_key]
+        if x_range:
+            windows = summary['Window'].to_numpy()
+            # Keep one point either side so lines run to the graph edges
+            first = max(np.searchsorted(windows, x_range[0]) - 1, 0)
+            last = np.searchsorted(windows, x_range[1], side='right') + 1
+            summary = summary.iloc[first:last]
+        return summary
+
+    def memory_usage(self):
+        return sum(self.memory_report().values())
+
+    def memory_report(self):
+        """
+        Return bytes held by each DataFrame column (category tables included),
+        by the dataset's code arrays and by the caches filled as the dataset
+        is used. The table is measured once, caches on every call.
+        """
+        if self.table_report is None:
+            usage = self.dataframe.memory_usage(deep=True)
+            table_report = {str(col): int(size) for col, size in usage.items()}
+            for name in ['topology_codes', 'chromosome_codes']:
+                table_report[f"{name} array"] = int(getattr(self, name).nbytes)
+            self.table_report = table_report
+        report = dict(self.table_report)
+        report.update(self.cache_memory_report())
+        return report
+
+    def cache_memory_report(self):
+        """
+        Return bytes held by each of the dataset's caches. Cached DataFrames
+        are measured shallowly, their strings are shared with the table.
+        """
+        # Copies, other threads may add entries while the caches are measured
+        bin_levels = list(self.bin_cache.values())
+        alt_summaries = list(self.alt_data_cache.values())
+        proportion_tracks = list(self.proportion_cache.values())
+        rf_jobs = list(self.rf_jobs.values())
+        rf_tracks = [job.result() for job in rf_jobs if job.done() and (job.exception() is None)]
+        return {
+            'bin cache': sum(sum(a.nbytes for a in level[1:]) for level in bin_levels),
+            'alt data cache': sum(int(summary.memory_usage().sum()) for summary in alt_summaries),
+            'frequency counts': int(self.frequency_counts.nbytes) if self.frequency_counts is not None else 0,
+            # Windows are views into the table, only proportions are counted
+            'proportion cache': sum(proportions.nbytes for _, _, proportions in proportion_tracks),
+            'tree cache': self.tree_cache.memory_usage(),
+            'RF tracks': sum(int(track.memory_usage().sum()) for track in rf_tracks),
+        }
+
+    def log_memory_report(self):
+        """
+        Log the memory report at debug level, see `thex --verbose`.
+        """
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        report = self.memory_report()
+        name = self.source_file.name if self.source_file else 'dataset'
+        columns = ', '.join(f"{col} {size / 1024**2:.2f}" for col, size in sorted(report.items(), key=lambda item: -item[1]))
+        logger.debug(f"Loaded {name}: {len(self.dataframe)} rows, {sum(report.values()) / 1024**2:.2f} MB ({columns})")
+        return
+
+
+class DatasetRegistry():
+
+    def __init__(self, memory_budget=MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self.datasets = OrderedDict()
+        self.sizes = dict()
+        self.lock = threading.Lock()
+        # Per dataset locks, so concurrent callbacks load a dataset once
+        self.load_locks = dict()
+
+    def get(self, key):
+        """
+        Return the LoadedDataset for a dataset key, loading it on first request.
+        """
+        registry_key = (key['project'], key['file'], key['version'])
+        with self.lock:
+            if registry_key in self.datasets:
+                self.datasets.move_to_end(registry_key)
+                dataset = self.datasets[registry_key]
+                # Caches grow as the dataset is used, so it is re-measured on every request
+                self.sizes[registry_key] = dataset.memory_usage()
+                self.evict()
+                return dataset
+            load_lock = self.load_locks.setdefault(registry_key, threading.Lock())
+        # Load outside of the registry lock so other datasets can still be served
+        with load_lock:
+            with self.lock:
+                if registry_key in self.datasets:
+                    self.datasets.move_to_end(registry_key)
+                    return self.datasets[registry_key]
+            tree_file = topology_file_path(key['project'], key['file'])
+            dataset = LoadedDataset(data_utils.build_file_dataframe(tree_file), source_file=tree_file)
+            dataset.log_memory_report()
+            with self.lock:
+                self.datasets[registry_key] = dataset
+                self.sizes[registry_key] = dataset.memory_usage()
+                self.load_locks.pop(registry_key, None)
+                self.evict()
+        return dataset
+
+    def evict(self):
+        """
+        Drop least recently used datasets until under the memory budget.
+        The most recently used dataset is always kept.
+        """
+        while (self.memory_used() > self.memory_budget) and (len(self.datasets) > 1):
+            registry_key, _ = self.datasets.popitem(last=False)
+            del self.sizes[registry_key]
+        return
+
+    def memory_used(self):
+        return sum(self.sizes.values())
+
+    def clear(self):
+        with self.lock:
+            self.datasets.clear()
+            self.sizes.clear()
+        return
+
+
+REGISTRY = DatasetRegistry()
+
+
+def get_dataset(key):
+    return REGISTRY.get(key)
@@ -1,3 +1,8 @@
+import functools
+
+import plotly.io as pio
+
+
 def color_swatches():
     color_swatches ={
         'Plotly': [
@@ -124,3 +129,14 @@ def font_size_options():
     options = ["5", "10", "15", "20", "25", "30", "35", "40", "45"]
     return [{'label': s, 'value': s} for s in range(5, 50, 1)]
 
+
+@functools.lru_cache(maxsize=None)
+def template_layout(template):
+    return pio.templates[template].to_plotly_json()
+
+
+def template_layouts():
+    """
+    Return the layout of each graph template, for restyling figures in the browser.
+    """
+    return {t: template_layout(t) for t in graph_templates()}
@@ -0,0 +1,82 @@
+"""
+Shared cache of parsed Newick trees.
+
+Topology files repeat the same Newick string across many windows, so each
+distinct tree is parsed once and the parsed Bio.Phylo tree is reused by tree
+drawing and RF-distance calculations. Trees are keyed by a hash of their
+normalized string and evicted in least-recently-used order.
+
+Parsed trees are shared, callers must only modify them in ways that give the
+same result when repeated (e.g. ladderize).
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import StringIO
+
+from apps.utils import data_utils
+
+# Max parsed trees held per cache
+MAX_CACHED_TREES = 512
+# Approximate bytes held by each parsed clade, used to size the cache
+CLADE_BYTES = 300
+
+
+def normalize_newick(newick):
+    return data_utils.newick_semicolon_check(newick.strip())
+
+
+def tree_key(newick):
+    """
+    Return a hash of the normalized Newick string.
+    """
+    return hashlib.sha1(normalize_newick(newick).encode()).hexdigest()
+
+
+def parse_newick(newick):
+    """
+    Parse a Newick string into a Bio.Phylo tree.
+    """
+    from Bio import Phylo
+    return Phylo.read(StringIO(normalize_newick(newick)), "newick")
+
+
+class NewickTreeCache():
+
+    def __init__(self, max_trees=MAX_CACHED_TREES):
+        self.max_trees = max_trees
+        self.trees = OrderedDict()
+        self.sizes = dict()
+        self.lock = threading.Lock()
+
+    def get(self, newick):
+        """
+        Return the parsed tree of a Newick string, parsing it on first request.
+        """
+        key = tree_key(newick)
+        with self.lock:
+            if key in self.trees:
+                self.trees.move_to_end(key)
+                return self.trees[key]
+        tree = parse_newick(newick)
+        size = sum(1 for _ in tree.find_clades()) * CLADE_BYTES
+        with self.lock:
+            self.trees[key] = tree
+            self.sizes[key] = size
+            while len(self.trees) > self.max_trees:
+                old_key, _ = self.trees.popitem(last=False)
+                del self.sizes[old_key]
+        return tree
+
+    def memory_usage(self):
+        """
+        Return the approximate bytes held by the parsed trees.
+        """
+        with self.lock:
+            return sum(self.sizes.values())
+
+    def clear(self):
+        with self.lock:
+            self.trees.clear()
+            self.sizes.clear()
+        return
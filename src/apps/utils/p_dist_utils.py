@@ -1,11 +1,478 @@
+import copy
+import json
+import os
+import threading
+from collections import OrderedDict
+
 import dash
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
+import numpy as np
 
+import pandas as pd
 import plotly
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from apps.utils import cache_utils, graph_options, trace_utils
+
+# Max points per trace in the all chromosome view, where rows are only ~150px tall
+MAX_SUBPLOT_TRACE_POINTS = 600
+# Rows per Parquet row group of the cached copy, small groups let chromosome
+# filters skip most of the file
+PDIST_ROW_GROUP_SIZE = 16384
+# Rows per chunk when streaming a p-distance file
+PDIST_CHUNK_ROWS = 65536
+PDIST_POSITION_COLUMNS = ['Chromosome', 'Start', 'Stop']
+# Max p-distance figures kept in memory
+MAX_CACHED_PDIST_FIGURES = 32
+# Max downsampled sample traces kept in memory
+MAX_CACHED_PDIST_TRACES = 1024
+PDIST_DTYPES = {'Start': np.int32, "Stop": np.int32}
+# Binary p-distance store, see PDistanceStore
+PDIST_STORE_MAGIC = b'THEXPDM1'
+PDIST_STORE_ALIGN = 64
+# Max p-distance stores kept mapped per process
+MAX_OPEN_PDIST_STORES = 16
+
+
+def load_pdistance_file(file):
+    return pd.read_csv(file, sep=',', dtype=PDIST_DTYPES)
+
+
+def read_pdistance_file(file):
+    """
+    Return a p-distance file as a DataFrame, served from the columnar on-disk cache.
+    """
+    return cache_utils.read_cached_dataframe(
+        file, load_pdistance_file, tag='pdist', row_group_size=PDIST_ROW_GROUP_SIZE)
+
+
+def iter_pdistance_chunks(file, columns=None, chromosomes=None, chunk_rows=PDIST_CHUNK_ROWS):
+    """
+    Yield DataFrame chunks of a p-distance file with only the given columns
+    of the rows on the given chromosomes. Chunks are read from the cached
+    Parquet copy with the chromosome filter pushed down to its row groups, or
+    streamed from the CSV file when pyarrow is not installed.
+    """
+    if columns is not None:
+        columns = list(columns)
+    if not cache_utils.HAS_PYARROW:
+        read_columns = columns
+        if (columns is not None) and (chromosomes is not None) and ('Chromosome' not in columns):
+            read_columns = ['Chromosome'] + columns
+        chunks = pd.read_csv(file, sep=',', usecols=read_columns, dtype=PDIST_DTYPES, chunksize=chunk_rows)
+        for chunk in chunks:
+            if chromosomes is not None:
+                chunk = chunk[chunk['Chromosome'].isin(chromosomes)]
+            if len(chunk):
+                yield chunk[columns] if columns is not None else chunk
+        return
+    import pyarrow.dataset as ds
+    cache_file = cache_utils.cached_file(
+        file, load_pdistance_file, tag='pdist', row_group_size=PDIST_ROW_GROUP_SIZE)
+    row_filter = None
+    if chromosomes is not None:
+        row_filter = ds.field('Chromosome').isin(list(chromosomes))
+    batches = ds.dataset(cache_file, format='parquet').to_batches(
+        columns=columns, filter=row_filter, batch_size=chunk_rows)
+    for batch in batches:
+        if batch.num_rows:
+            yield batch.to_pandas()
+    return
+
+
+def get_pdistance_samples(file):
+    return list(PDIST_STORES.get(file).samples)
+
+
+def get_pdistance_chromosomes(file):
+    """
+    Return the chromosomes of a p-distance file in file order.
+    """
+    return PDIST_STORES.get(file).chromosomes()
+
+
+def find_reference_sample(file):
+    """
+    Return the name of the reference sample, the first sample whose first
+    p-distance is 0, or "" if there is none. Only the first row is read.
+    """
+    for sample, value in PDIST_STORES.get(file).first_row().items():
+        if value == 0:
+            return str(sample)
+    return ""
+
+
+def load_pdistance_maxima(file):
+    """
+    Return the max Stop and p-distance of each sample per chromosome.
+    """
+    maxima = []
+    for chunk in iter_pdistance_chunks(file):
+        maxima.append(chunk.drop(columns=['Start']).groupby('Chromosome', sort=False).max())
+    return pd.concat(maxima).groupby(level=0, sort=False).max()
+
+
+def read_pdistance_maxima(file):
+    """
+    Return the per chromosome maxima of a p-distance file, served from the
+    columnar on-disk cache. Used to set axis ranges without reading the
+    samples that aren't drawn.
+    """
+    return cache_utils.read_cached_dataframe(file, load_pdistance_maxima, tag='pdistmax')
+
+
+class PDistanceMatrix():
+    """
+    p-distance values of one chromosome in wide format. Each sample is a
+    contiguous float32 column (Fortran order), so a sample's trace is a slice.
+    """
+
+    def __init__(self, chromosome, stops, samples, values):
+        self.chromosome = chromosome
+        self.stops = stops
+        self.samples = list(samples)
+        self.sample_index = {sample: i for i, sample in enumerate(self.samples)}
+        self.values = values
+
+    def __len__(self):
+        return len(self.stops)
+
+    def sample_values(self, sample):
+        return self.values[:, self.sample_index[sample]]
+
+
+def align_offset(offset):
+    return -(-offset // PDIST_STORE_ALIGN) * PDIST_STORE_ALIGN
+
+
+def json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def write_pdistance_store(dataframe, path):
+    """
+    Write a p-distance DataFrame as a binary store. The file holds the magic
+    bytes, the JSON header length (uint64) and header, then Start and Stop as
+    int32 and the p-distances as a float32 windows x samples matrix in Fortran
+    order. Rows are sorted by chromosome and position, so the values of one
+    sample on one chromosome are contiguous. Array offsets in the header are
+    relative to the aligned end of the header.
+    """
+    samples = list(dataframe.columns[len(PDIST_POSITION_COLUMNS):])
+    file_order = [json_value(c) for c in pd.unique(dataframe['Chromosome'])]
+    dataframe = dataframe.reset_index(drop=True).sort_values(by=PDIST_POSITION_COLUMNS, kind='stable')
+    chrom_codes, chrom_names = pd.factorize(dataframe['Chromosome'], sort=True)
+    boundaries = np.searchsorted(chrom_codes, np.arange(len(chrom_names) + 1))
+    num_rows = len(dataframe)
+    stops_offset = align_offset(num_rows * 4)
+    header = {
+        'rows': num_rows,
+        'samples': [json_value(sample) for sample in samples],
+        # [name, first row, last row] in sorted order
+        'chromosomes': [[json_value(c), int(boundaries[i]), int(boundaries[i + 1])] for i, c in enumerate(chrom_names)],
+        'file_order': file_order,
+        # Sorted position of the file's first row
+        'first_row': int(np.flatnonzero(dataframe.index == 0)[0]) if num_rows else 0,
+        'starts_offset': 0,
+        'stops_offset': stops_offset,
+        'values_offset': stops_offset + align_offset(num_rows * 4),
+    }
+    header_bytes = json.dumps(header).encode()
+    data_start = align_offset(len(PDIST_STORE_MAGIC) + 8 + len(header_bytes))
+    tmp_file = cache_utils.temp_path(path)
+    try:
+        with open(tmp_file, 'wb') as fh:
+            fh.write(PDIST_STORE_MAGIC)
+            fh.write(len(header_bytes).to_bytes(8, 'little'))
+            fh.write(header_bytes)
+            for column, offset in [('Start', 'starts_offset'), ('Stop', 'stops_offset')]:
+                fh.seek(data_start + header[offset])
+                fh.write(dataframe[column].to_numpy(dtype='<i4').tobytes())
+            # Fortran order, one sample column after the other
+            fh.seek(data_start + header['values_offset'])
+            for sample in samples:
+                fh.write(dataframe[sample].to_numpy(dtype='<f4').tobytes())
+        os.replace(tmp_file, path)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+    return path
+
+
+class PDistanceStore():
+    """
+    Read-only view of a binary p-distance store (see write_pdistance_store).
+    Arrays are memory mapped, so slices are served from the OS page cache
+    without parsing and server processes share the same physical pages.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fh:
+            if fh.read(len(PDIST_STORE_MAGIC)) != PDIST_STORE_MAGIC:
+                raise ValueError(f"{path} is not a p-distance store")
+            header_length = int.from_bytes(fh.read(8), 'little')
+            self.header = json.loads(fh.read(header_length))
+        data_start = align_offset(len(PDIST_STORE_MAGIC) + 8 + header_length)
+        num_rows = self.header['rows']
+        self.samples = self.header['samples']
+        self.sample_index = {sample: i for i, sample in enumerate(self.samples)}
+        self.chromosome_rows = {c: (first, last) for c, first, last in self.header['chromosomes']}
+        if num_rows:
+            self.starts = np.memmap(
+                path, dtype='<i4', mode='r', offset=data_start + self.header['starts_offset'], shape=(num_rows,))
+            self.stops = np.memmap(
+                path, dtype='<i4', mode='r', offset=data_start + self.header['stops_offset'], shape=(num_rows,))
+            self.values = np.memmap(
+                path, dtype='<f4', mode='r', offset=data_start + self.header['values_offset'],
+                shape=(num_rows, len(self.samples)), order='F')
+        else:
+            # Empty files can't be mapped
+            self.starts = np.empty(0, dtype=np.int32)
+            self.stops = np.empty(0, dtype=np.int32)
+            self.values = np.empty((0, len(self.samples)), dtype=np.float32, order='F')
+
+    def chromosomes(self):
+        """
+        Return the chromosomes in file order.
+        """
+        return list(self.header['file_order'])
+
+    def first_row(self):
+        """
+        Return {sample: p-distance} of the file's first row.
+        """
+        if not self.header['rows']:
+            return dict()
+        row = self.values[self.header['first_row']]
+        return {sample: row[i] for i, sample in enumerate(self.samples)}
+
+    def matrix(self, chromosome):
+        """
+        Return the PDistanceMatrix of a chromosome, a view into the mapped file.
+        """
+        first, last = self.chromosome_rows[chromosome]
+        return PDistanceMatrix(chromosome, self.stops[first:last], self.samples, self.values[first:last])
+
+
+class PDistanceStoreCache():
+    """
+    Opened p-distance stores keyed by file version. Stores are built from the
+    columnar cache the first time a file version is requested.
+    """
+
+    def __init__(self, max_stores=MAX_OPEN_PDIST_STORES):
+        self.max_stores = max_stores
+        self.stores = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, file):
+        path = cache_utils.cache_path(file, tag='pdiststore')
+        path = path.parent / f"{path.name}.bin"
+        with self.lock:
+            if path in self.stores:
+                self.stores.move_to_end(path)
+                return self.stores[path]
+        # Only one thread builds a missing store, the others wait and open it
+        with cache_utils.path_lock(path):
+            try:
+                store = PDistanceStore(path)
+            except (OSError, ValueError):
+                # Missing or corrupt, (re)build it
+                cache_utils.remove_stale_entries(file, tag='pdiststore')
+                write_pdistance_store(read_pdistance_file(file), path)
+                store = PDistanceStore(path)
+        with self.lock:
+            self.stores[path] = store
+            while len(self.stores) > self.max_stores:
+                self.stores.popitem(last=False)
+        return store
+
+    def clear(self):
+        with self.lock:
+            self.stores.clear()
+        return
+
+
+PDIST_STORES = PDistanceStoreCache()
+
+
+def load_pdistance_matrices(file, chromosomes=None):
+    """
+    Return a {chromosome: PDistanceMatrix} dict of a p-distance file,
+    chromosomes in sorted order and rows sorted by position. Matrices are
+    views into the file's memory mapped store and hold every sample.
+    """
+    store = PDIST_STORES.get(file)
+    if chromosomes is not None:
+        chromosomes = set(chromosomes)
+    return {
+        chromosome: store.matrix(chromosome)
+        for chromosome in store.chromosome_rows
+        if (chromosomes is None) or (chromosome in chromosomes)
+    }
+
+
+
+class PDistanceTraceCache():
+    """
+    Bounded cache of downsampled trace points keyed by (file version,
+    chromosome, sample, x-range, max points). Only traces missing from the
+    cache are read from the file, so adding a sample to a view reads and
+    downsamples that sample alone.
+    """
+
+    def __init__(self, max_traces=MAX_CACHED_PDIST_TRACES):
+        self.max_traces = max_traces
+        self.traces = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_points(self, file, chromosomes, samples, x_ranges=None, max_points=trace_utils.MAX_TRACE_POINTS):
+        """
+        Return a {(chromosome, sample): (x_data, y_data)} dict of downsampled
+        trace points. x_ranges maps a chromosome to its zoomed x-range.
+        """
+        version = cache_utils.file_version(file)
+        x_ranges = x_ranges if x_ranges else dict()
+        trace_keys = dict()
+        for chromosome in chromosomes:
+            x_range = x_ranges.get(chromosome)
+            for sample in samples:
+                trace_keys[(chromosome, sample)] = (
+                    version, chromosome, sample, tuple(x_range) if x_range else None, max_points)
+        points = dict()
+        with self.lock:
+            for trace, key in trace_keys.items():
+                if key in self.traces:
+                    self.traces.move_to_end(key)
+                    points[trace] = self.traces[key]
+        missing = [trace for trace in trace_keys if trace not in points]
+        if not missing:
+            return points
+        missing_chromosomes = list(dict.fromkeys(chromosome for chromosome, _ in missing))
+        matrices = load_pdistance_matrices(file, chromosomes=missing_chromosomes)
+        for chromosome, sample in missing:
+            if chromosome in matrices:
+                chrom_data = matrices[chromosome]
+                points[(chromosome, sample)] = trace_utils.downsample_min_max(
+                    chrom_data.stops,
+                    chrom_data.sample_values(sample),
+                    x_range=x_ranges.get(chromosome),
+                    max_points=max_points,
+                )
+            else:
+                points[(chromosome, sample)] = (np.empty(0, dtype=np.int32), np.empty(0))
+        with self.lock:
+            for trace in missing:
+                self.traces[trace_keys[trace]] = points[trace]
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+        return points
+
+    def clear(self):
+        with self.lock:
+            self.traces.clear()
+        return
+
+
+PDIST_TRACES = PDistanceTraceCache()
+
+
+def make_graph_config(snapshot_file_value, snapshot_pixel_size, snapshot_scale):
+    return dict(
+        responsive=True,
+        displayModeBar=True,
+        toImageButtonOptions=dict(
+            format=snapshot_file_value,
+            filename="Graph_Name",
+            height=int(snapshot_pixel_size.split("x")[0]),
+            width=int(snapshot_pixel_size.split("x")[1]),
+            scale=snapshot_scale,
+        ),
+    )
+
+
+def restyle_figure(figure, color_index, template, font_size, line_width, colors):
+    """
+    Return a copy of a figure dict with a new template, font size, line
+    width and line colors. Trace data is shared with the original. Each
+    trace's swatch color index is kept in its meta for clientside restyling.
+    """
+    layout = dict(figure['layout'])
+    layout['template'] = graph_options.template_layout(template)
+    layout['font'] = dict(layout.get('font', dict()), size=font_size)
+    data = []
+    for trace, i in zip(figure['data'], color_index):
+        line = dict(trace.get('line', dict()), color=colors[i], width=float(line_width))
+        data.append(dict(trace, line=line, meta=dict(color_index=i)))
+    return dict(data=data, layout=layout)
+
+
+class PDistanceFigureCache():
+    """
+    Bounded cache of p-distance graphs keyed by the inputs that change their
+    data (file version, chromosome, samples, reference, view and zoom).
+    Style only inputs are applied to a cached graph as a patch, so
+    revisiting a view doesn't re-read or re-downsample any traces.
+    """
+
+    def __init__(self, max_figures=MAX_CACHED_PDIST_FIGURES):
+        self.max_figures = max_figures
+        self.graphs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def figure_key(self, file, chromosome, chosen_samples, reference_name, collapse_single_chrom, x_ranges):
+        return (
+            cache_utils.file_version(file),
+            chromosome,
+            tuple(chosen_samples),
+            reference_name,
+            bool(collapse_single_chrom),
+            tuple(sorted((axis, tuple(x_range)) for axis, x_range in x_ranges.items())),
+        )
+
+    def get(self, key, template, font_size, line_width, colors, graph_config):
+        """
+        Return the cached graphs of key restyled, None if key isn't cached.
+        """
+        with self.lock:
+            if key not in self.graphs:
+                return None
+            self.graphs.move_to_end(key)
+            wrapper, color_index = self.graphs[key]
+        graph = copy.copy(wrapper.children)
+        graph.figure = restyle_figure(graph.figure, color_index, template, font_size, line_width, colors)
+        graph.config = graph_config
+        wrapper = copy.copy(wrapper)
+        wrapper.children = graph
+        return [wrapper]
+
+    def put(self, key, graphs, color_order):
+        """
+        Store graphs under key. The swatch color of each trace is its sample's
+        position in color_order.
+        """
+        wrapper = copy.copy(graphs[0])
+        graph = copy.copy(wrapper.children)
+        graph.figure = graph.figure.to_dict()
+        wrapper.children = graph
+        color_index = [color_order.index(trace['name']) for trace in graph.figure['data']]
+        with self.lock:
+            self.graphs[key] = (wrapper, color_index)
+            while len(self.graphs) > self.max_figures:
+                self.graphs.popitem(last=False)
+        return
+
+    def clear(self):
+        with self.lock:
+            self.graphs.clear()
+        return
+
+
+PDIST_FIGURES = PDistanceFigureCache()
+
+
 def single_chrom_expanded(
     chosen_samples,
     chromosome,
@@ -19,10 +486,12 @@ def single_chrom_expanded(
     colors,
     base_graph_height,
     samples,
-    read_csv,
+    trace_points,
     snapshot_pixel_size,
     snapshot_scale,
     font_size,
+    x_range=None,
+    y_max=None,
 ):
 
     if type(chosen_samples) == str:
@@ -30,11 +499,9 @@ def single_chrom_expanded(
 
     graphs = []
 
-    """ Filter out current chromosome and set x- and y-max"""
-    curr_chrom_data = read_csv[read_csv["Chromosome"] == chromosome]
-
-    x_max = curr_chrom_data["Stop"].max() * 1.1  # increase 10% above max
-    y_max = float(curr_chrom_data["p_distance"].max() * 1.1)  # increase 10% above max
+    """ Set y-max of the current chromosome"""
+    if y_max is None:
+        y_max = max(float(np.nanmax(y_data)) for _, y_data in trace_points.values() if len(y_data)) * 1.1
     
 
     """Dynamically set height of graphs based on # of samples being shown"""
@@ -57,11 +524,7 @@ def single_chrom_expanded(
         row_heights=[base_graph_height] * len(chosen_samples)
     )
     for row, sample_name in enumerate(chosen_samples, 1):
-        filt_2 = (curr_chrom_data["Sample"] == sample_name)
-        curr_sample_data = curr_chrom_data[filt_2]
-
-        x_data = [i for i in curr_sample_data["Stop"]]
-        y_data = [i for i in curr_sample_data["p_distance"]]
+        x_data, y_data = trace_points[sample_name]
 
         fig.add_trace(
             go.Scatter(
@@ -108,27 +571,17 @@ def single_chrom_expanded(
         range=[0, y_max],
         fixedrange=True,
     )
+    # Sample rows zoom together, zooming re-fetches their traces for the new range
     fig.update_xaxes(
-        # range=[rangeslider_lowlim, rangeslider_highlim],
-        fixedrange=True,
+        range=x_range,
+        matches='x',
     )
     graphs.append(
         dbc.Col(
             dcc.Graph(
-                id=sample_name,
+                id='subplot',
                 figure=fig,
-                config=dict(
-                    # dragmode='zoom',
-                    responsive=True,
-                    displayModeBar=True,
-                    toImageButtonOptions=dict(
-                        format=snapshot_file_value,
-                        filename="Graph_Name",
-                        height=int(snapshot_pixel_size.split("x")[0]),
-                        width=int(snapshot_pixel_size.split("x")[1]),
-                        scale=snapshot_scale,
-                    ),
-                ),
+                config=make_graph_config(snapshot_file_value, snapshot_pixel_size, snapshot_scale),
             ),
             width=12,
             style={
@@ -152,10 +605,12 @@ def single_chrom_condensed(
     colors,
     base_graph_height,
     samples,
-    read_csv,
+    trace_points,
     snapshot_pixel_size,
     snapshot_scale,
     font_size,
+    x_range=None,
+    y_max=None,
 ):
     # If you only want to look at one sample, the sample name will need to be put into a list.
     # If more than one selected, it automatically places it into a list.
@@ -169,20 +624,14 @@ def single_chrom_condensed(
     base_graph_height = 500
 
 
-    """ Filter out current chromosome and set x- and y-max"""
-    curr_chrom_data = read_csv[read_csv["Chromosome"] == chromosome]
-
-    x_max = curr_chrom_data["Stop"].max() * 1.1  # increase 10% above max
-    y_max = float(curr_chrom_data["p_distance"].max() * 1.1)  # increase 10% above max
+    """ Set y-max of the current chromosome"""
+    if y_max is None:
+        y_max = max(float(np.nanmax(y_data)) for _, y_data in trace_points.values() if len(y_data)) * 1.1
 
     fig = go.Figure()
 
     for row, sample_name in enumerate(samples, 1):
-        filt_2 = (curr_chrom_data["Sample"] == sample_name)
-        curr_sample_data = curr_chrom_data[filt_2]
-
-        x_data = [i for i in curr_sample_data["Stop"]]
-        y_data = [i for i in curr_sample_data["p_distance"]]
+        x_data, y_data = trace_points[sample_name]
 
         fig.add_trace(
             go.Scatter(
@@ -235,24 +684,15 @@ def single_chrom_condensed(
     )
     fig.update_xaxes(
         title="Position",
+        range=x_range,
         tick0=0,
         )
     graphs.append(
         dbc.Col(
             dcc.Graph(
-                id=chromosome,
+                id='subplot',
                 figure=fig,
-                config=dict(
-                    responsive=True,
-                    displayModeBar=True,
-                    toImageButtonOptions=dict(
-                        format=snapshot_file_value,
-                        filename="Graph_Name",
-                        height=int(snapshot_pixel_size.split("x")[0]),
-                        width=int(snapshot_pixel_size.split("x")[1]),
-                        scale=snapshot_scale,
-                    ),  
-                ),
+                config=make_graph_config(snapshot_file_value, snapshot_pixel_size, snapshot_scale),
             ),
             width=12,
             style={
@@ -0,0 +1,209 @@
+"""
+Preprocessing of project data ahead of the first user visit.
+
+Every data file of the tree viewer and p-distance projects is converted into
+the columnar cache, and the caches built on top of it (p-distance stores and
+maxima, tree layouts) are filled in a process pool. Each processed file is recorded
+in a manifest with its version, so unchanged files are skipped on the next
+run.
+
+Run once with `thex --preprocess`, or let `thex --watch` poll the data
+directories while serving and preprocess projects as they appear or change.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from apps.utils import cache_utils, data_utils, dataset_utils, graph_options, p_dist_utils, tree_utils
+
+P_DISTANCE_DATA_DIR = Path('src/data/p_distance_data')
+MANIFEST_FILE = cache_utils.CACHE_DIR / 'manifest.json'
+
+# Seconds between checks of the data directories in watch mode
+WATCH_INTERVAL = 10
+# Tree shapes drawn ahead of time
+TREE_SHAPES = ['box', 'angular']
+
+logger = logging.getLogger(__name__)
+
+
+def is_hidden(path):
+    return path.name.startswith('.')
+
+
+def discover_data_files():
+    """
+    Return (kind, project, file) of every topology and p-distance data file.
+    """
+    data_files = []
+    if dataset_utils.TREE_DATA_DIR.exists():
+        for project in sorted(dataset_utils.TREE_DATA_DIR.iterdir()):
+            topology_dir = project / 'topology_files'
+            if is_hidden(project) or (not topology_dir.is_dir()):
+                continue
+            for f in sorted(topology_dir.iterdir()):
+                if (not is_hidden(f)) and (f.suffix in data_utils.TOPOLOGY_FILE_TYPES):
+                    data_files.append(('topology', project.name, f))
+    if P_DISTANCE_DATA_DIR.exists():
+        for project in sorted(P_DISTANCE_DATA_DIR.iterdir()):
+            if is_hidden(project) or (not project.is_dir()):
+                continue
+            for f in sorted(project.iterdir()):
+                if f.is_file() and (not is_hidden(f)) and (f.suffix == '.csv'):
+                    data_files.append(('p_distance', project.name, f))
+    return data_files
+
+
+def read_manifest():
+    try:
+        with open(MANIFEST_FILE) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {'files': {}}
+
+
+def write_manifest(manifest):
+    tmp_file = cache_utils.temp_path(MANIFEST_FILE)
+    try:
+        with open(tmp_file, 'w') as fh:
+            json.dump(manifest, fh, indent=2)
+        os.replace(tmp_file, MANIFEST_FILE)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+    return
+
+
+def preprocess_topology_file(file):
+    """
+    Fill the columnar and tree layout caches of a topology file. The
+    manifest entry records the topology counts of each chromosome and the
+    topology colors of each color swatch.
+    """
+    dataset = dataset_utils.LoadedDataset(data_utils.build_file_dataframe(file), source_file=file)
+    # Draw the tree shown for each topology of each chromosome
+    trees = set()
+    for chromosome in dataset.chromosomes:
+        for topology in dataset.topologies:
+            wanted_rows = dataset.chromosome_topology_rows(chromosome, topology)
+            # Windows without a Newick string (e.g. NoData) have no tree to draw
+            if len(wanted_rows) and isinstance(wanted_rows['NewickTree'].iloc[0], str):
+                trees.add(wanted_rows['NewickTree'].iloc[0])
+    for tree in trees:
+        for tree_shape in TREE_SHAPES:
+            tree_utils.TREE_FIGURES.get(tree, tree_shape, tree_cache=dataset.tree_cache)
+    topology_order = [str(t) for t in dataset.sorted_topologies()]
+    counts = dataset.topology_frequency_counts()
+    topology_counts = dict()
+    for row, chromosome in enumerate(dataset.chromosomes):
+        topology_counts[str(chromosome)] = {
+            str(dataset.topologies[i]): int(counts[row, i]) for i in np.flatnonzero(counts[row])
+        }
+    return {
+        'rows': len(dataset.dataframe),
+        'chromosomes': {str(c): list(dataset.chromosome_offsets(c)) for c in dataset.chromosomes},
+        'topology_order': topology_order,
+        'topology_counts': topology_counts,
+        # Colors follow topology_order, as given by tree_utils.set_topology_colors
+        'color_maps': {
+            swatch: list(tree_utils.set_topology_colors(topology_order, colors).values())
+            for swatch, colors in graph_options.color_swatches().items()
+        },
+        'trees': len(trees),
+    }
+
+
+def preprocess_pdistance_file(file):
+    """
+    Fill the columnar, binary store and per chromosome maxima caches of a
+    p-distance file.
+    """
+    dataframe = p_dist_utils.read_pdistance_file(file)
+    p_dist_utils.PDIST_STORES.get(file)
+    p_dist_utils.read_pdistance_maxima(file)
+    return {
+        'rows': len(dataframe),
+        'chromosomes': [str(c) for c in dataframe['Chromosome'].unique()],
+        'samples': [str(s) for s in dataframe.columns[3:]],
+    }
+
+
+def preprocess_file(kind, file):
+    """
+    Preprocess one data file, returns its manifest entry.
+    """
+    start = time.time()
+    try:
+        if kind == 'topology':
+            entry = preprocess_topology_file(file)
+        else:
+            entry = preprocess_pdistance_file(file)
+    except Exception as e:
+        entry = {'error': f"{type(e).__name__}: {e}"}
+    entry['seconds'] = round(time.time() - start, 3)
+    return entry
+
+
+def run_preprocess(workers=None, force=False):
+    """
+    Preprocess every new or changed data file in a process pool and update
+    the manifest. Returns the number of files processed. Runs in the same
+    process are serialized, so manifest updates aren't lost.
+    """
+    with cache_utils.path_lock(MANIFEST_FILE):
+        return _run_preprocess(workers=workers, force=force)
+
+
+def _run_preprocess(workers=None, force=False):
+    manifest = read_manifest()
+    data_files = discover_data_files()
+    pending = []
+    for kind, project, f in data_files:
+        version = cache_utils.file_version(f)
+        entry = manifest['files'].get(f.as_posix())
+        if force or (not entry) or (entry.get('version') != version):
+            pending.append((kind, project, f, version))
+    # Drop manifest entries of removed files
+    current_files = {f.as_posix() for _, _, f in data_files}
+    manifest['files'] = {k: v for k, v in manifest['files'].items() if k in current_files}
+    if not pending:
+        return 0
+    logger.info(f"Preprocessing {len(pending)} data file(s)")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [(kind, project, f, version, pool.submit(preprocess_file, kind, f)) for kind, project, f, version in pending]
+        for kind, project, f, version, job in jobs:
+            entry = job.result()
+            entry.update({'kind': kind, 'project': project, 'version': version, 'processed': time.time()})
+            manifest['files'][f.as_posix()] = entry
+            if 'error' in entry:
+                logger.warning(f"  {project}/{f.name} failed: {entry['error']}")
+            else:
+                logger.info(f"  {project}/{f.name} done in {entry['seconds']}s")
+    write_manifest(manifest)
+    return len(pending)
+
+
+def watch_projects(interval=WATCH_INTERVAL, workers=None):
+    """
+    Preprocess data files whenever a project is added or changed.
+    """
+    while True:
+        try:
+            run_preprocess(workers=workers)
+        except Exception as e:
+            logger.warning(f"Preprocessing failed: {e}")
+        time.sleep(interval)
+
+
+def start_watcher(interval=WATCH_INTERVAL, workers=None):
+    """
+    Run watch_projects in a background thread.
+    """
+    watcher = threading.Thread(target=watch_projects, args=(interval, workers), daemon=True)
+    watcher.start()
+    return watcher
@@ -0,0 +1,305 @@
+"""
+Bipartition based Robinson-Foulds distance engine.
+
+Each distinct Newick string is parsed once and the clusters of each tree
+(the set of leaves below every node) are encoded as bitsets over a taxon
+index shared by all trees. RF distances between any set of trees are then
+computed at once from a tree x cluster incidence matrix.
+
+Distances match ete3's rooted Tree.compare: rf is the number of clusters
+found in only one of the trees, max_rf is the number of non-trivial clusters
+of both trees minus their root clusters and norm_rf = rf / max_rf.
+"""
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from apps.utils import cache_utils, newick_utils
+
+# Background workers computing whole-chromosome RF-distance tracks
+RF_PRECOMPUTE_WORKERS = 2
+RF_EXECUTOR = ThreadPoolExecutor(max_workers=RF_PRECOMPUTE_WORKERS)
+RF_JOBS_LOCK = threading.Lock()
+# Bumped when the RF-distance track changes, so older cached tracks are not served
+RF_TRACK_VERSION = 2
+
+
+def postorder_clades(root):
+    """
+    Iterate over clades children first without recursion.
+    """
+    stack = [(root, False)]
+    while stack:
+        clade, children_visited = stack.pop()
+        if children_visited:
+            yield clade
+        else:
+            stack.append((clade, True))
+            for child in reversed(clade.clades):
+                stack.append((child, False))
+
+
+def count_bits(bitset):
+    return bin(bitset).count('1')
+
+
+def leaf_names(tree):
+    return [clade.name for clade in postorder_clades(tree.root) if not clade.clades]
+
+
+def tree_clusters(tree, taxon_index):
+    """
+    Return the leaf bitset of a tree and the set of its cluster bitsets with
+    more than one leaf (the root cluster included).
+    """
+    if len(tree.root.clades) > 2:
+        raise ValueError("Unrooted tree found! RF-distance expects rooted trees.")
+    clade_masks = dict()
+    clusters = set()
+    for clade in postorder_clades(tree.root):
+        if clade.clades:
+            mask = 0
+            for child in clade.clades:
+                mask |= clade_masks.pop(id(child))
+            if count_bits(mask) > 1:
+                clusters.add(mask)
+        else:
+            mask = 1 << taxon_index[clade.name]
+        clade_masks[id(clade)] = mask
+    return clade_masks[id(tree.root)], clusters
+
+
+class RFEngine():
+    """
+    Parse a set of Newick trees once and compute RF-distances between them.
+    """
+
+    def __init__(self, newick_trees, parser=newick_utils.parse_newick):
+        self.newick_trees = list(dict.fromkeys(newick_trees))
+        self.tree_index = {t: i for i, t in enumerate(self.newick_trees)}
+        parsed_trees = [parser(t) for t in self.newick_trees]
+        # Shared taxon index across all trees
+        taxa = set()
+        for tree in parsed_trees:
+            names = leaf_names(tree)
+            if len(names) != len(set(names)):
+                raise ValueError("Duplicated leaf names found in tree")
+            taxa.update(names)
+        self.taxon_index = {name: i for i, name in enumerate(sorted(taxa, key=str))}
+        self.leaf_masks = []
+        self.clusters = []
+        for tree in parsed_trees:
+            leaf_mask, clusters = tree_clusters(tree, self.taxon_index)
+            self.leaf_masks.append(leaf_mask)
+            self.clusters.append(clusters)
+        # All-vs-all matrices, built on first request
+        self.rf = None
+        self.max_rf = None
+
+    def pair_rf(self, i, j):
+        """
+        Return (rf, max_rf) between distinct trees i and j.
+        """
+        clusters_i, clusters_j = self.clusters[i], self.clusters[j]
+        if self.leaf_masks[i] != self.leaf_masks[j]:
+            # Differing taxa, restrict clusters to the common leaves
+            common = self.leaf_masks[i] & self.leaf_masks[j]
+            clusters_i = {c & common for c in clusters_i if count_bits(c & common) > 1}
+            clusters_j = {c & common for c in clusters_j if count_bits(c & common) > 1}
+        return len(clusters_i ^ clusters_j), len(clusters_i) + len(clusters_j) - 2
+
+    def calc_rf_matrices(self):
+        """
+        Return (rf, max_rf) matrices between all distinct trees.
+        """
+        num_trees = len(self.newick_trees)
+        if len(set(self.leaf_masks)) <= 1:
+            # Same taxa in all trees, count shared clusters via an incidence matrix
+            cluster_columns = dict()
+            for clusters in self.clusters:
+                for cluster in clusters:
+                    cluster_columns.setdefault(cluster, len(cluster_columns))
+            incidence = np.zeros((num_trees, len(cluster_columns)), dtype=np.int32)
+            for row, clusters in enumerate(self.clusters):
+                incidence[row, [cluster_columns[c] for c in clusters]] = 1
+            shared = incidence @ incidence.T
+            sizes = incidence.sum(axis=1)
+            total = sizes[:, None] + sizes[None, :]
+            return total - (2 * shared), total - 2
+        rf = np.zeros((num_trees, num_trees), dtype=np.int64)
+        max_rf = np.zeros((num_trees, num_trees), dtype=np.int64)
+        for i in range(num_trees):
+            for j in range(i, num_trees):
+                rf[i, j], max_rf[i, j] = self.pair_rf(i, j)
+                rf[j, i], max_rf[j, i] = rf[i, j], max_rf[i, j]
+        return rf, max_rf
+
+    def norm_rf_matrix(self):
+        """
+        Return normalized RF-distance between all distinct trees, NaN when undefined.
+        """
+        if self.rf is None:
+            self.rf, self.max_rf = self.calc_rf_matrices()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.max_rf > 0, self.rf / np.maximum(self.max_rf, 1), np.nan)
+
+    def tree_codes(self, newick_trees):
+        return np.array([self.tree_index[t] for t in newick_trees], dtype=np.int64)
+
+    def norm_rf(self, focal_tree, newick_trees):
+        """
+        Return normalized RF-distance of each of newick_trees to focal_tree.
+        """
+        return self.norm_rf_matrix()[self.tree_index[focal_tree], self.tree_codes(newick_trees)]
+
+    def norm_rf_pairs(self, codes_a, codes_b):
+        """
+        Return normalized RF-distance between distinct trees codes_a[n] and
+        codes_b[n]. Each distinct pair is only compared once, so no all-vs-all
+        matrix is needed when there are many distinct trees. Pairs with a
+        negative code (a window without a tree) are NaN.
+        """
+        num_trees = len(self.newick_trees)
+        codes_a = np.asarray(codes_a, dtype=np.int64)
+        codes_b = np.asarray(codes_b, dtype=np.int64)
+        has_trees = (codes_a >= 0) & (codes_b >= 0)
+        pair_keys = codes_a[has_trees] * num_trees + codes_b[has_trees]
+        unique_keys, inverse = np.unique(pair_keys, return_inverse=True)
+        unique_rf = np.empty(len(unique_keys))
+        for n, key in enumerate(unique_keys):
+            rf, max_rf = self.pair_rf(*divmod(int(key), num_trees))
+            unique_rf[n] = rf / max_rf if max_rf > 0 else np.nan
+        norm_rf = np.full(len(codes_a), np.nan)
+        norm_rf[has_trees] = unique_rf[inverse]
+        return norm_rf
+
+
+def calc_neighborhood_rf(chrom_df, window, neighborhood=10, tree_cache=None):
+    """
+    Return the rows within neighborhood windows either side of the focal
+    window with the normalized RF-distance of each tree to the focal tree.
+    chrom_df must be the Window sorted rows of a single chromosome.
+    Trees are parsed through tree_cache (a NewickTreeCache) when given.
+    Windows without a tree get NaN.
+    Raises IndexError if the window is not in chrom_df.
+    """
+    windows = chrom_df['Window'].to_numpy()
+    poi = int(np.searchsorted(windows, window))
+    if (poi >= len(windows)) or (windows[poi] != window):
+        raise IndexError(f"Window {window} not found")
+    first = max(poi - neighborhood, 0)
+    rfdist_df = chrom_df.iloc[first:poi + neighborhood + 1].reset_index(drop=True)
+    tree_codes, newick_trees = factorize_newick_trees(rfdist_df['NewickTree'])
+    parser = tree_cache.get if tree_cache else newick_utils.parse_newick
+    engine = RFEngine(newick_trees, parser=parser)
+    focal_codes = np.full(len(tree_codes), tree_codes[poi - first])
+    rfdist_df['NormRF'] = engine.norm_rf_pairs(tree_codes, focal_codes)
+    return rfdist_df
+
+
+def factorize_newick_trees(newick_column):
+    """
+    Return the tree code of each window (-1 for windows without a tree) and
+    the distinct Newick strings. Raises ValueError if the column holds
+    anything other than strings.
+    """
+    tree_codes, newick_trees = pd.factorize(newick_column)
+    if len(newick_trees) and (pd.api.types.infer_dtype(np.asarray(newick_trees, dtype=object), skipna=True) != 'string'):
+        raise ValueError("NewickTree column must hold Newick strings")
+    return tree_codes, newick_trees
+
+
+def calc_chromosome_rf(dataset, chromosome):
+    """
+    Return the normalized RF-distance of every window of a chromosome to the
+    previous window (PrevRF), the next window (NextRF) and the tree of the
+    chromosome's most frequent topology (MajorityRF).
+    """
+    chrom_df = dataset.chromosome_slice(chromosome)
+    tree_codes, newick_trees = factorize_newick_trees(chrom_df['NewickTree'])
+    engine = RFEngine(newick_trees)
+    prev_rf = np.full(len(chrom_df), np.nan)
+    next_rf = np.full(len(chrom_df), np.nan)
+    if len(chrom_df) > 1:
+        neighbor_rf = engine.norm_rf_pairs(tree_codes[:-1], tree_codes[1:])
+        prev_rf[1:] = neighbor_rf
+        next_rf[:-1] = neighbor_rf
+    majority_rf = np.full(len(chrom_df), np.nan)
+    # Most frequent topology among windows with a tree and a TopologyID
+    topology_codes = dataset.chromosome_topology_codes(chromosome)
+    counted = (tree_codes >= 0) & (topology_codes >= 0)
+    if counted.any():
+        majority_code = np.bincount(topology_codes[counted]).argmax()
+        majority_row = np.flatnonzero(counted & (topology_codes == majority_code))[0]
+        majority_codes = np.full(len(chrom_df), tree_codes[majority_row])
+        majority_rf = engine.norm_rf_pairs(tree_codes, majority_codes)
+    return pd.DataFrame({
+        'Window': chrom_df['Window'].to_numpy(),
+        'TopologyID': chrom_df['TopologyID'].to_numpy(),
+        'PrevRF': prev_rf,
+        'NextRF': next_rf,
+        'MajorityRF': majority_rf,
+    })
+
+
+def rf_cache_tag(chromosome):
+    """
+    Return the cache tag of a chromosome's RF-distance track. Names are
+    sanitized for the file name, so a hash of the raw name keeps e.g.
+    "chr 1" and "chr_1" apart.
+    """
+    name_hash = hashlib.sha1(str(chromosome).encode()).hexdigest()[:8]
+    return f"rf{RF_TRACK_VERSION}-{name_hash}-" + re.sub(r'[^\w.]', '_', str(chromosome))
+
+
+def load_chromosome_rf(dataset, chromosome):
+    """
+    Return a chromosome's RF-distance track, served from the topology cache
+    when the dataset has a source file.
+    """
+    if dataset.source_file is None:
+        return calc_chromosome_rf(dataset, chromosome)
+    return cache_utils.read_cached_dataframe(
+        dataset.source_file,
+        lambda f: calc_chromosome_rf(dataset, chromosome),
+        tag=rf_cache_tag(chromosome),
+    )
+
+
+def start_rf_precompute(dataset):
+    """
+    Queue background jobs computing the RF-distance track of every
+    chromosome of a dataset. Chromosomes already queued are skipped.
+    """
+    with RF_JOBS_LOCK:
+        for chromosome in dataset.chromosomes:
+            if chromosome not in dataset.rf_jobs:
+                dataset.rf_jobs[chromosome] = RF_EXECUTOR.submit(load_chromosome_rf, dataset, chromosome)
+    return
+
+
+def get_chromosome_rf(dataset, chromosome):
+    """
+    Return a chromosome's RF-distance track, waiting for its background job
+    if it is still running. Raises ValueError if the trees can't be compared.
+    """
+    with RF_JOBS_LOCK:
+        if chromosome not in dataset.rf_jobs:
+            dataset.rf_jobs[chromosome] = RF_EXECUTOR.submit(load_chromosome_rf, dataset, chromosome)
+        job = dataset.rf_jobs[chromosome]
+    return job.result()
+
+
+def lookup_window_rf(rf_track, window):
+    """
+    Return the RF-distance track row of a window, None if it isn't found.
+    """
+    windows = rf_track['Window'].to_numpy()
+    row = int(np.searchsorted(windows, window))
+    if (row >= len(windows)) or (windows[row] != window):
+        return None
+    return rf_track.iloc[row]
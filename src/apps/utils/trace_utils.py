@@ -0,0 +1,54 @@
+"""
+Helpers shared by the line traces of the tree viewer and p-distance tracer.
+"""
+import numpy as np
+
+# Max points drawn per trace, longer traces are min/max downsampled
+MAX_TRACE_POINTS = 4000
+
+
+def float32_to_float64(values):
+    """
+    Convert float32 values to the shortest float64 that round trips, so
+    0.00247 is sent to the browser as 0.00247 and not 0.0024699999.
+    """
+    return values.astype(str).astype(np.float64)
+
+
+def downsample_min_max(x_data, y_data, x_range=None, max_points=MAX_TRACE_POINTS):
+    """
+    Reduce a line trace to at most max_points. Points are split into equal
+    sized buckets and the min and max y of each bucket are kept, so peaks and
+    dips survive at any zoom level. If x_range is given only points inside of
+    it (plus one either side) are kept before downsampling.
+    x_data must be sorted. float32 y values are returned as float64.
+    """
+    x_data = np.asarray(x_data)
+    y_data = np.asarray(y_data)
+    if y_data.dtype != np.float32:
+        y_data = y_data.astype(np.float64)
+    if x_range:
+        first = max(np.searchsorted(x_data, x_range[0]) - 1, 0)
+        last = np.searchsorted(x_data, x_range[1], side='right') + 1
+        x_data = x_data[first:last]
+        y_data = y_data[first:last]
+    num_points = len(x_data)
+    if num_points <= max_points:
+        if y_data.dtype == np.float32:
+            y_data = float32_to_float64(y_data)
+        return x_data, y_data
+    num_buckets = max(max_points // 2, 1)
+    bucket_size = -(-num_points // num_buckets)
+    padding = (num_buckets * bucket_size) - num_points
+    # NaN and padding never win the min/max unless a bucket has nothing else
+    y_min = np.concatenate([np.where(np.isnan(y_data), np.inf, y_data), np.full(padding, np.inf)])
+    y_max = np.concatenate([np.where(np.isnan(y_data), -np.inf, y_data), np.full(padding, -np.inf)])
+    bucket_offsets = np.arange(num_buckets) * bucket_size
+    min_index = y_min.reshape(num_buckets, bucket_size).argmin(axis=1) + bucket_offsets
+    max_index = y_max.reshape(num_buckets, bucket_size).argmax(axis=1) + bucket_offsets
+    keep = np.unique(np.concatenate([min_index, max_index]))
+    keep = keep[keep < num_points]
+    y_data = y_data[keep]
+    if y_data.dtype == np.float32:
+        y_data = float32_to_float64(y_data)
+    return x_data[keep], y_data
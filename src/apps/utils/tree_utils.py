@@ -1,8 +1,10 @@
+import json
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from io import StringIO
 
-from Bio import Phylo
-from ete3 import Tree
 import math
 import numpy as np
 import dash_bootstrap_components as dbc
@@ -10,180 +12,265 @@ import dash_core_components as dcc
 import dash_html_components as html
 import pandas as pd
 
-import plotly.express as px
-import plotly.figure_factory as ff
+import plotly
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import scipy
 
-from apps.utils import data_utils
+from apps.utils import cache_utils, data_utils, dataset_utils, newick_utils, trace_utils
 
-class DrawTree():
-    def __init__(self, newicktree):
-        self.newicktree = Phylo.read(newicktree, "newick")
-
-    def create_square_tree(self):
-
-        def get_x_coordinates(tree):
-            """Associates to each clade an x-coord.
-            returns dict {clade: x-coord}
-            """
-            xcoords = tree.depths()
-            xcoord_dict = dict(xcoords)
-
-            first_node = [k for k in xcoords][0]
-            xcoords[first_node] = -0.01
-
-            # tree.depth() maps tree clades to depths (by branch length).
-            # returns a dict {clade: depth} where clade runs over all Clade instances of the tree, and depth is the distance from root to clade
-
-            #  If there are no branch lengths, assign unit branch lengths
-            if not max(xcoords.values()):
-                xcoords = tree.depths(unit_branch_lengths=True)
-            return xcoords
-
-        def get_y_coordinates(tree, dist=1.3):
-            """
-            returns  dict {clade: y-coord}
-            The y-coordinates are  (float) multiple of integers (i*dist below)
-            dist depends on the number of tree leafs
-            """
-            maxheight = tree.count_terminals()  # Counts the number of tree leafs.
-            # Rows are defined by the tips/leafs
-            ycoords = dict(
-                (leaf, maxheight - i * dist)
-                for i, leaf in enumerate(reversed(tree.get_terminals()))
-            )
-
-            def calc_row(clade):
-                for subclade in clade:
-                    if subclade not in ycoords:
-                        calc_row(subclade)
-                ycoords[clade] = (ycoords[clade.clades[0]] +
-                                  ycoords[clade.clades[-1]]) / 2
-
-            if tree.root.clades:
-                calc_row(tree.root)
-            return ycoords
-
-        def get_clade_lines(
-            orientation="horizontal",
-            y_curr=0,
-            x_start=0,
-            x_curr=0,
-            y_bot=0,
-            y_top=0,
-            line_color="rgb(25,25,25)",
-            line_width=0.5,
-            root_clade = False
-        ):
-            """define a shape of type 'line', for branch
-            """
-            branch_line = dict(
-                type="line", layer="below", line=dict(color=line_color, width=line_width)
-            )
+# Max tree figures kept by TREE_FIGURES
+MAX_CACHED_TREE_FIGURES = 128
+# Trees with more branches are drawn as batched WebGL line traces instead of layout shapes
+MAX_TREE_SHAPES = 1000
+# Default band width (in windows) and max points per trace of the topology proportion track
+DEFAULT_PROPORTION_BAND = 50
+MAX_PROPORTION_POINTS = 2000
 
-            if root_clade:
-                branch_line.update(x0=-0.01, y0=y_curr, x1=-0.01, y1=y_curr)
-                return branch_line
-            elif orientation == "horizontal":
-                branch_line.update(x0=x_start, y0=y_curr, x1=x_curr, y1=y_curr)
-            elif orientation == "vertical":
-                branch_line.update(x0=x_curr, y0=y_bot, x1=x_curr, y1=y_top)
-            else:
-                raise ValueError("Line type can be 'horizontal' or 'vertical'")
-
-            return branch_line
-
-        def draw_clade(
-            clade,
-            x_start,
-            line_shapes,
-            line_color="rgb(15,15,15)",
-            line_width=1,
-            x_coords=0,
-            y_coords=0,
-            init_clade=False,
-        ):
-            """Recursively draw the tree branches, down from the given clade"""
-
-            x_curr = x_coords[clade]
-            y_curr = y_coords[clade]
-
-            # Draw a horizontal line from start to here
-            if init_clade:
-                branch_line = get_clade_lines(
-                    orientation="horizontal",
-                    y_curr=y_curr,
-                    x_start=x_start,
-                    x_curr=x_curr,
-                    line_color=line_color,
-                    line_width=line_width,
-                    root_clade=True,
-                )
-            else:
-                branch_line = get_clade_lines(
-                    orientation="horizontal",
-                    y_curr=y_curr,
-                    x_start=x_start,
-                    x_curr=x_curr,
-                    line_color=line_color,
-                    line_width=line_width,
-                    root_clade=False,
-                )
-
-            line_shapes.append(branch_line)
-
-            if clade.clades:
-                # Draw a vertical line connecting all children
-                y_top = y_coords[clade.clades[0]]
-                y_bot = y_coords[clade.clades[-1]]
-
-                line_shapes.append(
-                    get_clade_lines(
-                        orientation="vertical",
-                        x_curr=x_curr,
-                        y_bot=y_bot,
-                        y_top=y_top,
-                        line_color=line_color,
-                        line_width=line_width,
-                    )
-                )
+class TreeLayout():
+    """
+    Ladderized copy of a tree flattened into preorder index arrays. Node
+    coordinates are computed with iterative NumPy passes over the tree's
+    levels, so there is no recursion and very large trees can be drawn.
+    The source tree is not modified.
+    """
 
-                # Draw descendants
-                for child in clade:
-                    draw_clade(child, x_curr, line_shapes,
-                               x_coords=x_coords, y_coords=y_coords)
+    def __init__(self, tree):
+        # Flatten the tree in its original preorder, parents before children
+        clades = []
+        parents = []
+        levels = []
+        children = []
+        stack = [(tree.root, -1, 0)]
+        while stack:
+            clade, parent, level = stack.pop()
+            index = len(clades)
+            clades.append(clade)
+            parents.append(parent)
+            levels.append(level)
+            children.append([])
+            if parent >= 0:
+                children[parent].append(index)
+            for child in reversed(clade.clades):
+                stack.append((child, index, level + 1))
+        parents = np.array(parents, dtype=np.int64)
+        levels = np.array(levels, dtype=np.int64)
+        level_nodes = self.group_levels(levels)
+        # Leaf counts, deepest level first
+        leaf_counts = np.array([0 if c else 1 for c in children], dtype=np.int64)
+        for nodes in reversed(level_nodes[1:]):
+            np.add.at(leaf_counts, parents[nodes], leaf_counts[nodes])
+        # Ladderize, children with fewer leaves first (same as Bio.Phylo's ladderize)
+        children = [sorted(c, key=leaf_counts.__getitem__) for c in children]
+        order = []
+        stack = [0]
+        while stack:
+            index = stack.pop()
+            order.append(index)
+            stack.extend(reversed(children[index]))
+        order = np.array(order, dtype=np.int64)
+        new_index = np.empty_like(order)
+        new_index[order] = np.arange(len(order))
+        # Node arrays in ladderized preorder
+        self.clades = [clades[i] for i in order]
+        self.num_nodes = len(order)
+        self.parents = np.where(parents[order] >= 0, new_index[np.maximum(parents[order], 0)], -1)
+        self.levels = levels[order]
+        self.level_nodes = self.group_levels(self.levels)
+        self.is_leaf = np.array([not children[i] for i in order], dtype=bool)
+        self.first_child = np.array([new_index[children[i][0]] if children[i] else -1 for i in order], dtype=np.int64)
+        self.last_child = np.array([new_index[children[i][-1]] if children[i] else -1 for i in order], dtype=np.int64)
+        self.branch_lengths = np.array([c.branch_length or 0 for c in self.clades], dtype=np.float64)
+        self.root_depth = tree.root.branch_length or 0
+
+    @staticmethod
+    def group_levels(levels):
+        """
+        Return node indexes grouped by level, root level first.
+        """
+        by_level = np.argsort(levels, kind='stable')
+        boundaries = np.flatnonzero(np.diff(levels[by_level])) + 1
+        return np.split(by_level, boundaries)
+
+    def x_coordinates(self, unit_branch_lengths=False):
+        """
+        Return the depth of each node (distance from root by branch length),
+        same as Bio.Phylo's tree.depths().
+        """
+        if unit_branch_lengths:
+            steps = np.ones(self.num_nodes)
+        else:
+            steps = self.branch_lengths
+        x_coords = np.zeros(self.num_nodes)
+        x_coords[0] = self.root_depth
+        for nodes in self.level_nodes[1:]:
+            x_coords[nodes] = x_coords[self.parents[nodes]] + steps[nodes]
+        return x_coords
+
+    def y_coordinates(self, dist=1):
+        """
+        Return the row of each node. Leaves are spaced dist apart and internal
+        nodes sit halfway between their first and last child.
+        """
+        y_coords = np.zeros(self.num_nodes)
+        leaves = np.flatnonzero(self.is_leaf)
+        num_leaves = len(leaves)
+        y_coords[leaves] = num_leaves - (num_leaves - 1 - np.arange(num_leaves)) * dist
+        for nodes in reversed(self.level_nodes):
+            internal = nodes[~self.is_leaf[nodes]]
+            y_coords[internal] = (y_coords[self.first_child[internal]] + y_coords[self.last_child[internal]]) / 2
+        return y_coords
+
+    def square_branches(self, x_coords, y_coords):
+        """
+        Return (x0, y0, x1, y1, node) of each branch line of a square tree,
+        a horizontal line per node followed by a vertical line joining the
+        children of internal nodes, in preorder.
+        """
+        nodes = np.arange(self.num_nodes)
+        parent_x = x_coords[np.maximum(self.parents, 0)]
+        internal = np.flatnonzero(~self.is_leaf)
+        x0 = np.concatenate([parent_x, x_coords[internal]])
+        y0 = np.concatenate([y_coords, y_coords[self.last_child[internal]]])
+        x1 = np.concatenate([x_coords, x_coords[internal]])
+        y1 = np.concatenate([y_coords, y_coords[self.first_child[internal]]])
+        branch_nodes = np.concatenate([nodes, internal])
+        draw_order = np.argsort(np.concatenate([nodes * 2, (internal * 2) + 1]), kind='stable')
+        return x0[draw_order], y0[draw_order], x1[draw_order], y1[draw_order], branch_nodes[draw_order]
+
+    def angular_branches(self, x_coords, y_coords):
+        """
+        Return (x0, y0, x1, y1, node) of each branch line of an angular tree,
+        a line from each node's parent to the node in preorder.
+        """
+        parents = np.maximum(self.parents, 0)
+        x0 = x_coords[parents]
+        y0 = y_coords[parents]
+        # The root's line starts at 0
+        x0[0] = 0
+        return x0, y0, x_coords.copy(), y_coords.copy(), np.arange(self.num_nodes)
+
+    def clade_ids(self, min_clades):
+        """
+        Return the clade of each node. Clades are the subtrees rooted at the
+        shallowest level with at least min_clades nodes (or the widest level
+        of smaller trees), nodes above it get -1.
+        """
+        level_sizes = np.array([len(nodes) for nodes in self.level_nodes])
+        if level_sizes.max() >= min_clades:
+            clade_level = int(np.argmax(level_sizes >= min_clades))
+        else:
+            clade_level = int(np.argmax(level_sizes))
+        clades = np.full(self.num_nodes, -1, dtype=np.int64)
+        clades[self.level_nodes[clade_level]] = self.level_nodes[clade_level]
+        for nodes in self.level_nodes[clade_level + 1:]:
+            clades[nodes] = clades[self.parents[nodes]]
+        return clades
+
+    def node_text(self):
+        """
+        Return leaf names, or confidence values for unnamed internal nodes.
+        """
+        return [c.name if c.name else c.confidence for c in self.clades]
 
-        tree = self.newicktree
-        tree.ladderize()
 
-        x_coords = get_x_coordinates(tree)
-        y_coords = get_y_coordinates(tree)
+class DrawTree():
+    def __init__(self, newicktree):
+        from Bio import Phylo
+        # Accept an already parsed tree (e.g. from a NewickTreeCache) or a Newick file handle
+        if isinstance(newicktree, Phylo.BaseTree.Tree):
+            self.newicktree = newicktree
+        else:
+            self.newicktree = Phylo.read(newicktree, "newick")
+
+    @staticmethod
+    def get_branch_colors(tree_layout, branch_nodes, color_by_clade=False):
+        """
+        Return the line color of each branch, the root's lines are drawn slightly lighter.
+        """
+        branch_colors = np.where(branch_nodes == 0, "rgb(25,25,25)", "rgb(15,15,15)").astype(object)
+        if color_by_clade:
+            clade_colors = plotly.colors.qualitative.Plotly
+            clades = tree_layout.clade_ids(len(clade_colors))
+            # Number clades in preorder so neighbouring clades get different colors
+            clade_numbers = {c: n for n, c in enumerate(np.unique(clades[clades >= 0]))}
+            branch_clades = clades[branch_nodes]
+            for branch in np.flatnonzero(branch_clades >= 0):
+                branch_colors[branch] = clade_colors[clade_numbers[branch_clades[branch]] % len(clade_colors)]
+        return branch_colors
+
+    @staticmethod
+    def get_line_shapes(x0, y0, x1, y1, branch_colors):
+        """
+        Build a line shape for each branch.
+        """
         line_shapes = []
-        draw_clade(
-            tree.root,
-            0,
-            line_shapes,
-            line_color="rgb(25,25,25)",
-            line_width=1,
-            x_coords=x_coords,
-            y_coords=y_coords,
-            init_clade=True,
-        )
-        my_tree_clades = x_coords.keys()
-        X = []
-        Y = []
-        text = []
-
-        for cl in my_tree_clades:
-            X.append(x_coords[cl])
-            Y.append(y_coords[cl])
-            # Add confidence values if internal node
-            if not cl.name:
-                text.append(cl.confidence)
-            else:
-                text.append(cl.name)
+        for bx0, by0, bx1, by1, line_color in zip(x0.tolist(), y0.tolist(), x1.tolist(), y1.tolist(), branch_colors):
+            line_shapes.append(
+                dict(
+                    type="line",
+                    layer="below",
+                    line=dict(color=line_color, width=1),
+                    x0=bx0,
+                    y0=by0,
+                    x1=bx1,
+                    y1=by1,
+                )
+            )
+        return line_shapes
+
+    @staticmethod
+    def get_line_traces(x0, y0, x1, y1, branch_colors):
+        """
+        Pack branches into one WebGL line trace per color, segments are
+        separated by None so thousands of branches draw as a single trace.
+        """
+        line_traces = []
+        for line_color in dict.fromkeys(branch_colors):
+            in_color = branch_colors == line_color
+            num_branches = int(in_color.sum())
+            x_data = np.empty(num_branches * 3, dtype=object)
+            y_data = np.empty(num_branches * 3, dtype=object)
+            x_data[0::3], x_data[1::3] = x0[in_color], x1[in_color]
+            y_data[0::3], y_data[1::3] = y0[in_color], y1[in_color]
+            line_traces.append(
+                dict(
+                    type="scattergl",
+                    x=x_data.tolist(),
+                    y=y_data.tolist(),
+                    mode="lines",
+                    line=dict(color=line_color, width=1),
+                    hoverinfo="skip",
+                    showlegend=False,
+                )
+            )
+        return line_traces
+
+    def draw_branches(self, tree_layout, x0, y0, x1, y1, branch_nodes, color_by_clade=False):
+        """
+        Return (line_traces, line_shapes) of the branches. Small trees are
+        drawn with layout shapes, larger ones with batched line traces.
+        """
+        branch_colors = self.get_branch_colors(tree_layout, branch_nodes, color_by_clade)
+        if len(branch_nodes) <= MAX_TREE_SHAPES:
+            return [], self.get_line_shapes(x0, y0, x1, y1, branch_colors)
+        return self.get_line_traces(x0, y0, x1, y1, branch_colors), []
+
+    def create_square_tree(self, color_by_clade=False):
+        tree_layout = TreeLayout(self.newicktree)
+        x_coords = tree_layout.x_coordinates()
+        x_coords[0] = -0.01
+        #  If there are no branch lengths, assign unit branch lengths
+        if not x_coords.max():
+            x_coords = tree_layout.x_coordinates(unit_branch_lengths=True)
+        y_coords = tree_layout.y_coordinates(dist=1.3)
+        x0, y0, x1, y1, branch_nodes = tree_layout.square_branches(x_coords, y_coords)
+        # The root's horizontal line is a single point at -0.01
+        x0[0] = x1[0] = -0.01
+        line_traces, line_shapes = self.draw_branches(
+            tree_layout, x0, y0, x1, y1, branch_nodes, color_by_clade)
+        X = x_coords.tolist()
+        Y = y_coords.tolist()
+        text = tree_layout.node_text()
 
         axis = dict(
             showline=False,
@@ -198,7 +285,8 @@ class DrawTree():
 
         for elt in label_legend:
             node = dict(
-                type="scatter",
+                # Large trees draw nodes with WebGL as well
+                type="scattergl" if line_traces else "scatter",
                 x=X,
                 y=Y,
                 mode="markers+text",
@@ -232,146 +320,21 @@ class DrawTree():
             template='plotly_dark',
         )
 
-        fig = dict(data=nodes, layout=layout)
+        fig = dict(data=line_traces + nodes, layout=layout)
         return fig
 
-    def create_angular_tree(self):
-
-        def get_x_coordinates(tree):
-            """Associates to each clade an x-coord.
-            returns dict {clade: x-coord}
-            """
-            xcoords = tree.depths()
-            # tree.depth() maps tree clades to depths (by branch length).
-            # returns a dict {clade: depth} where clade runs over all Clade instances of the tree, and depth
-            # is the distance from root to clade
-
-            #  If there are no branch lengths, assign unit branch lengths
-            if not max(xcoords.values()):
-                xcoords = tree.depths(unit_branch_lengths=True)
-
-            return xcoords
-
-        def get_y_coordinates(tree, dist=1):
-            """
-            returns  dict {clade: y-coord}
-            The y-coordinates are  (float) multiple of integers (i*dist below)
-            dist depends on the number of tree leafs
-            """
-            maxheight = tree.count_terminals()  # Counts the number of tree leafs.
-            # Rows are defined by the tips/leafs
-            ycoords = dict(
-                (leaf, maxheight - i / dist) for i, leaf in enumerate(reversed(tree.get_terminals()))
-            )
-
-            def calc_row(clade):
-                for subclade in clade:
-                    if subclade not in ycoords:
-                        calc_row(subclade)
-                ycoords[clade] = (ycoords[clade.clades[0]] +
-                                  ycoords[clade.clades[-1]]) / 2
-
-            if tree.root.clades:
-                calc_row(tree.root)
-            return ycoords
-
-        def get_clade_lines(
-            orientation="horizontal",
-            y_curr=0,
-            last_y_curr=0,
-            x_start=0,
-            x_curr=0,
-            y_bot=0,
-            y_top=0,
-            line_color="rgb(25,25,25)",
-            line_width=0.5,
-            init_flag=False,
-        ):
-            """define a shape of type 'line', for branch
-            """
-            branch_line = dict(
-                type="line", layer="below", line=dict(color=line_color, width=line_width)
-            )
-            if orientation == "horizontal":
-                if init_flag:
-                    branch_line.update(x0=x_start, y0=y_curr,
-                                       x1=x_curr, y1=y_curr)
-                else:
-                    branch_line.update(
-                        x0=x_start, y0=last_y_curr, x1=x_curr, y1=y_curr)
-            elif orientation == "vertical":
-                branch_line.update(x0=x_curr, y0=y_bot, x1=x_curr, y1=y_top)
-            else:
-                raise ValueError("Line type can be 'horizontal' or 'vertical'")
-            return branch_line
-
-        def draw_clade(
-            clade,
-            x_start,
-            line_shapes,
-            line_color="rgb(15,15,15)",
-            line_width=1,
-            x_coords=0,
-            y_coords=0,
-            last_clade_y_coord=0,
-            init_flag=True
-        ):
-            """Recursively draw the tree branches, down from the given clade"""
-            x_curr = x_coords[clade]
-            y_curr = y_coords[clade]
-
-            # Draw a horizontal line from start to here
-            branch_line = get_clade_lines(
-                orientation="horizontal",
-                y_curr=y_curr,
-                last_y_curr=last_clade_y_coord,
-                x_start=x_start,
-                x_curr=x_curr,
-                line_color=line_color,
-                line_width=line_width,
-                init_flag=init_flag,
-            )
-
-            line_shapes.append(branch_line)
-
-            if clade.clades:
-                # Draw descendants
-                for child in clade:
-                    draw_clade(child, x_curr, line_shapes, x_coords=x_coords,
-                               y_coords=y_coords, last_clade_y_coord=y_coords[clade], init_flag=False)
-
-        # Load in Tree object and ladderize
-        tree = self.newicktree
-        tree.ladderize()
-
-        # Get coordinates + put into dictionary
-        # dict(keys=clade_names, values=)
-        x_coords = get_x_coordinates(tree)
-        y_coords = get_y_coordinates(tree)
-        line_shapes = []
-        draw_clade(
-            tree.root,
-            0,
-            line_shapes,
-            line_color="rgb(25,25,25)",
-            line_width=1,
-            x_coords=x_coords,
-            y_coords=y_coords,
-        )
-        #
-        my_tree_clades = x_coords.keys()
-        X = []
-        Y = []
-        text = []
-
-        for cl in my_tree_clades:
-            X.append(x_coords[cl])
-            Y.append(y_coords[cl])
-            # Add confidence values if internal node
-            if not cl.name:
-                text.append(cl.confidence)
-            else:
-                text.append(cl.name)
+    def create_angular_tree(self, color_by_clade=False):
+        tree_layout = TreeLayout(self.newicktree)
+        x_coords = tree_layout.x_coordinates()
+        #  If there are no branch lengths, assign unit branch lengths
+        if not x_coords.max():
+            x_coords = tree_layout.x_coordinates(unit_branch_lengths=True)
+        y_coords = tree_layout.y_coordinates(dist=1)
+        line_traces, line_shapes = self.draw_branches(
+            tree_layout, *tree_layout.angular_branches(x_coords, y_coords), color_by_clade)
+        X = x_coords.tolist()
+        Y = y_coords.tolist()
+        text = tree_layout.node_text()
 
         axis = dict(
             showline=False,
@@ -386,7 +349,8 @@ class DrawTree():
 
         for elt in label_legend:
             node = dict(
-                type="scatter",
+                # Large trees draw nodes with WebGL as well
+                type="scattergl" if line_traces else "scatter",
                 x=X,
                 y=Y,
                 mode="markers+text",
@@ -421,40 +385,153 @@ class DrawTree():
             template='plotly_dark',
         )
 
-        fig = dict(data=nodes, layout=layout)
+        fig = dict(data=line_traces + nodes, layout=layout)
         return fig
 
 
-class RFDistance():
+class TreeFigureCache():
+    """
+    Memoized DrawTree figures keyed by (Newick hash, shape, style), so tree
+    layouts are only computed once per tree and not on every callback.
+    When cache_dir is given figures are also stored on disk, so layouts
+    drawn by the preprocessing workers are shared with the server.
+    Figures are shared, callers must not modify them.
+    """
 
-    def __init__(self, t1, t2):
-        self.t1 = Tree(t1)
-        self.t2 = Tree(t2)
-        self.compare = self.t1.compare(self.t2)
+    def __init__(self, max_figures=MAX_CACHED_TREE_FIGURES, cache_dir=None):
+        self.max_figures = max_figures
+        self.cache_dir = cache_dir
+        self.figures = OrderedDict()
+        self.lock = threading.Lock()
+
+    def figure_path(self, key):
+        return self.cache_dir / f"{'-'.join(key)}.json"
+
+    def read_figure(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.figure_path(key)) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def write_figure(self, key, fig):
+        if self.cache_dir is None:
+            return
+        out_file = self.figure_path(key)
+        tmp_file = cache_utils.temp_path(out_file)
+        try:
+            with open(tmp_file, 'w') as fh:
+                json.dump(fig, fh)
+            os.replace(tmp_file, out_file)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+        return
+
+    def get(self, newick, tree_shape, tree_cache=None, tree_color='single'):
+        key = (newick_utils.tree_key(newick), tree_shape, tree_color)
+        with self.lock:
+            if key in self.figures:
+                self.figures.move_to_end(key)
+                return self.figures[key]
+        # Only one thread draws a missing tree, the others wait and read it
+        with cache_utils.path_lock(self.figure_path(key) if self.cache_dir else '-'.join(key)):
+            with self.lock:
+                if key in self.figures:
+                    return self.figures[key]
+            fig = self.read_figure(key)
+            if fig is None:
+                if tree_cache is not None:
+                    tree = DrawTree(tree_cache.get(newick))
+                else:
+                    tree = DrawTree(newick_utils.parse_newick(newick))
+                color_by_clade = (tree_color == 'clade')
+                if tree_shape == 'angular':
+                    fig = tree.create_angular_tree(color_by_clade=color_by_clade)
+                else:
+                    fig = tree.create_square_tree(color_by_clade=color_by_clade)
+                self.write_figure(key, fig)
+        with self.lock:
+            self.figures[key] = fig
+            while len(self.figures) > self.max_figures:
+                self.figures.popitem(last=False)
+        return fig
 
-    def NormRF(self):
-        return self.compare['norm_rf']
+    def clear(self):
+        with self.lock:
+            self.figures.clear()
+        return
 
-    def RF(self):
-        return self.compare['rf']
 
-    def MaxRF(self):
-        return self.compare['max_rf']
+TREE_FIGURES = TreeFigureCache(cache_dir=cache_utils.CACHE_DIR / 'tree_figures')
 
 
 # -------------------------------------------------------------------------------------
 # ----------------------------- Figure creating functions -----------------------------
 
+def make_binned_topology_traces(
+    bin_edges,
+    binned_counts,
+    chromosome,
+    color_mapping,
+):
+    """
+    Build one pre-binned bar trace + one rug trace per TopologyID from
+    LoadedDataset.topology_bin_counts output.
+    """
+    bar_traces = []
+    rug_traces = []
+    bin_width = bin_edges[1] - bin_edges[0]
+    for topology, (bins, counts, first_windows) in binned_counts.items():
+        bin_centers = bin_edges[bins] + (bin_width / 2)
+        # customdata holds the first Window of each bin for hover lookups (see get_RFxpos)
+        customdata = first_windows
+        color = color_mapping.get(topology) if color_mapping else None
+        bar_traces.append(
+            go.Bar(
+                x=bin_centers,
+                y=counts,
+                width=bin_width,
+                name=str(topology),
+                legendgroup=str(topology),
+                marker=dict(color=color),
+                customdata=customdata,
+                hovertemplate=(
+                    f"TopologyID={topology}<br>Window=%{{customdata}}<br>"
+                    f"Chromosome={chromosome}<br>count=%{{y}}<extra></extra>"
+                ),
+            )
+        )
+        rug_traces.append(
+            go.Scatter(
+                x=first_windows,
+                y=[str(topology)]*len(first_windows),
+                mode='markers',
+                marker=dict(color=color, symbol='line-ns-open'),
+                name=str(topology),
+                legendgroup=str(topology),
+                showlegend=False,
+                customdata=customdata,
+                hovertemplate=(
+                    f"TopologyID={topology}<br>Window=%{{customdata}}<br>"
+                    f"Chromosome={chromosome}<extra></extra>"
+                ),
+            )
+        )
+    return bar_traces, rug_traces
+
+
 def make_combined_topology_figure(
-    dataframe,
-    max_window_size,
-    window_size,
+    bin_edges,
+    binned_counts,
+    chromosome,
     chromosome_length_info,
     template,
     num_of_graphs_to_plot,
     color_mapping,
+    x_range=None,
 ):
-    df_cols = dataframe.columns.to_list()
     # Set chromosome info variables
     # NOTE: Strip is used in case there are commas in the number
     chrom_start = chromosome_length_info["Start"][0]
@@ -466,52 +543,39 @@ def make_combined_topology_figure(
     if clean_stop > 10000000:
         dtick_val = 10000000
         tick_val = 0
-    elif 1000000 < clean_stop < 10000000:  # Between 1 million and 10 million
-        dtick_val = None
-        tick_val = None
-    elif 100000 < clean_stop < 1000000:  # Between 100,000 and 1 million
-        dtick_val = None
-        tick_val = None
-    elif 1000 < clean_stop < 100000:  # Between 1000 and 100,000
-        dtick_val = None
-        tick_val = None
-    elif 100 < clean_stop < 1000:
-        dtick_val = None
-        tick_val = None
-    elif 10 < clean_stop < 100:
-        dtick_val = None
-        tick_val = None
     else:
         dtick_val = None
         tick_val = None
 
+    # set ranges, keep zoomed range if given
+    if not x_range:
+        x_range = [clean_start, clean_stop]
 
-    # get number of unqiue windows for y-values of plotting
-    unique_windows = dataframe["Window"]
-
-    # set ranges
-    x_range = [clean_start, clean_stop]
-
-    # Build graph  
-    fig = px.histogram(
-        dataframe,
-        x="Window",
-        y=[1]*len(unique_windows),
-        nbins=int(clean_stop / window_size),
-        # nbins=len(unique_windows),
-        color="TopologyID",
-        color_discrete_map=color_mapping,
-        hover_data=['Chromosome', 'Window'],
-        barmode='relative',
-        marginal="rug",
-        range_x=x_range,
+    # Build graph from pre-binned counts, rug on top + stacked bars below
+    bar_traces, rug_traces = make_binned_topology_traces(
+        bin_edges,
+        binned_counts,
+        chromosome,
+        color_mapping,
+    )
+    fig = make_subplots(
+        rows=2,
+        cols=1,
+        shared_xaxes=True,
+        row_heights=[0.26, 0.74],
+        vertical_spacing=0.01,
     )
+    for trace in rug_traces:
+        fig.add_trace(trace, row=1, col=1)
+    for trace in bar_traces:
+        fig.add_trace(trace, row=2, col=1)
 
     # Update layout
     fig.update_layout(
         template=template,
+        barmode='relative',
+        bargap=0,
         legend_title_text='Topology',
-        xaxis_title_text='Position',
         margin=dict(
             l=60,
             r=50,
@@ -528,9 +592,11 @@ def make_combined_topology_figure(
     )
     fig.update_xaxes(
         # matches="x",
+        range=x_range,
         rangemode="tozero",
         linewidth=2,
     )
+    fig.update_xaxes(title_text='Position', row=2, col=1)
     fig.update_yaxes(
         nticks=1,
         title="",
@@ -542,16 +608,17 @@ def make_combined_topology_figure(
 
 
 def make_rug_plot_figure(
-    dataframe,
-    max_window_size,
-    window_size,
+    bin_edges,
+    binned_counts,
+    chromosome,
     chromosome_length_info,
     template,
     num_of_graphs_to_plot,
     color_mapping,
+    x_range=None,
 ):
     """
-    NOTE: max_window_size is currently unused. It has been replaced by a bed f with chromosome length info.
+    NOTE: Counts are pre-binned by LoadedDataset.topology_bin_counts, one facet row per TopologyID.
     """
     # Set chromosome info variables
     # NOTE: Strip is used in case there are commas in the number
@@ -564,43 +631,32 @@ def make_rug_plot_figure(
     if clean_stop > 10000000:
         dtick_val = 10000000
         tick_val = 0
-    elif 1000000 < clean_stop < 10000000:  # Between 1 million and 10 million
-        dtick_val = None
-        tick_val = None
-    elif 100000 < clean_stop < 1000000:  # Between 100,000 and 1 million
-        dtick_val = None
-        tick_val = None
-    elif 1000 < clean_stop < 100000:  # Between 1000 and 100,000
-        dtick_val = None
-        tick_val = None
-    elif 100 < clean_stop < 1000:
-        dtick_val = None
-        tick_val = None
-    elif 10 < clean_stop < 100:
-        dtick_val = None
-        tick_val = None
     else:
         dtick_val = None
         tick_val = None
 
-    x_range = [clean_start, clean_stop]
+    if not x_range:
+        x_range = [clean_start, clean_stop]
 
-    fig = px.histogram(
-        dataframe,
-        x="Window",
-        y=[1]*len(dataframe["Window"]),
-        nbins=int(clean_stop / window_size),
-        color="TopologyID",
-        facet_row="TopologyID",
-        color_discrete_map=color_mapping,
-        histfunc="count",
-        barmode='overlay',
-        range_x=x_range,
+    bar_traces, _ = make_binned_topology_traces(
+        bin_edges,
+        binned_counts,
+        chromosome,
+        color_mapping,
+    )
+    fig = make_subplots(
+        rows=max(len(bar_traces), 1),
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.03,
     )
+    for row, trace in enumerate(bar_traces, start=1):
+        fig.add_trace(trace, row=row, col=1)
     fig.update_layout(
         template=template,
+        barmode='overlay',
+        bargap=0,
         legend_title_text='Topology',
-        xaxis_title_text='Position',
         margin=dict(
             l=60,
             r=1,
@@ -616,10 +672,12 @@ def make_rug_plot_figure(
     )
     fig.update_xaxes(
         matches="x",
+        range=x_range,
         rangemode="tozero",
         tick0=tick_val,
         dtick=dtick_val,
     )
+    fig.update_xaxes(title_text='Position', row=max(len(bar_traces), 1), col=1)
     fig.update_yaxes(
         nticks=1,
         title="",
@@ -627,7 +685,6 @@ def make_rug_plot_figure(
         linewidth=2,
         showticklabels=False,
     )
-    fig.for_each_annotation(lambda a: a.update(text=""))
     return fig
 
 
@@ -638,10 +695,17 @@ def make_alt_data_int_figure(
     template,
     num_of_graphs_to_plot,
     chromosome,
+    x_range=None,
 ):
-    # sort dataframe
-    dataframe.sort_values(by=["Window"], inplace=True)
-    y_range_max = max(dataframe[alt_data_to_graph])
+    """
+    dataframe is a Window sorted LoadedDataset.alt_data_summary, summarised
+    levels carry Min/Max columns that are drawn as a band around the mean.
+    """
+    summarised = 'Max' in dataframe.columns
+    if summarised:
+        y_range_max = max(dataframe['Max'], default=0)
+    else:
+        y_range_max = max(dataframe[alt_data_to_graph], default=0)
 
     # Set chromosome info variables
     chrom_cols = [col for col in chromosome_length_info.columns]
@@ -664,14 +728,40 @@ def make_alt_data_int_figure(
     graph_height = (500 // num_of_graphs_to_plot)
 
     # set ranges
-    x_range = [clean_start, clean_stop]
     y_range = [0, y_range_max * 1.1]
 
     # Build graph
-    fig = px.line(
-        dataframe,
-        x="Window",
-        y=alt_data_to_graph,
+    fig = go.Figure()
+    if summarised:
+        fig.add_trace(
+            go.Scatter(
+                x=dataframe['Window'],
+                y=dataframe['Min'],
+                mode='lines',
+                line=dict(width=0),
+                showlegend=False,
+                hoverinfo='skip',
+            )
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=dataframe['Window'],
+                y=dataframe['Max'],
+                mode='lines',
+                line=dict(width=0),
+                fill='tonexty',
+                showlegend=False,
+                hoverinfo='skip',
+            )
+        )
+    fig.add_trace(
+        go.Scatter(
+            x=dataframe['Window'],
+            y=dataframe[alt_data_to_graph],
+            mode='lines',
+            name=str(alt_data_to_graph),
+            showlegend=False,
+        )
     )
     # Update layout
     fig.update_layout(
@@ -692,6 +782,7 @@ def make_alt_data_int_figure(
     )
     fig.update_xaxes(
         title="Position",
+        range=x_range,
         tick0=tick_val,
         # dtick=dtick_val,
     )
@@ -714,6 +805,8 @@ def make_alt_data_str_figure(
     num_of_graphs_to_plot,
     chromosome,
 ):
+    # plotly.express is slow to import, only load it when needed
+    import plotly.express as px
     # sort dataframe
     dataframe.sort_values(by=["Window"], inplace=True)
     dataframe.dropna(inplace=True)
@@ -787,33 +880,79 @@ def make_alt_data_str_figure(
     return fig
 
 
-def make_RF_heatmap(rfdist_df, template, color_mapping):
-    fig = px.bar(
-        rfdist_df,
-        x='index',
-        y='NormRF',
-        color='TopologyID',
-        color_discrete_map=color_mapping,
-        text='NormRF',
-        range_y=[0, 1.2],
+def make_topology_proportion_figure(windows, topologies, proportions, band, template, color_mapping):
+    """
+    Stacked area of the rolling proportion of each TopologyID along a chromosome.
+    """
+    # Stacked traces must share x, so long chromosomes are drawn as the mean
+    # of every step windows, placed at the first window of each bucket
+    step = max(-(-len(windows) // MAX_PROPORTION_POINTS), 1)
+    if (step > 1) and len(windows):
+        bucket_starts = np.arange(0, len(windows), step)
+        counts = np.diff(np.append(bucket_starts, len(windows)))
+        proportions = np.add.reduceat(proportions, bucket_starts, axis=0, dtype=np.float64) / counts[:, None]
+        windows = np.asarray(windows)[bucket_starts]
+    else:
+        proportions = trace_utils.float32_to_float64(proportions)
+    fig = go.Figure()
+    for column, topology in enumerate(topologies):
+        color = color_mapping.get(topology, 'grey') if color_mapping else None
+        fig.add_trace(
+            go.Scatter(
+                x=windows,
+                y=proportions[:, column],
+                mode='lines',
+                name=str(topology),
+                stackgroup='proportions',
+                line=dict(width=0.5, color=color),
+                hovertemplate="Window: %{x}<br>Proportion: %{y:.2f}",
+            )
+        )
+    fig.update_xaxes(title='Position')
+    fig.update_yaxes(
+        title='Proportion',
+        range=[0, 1],
+        fixedrange=True,
     )
-
-    fig.update_traces(
-        textposition='outside', 
-        texttemplate='%{text:.2f}',
+    fig.update_layout(
+        title={
+            'text': f"Topology Proportions ({band} window band)",
+            'y':0.9,
+            'x':0.5,
+            'xanchor': 'center',
+            'yanchor': 'top'
+        },
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        template=template,
     )
-    
-    fig.update_xaxes(
-        dtick=1,
-        title='Window',
-        # NOTE: Replace index labels with Window values
-        tickmode = 'array',
-        tickvals = rfdist_df['index'],
-        ticktext = [str(s) for s in rfdist_df['Window']],
+    return fig
+
+
+def make_RF_track_figure(rf_track, template):
+    """
+    Whole-chromosome normalized RF-distance of each window to its previous
+    window and to the chromosome's most frequent topology.
+    """
+    fig = go.Figure()
+    rf_columns = [('PrevRF', 'Previous window'), ('MajorityRF', 'Most frequent topology')]
+    for column, name in rf_columns:
+        x_data, y_data = trace_utils.downsample_min_max(rf_track['Window'], rf_track[column])
+        fig.add_trace(
+            go.Scattergl(
+                x=x_data,
+                y=y_data,
+                mode='lines',
+                name=name,
+                hovertemplate="Window: %{x}<br>NormRF: %{y:.2f}<extra></extra>",
+            )
         )
+    fig.update_xaxes(title='Position')
+    fig.update_yaxes(
+        title='NormRF',
+        range=[0, 1.05],
+        fixedrange=True,
+    )
     fig.update_layout(
-        # margin=dict(r=1, t=60, b=10),
-        # autosize=True,
         title={
             'text': "Normalized RF-Distance",
             'y':0.9,
@@ -821,6 +960,7 @@ def make_RF_heatmap(rfdist_df, template, color_mapping):
             'xanchor': 'center',
             'yanchor': 'top'
         },
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
         template=template,
     )
     return fig
@@ -828,159 +968,159 @@ def make_RF_heatmap(rfdist_df, template, color_mapping):
 # ---------------------------------------------------------------------------------
 # ----------------------------- Build graph functions -----------------------------
 def build_combined_topology_graph(
-    topology_df,
+    dataset,
     chromosome_length_data,
     chromosome,
     template,
     topology,
     num_of_graphs_to_plot,
     color_mapping,
+    x_range=None,
 ):
     # --- Set up topology data ---
-    # Clean up dataframes and sort
-    topology_df.sort_values(by=["Chromosome", "Window"], inplace=True)
-    topology_df.reset_index(drop=True, inplace=True)
-
-    # Collect needed dataframe metadata before grouping out data
-    topology_max_window_value = max(topology_df["Window"])
-    topology_window_size = abs(topology_df["Window"][1] - topology_df["Window"][0])
-
-    # Filter by chromosome
-    topology_df = topology_df[topology_df["Chromosome"] == chromosome]
-
-    # Clean up dataframes and sort after filter
-    topology_df.sort_values(by=["Chromosome", "Window"], inplace=True)
-    topology_df.reset_index(drop=True, inplace=True)
+    # Dataset is pre-sorted by Chromosome/Window, so only the chromosome's rows are touched
+    topology_window_size = dataset.window_size
 
     # --- Set up chromosome length metadata ---
     chrom_length_df = pd.read_json(chromosome_length_data)
     chrom_length_df = chrom_length_df[chrom_length_df["Chromosome"] == chromosome]
     chrom_length_df.reset_index(drop=True, inplace=True)
 
-    # Group wanted data
-    if (type(topology) == str) or (type(topology) == int):
-        wanted_rows = topology_df[topology_df["TopologyID"] == topology]
-    elif type(topology) == list:
-        wanted_rows = topology_df[topology_df["TopologyID"].isin(topology)]
+    # Bin windows of the wanted topologies server-side
+    chrom_start, chrom_stop = data_utils.fix_bed_file_chroms(
+        chrom_length_df["Start"][0], chrom_length_df["Stop"][0])
+    nbins = int(chrom_stop / topology_window_size) if topology_window_size else 1
+    # Pick zoom pyramid level matching the visible x-range
+    visible_span = (x_range[1] - x_range[0]) if x_range else (chrom_stop - chrom_start)
+    factor = dataset_utils.pick_pyramid_factor(visible_span, topology_window_size)
+    bin_edges, binned_counts = dataset.topology_bin_counts(
+        chromosome,
+        topology,
+        chrom_start,
+        chrom_stop,
+        nbins,
+        factor=factor,
+        x_range=x_range,
+    )
 
     # Create tree graph
     topology_graph_data = make_combined_topology_figure(
-        wanted_rows,
-        topology_max_window_value,
-        topology_window_size,
+        bin_edges,
+        binned_counts,
+        chromosome,
         chrom_length_df,
         template,
         num_of_graphs_to_plot,
         color_mapping,
+        x_range=x_range,
     )
     return topology_graph_data
 
 
 def build_singular_topology_graph(
-    topology_df,
+    dataset,
     chromosome_length_data,
     chromosome,
     template,
     topology,
     num_of_graphs_to_plot,
     color_mapping,
+    x_range=None,
 ):
-
-    # Clean up dataframes and sort
-    topology_df.sort_values(by=["Chromosome", "Window"], inplace=True)
-    topology_df.reset_index(drop=True, inplace=True)
-
-    # Collect needed dataframe metadata before grouping out data
-    # multiply by 1.1 to give a 10% cushion to the end of the graph
-    topology_max_window_value = max(topology_df["Window"])
-    topology_window_size = abs(topology_df["Window"][1] - topology_df["Window"][0])
-
-    # Filter by chromosome
-    topology_df = topology_df[topology_df["Chromosome"] == chromosome]
-
-    # Clean up dataframes and sort after filter
-    topology_df.sort_values(by=["Chromosome", "Window"], inplace=True)
-    topology_df.reset_index(drop=True, inplace=True)
+    # Collect needed dataset metadata before grouping out data
+    topology_window_size = dataset.window_size
 
     # --- Set up chromosome length metadata ---
     chrom_length_df = pd.read_json(chromosome_length_data)
     chrom_length_df = chrom_length_df[chrom_length_df["Chromosome"] == chromosome]
     chrom_length_df.reset_index(drop=True, inplace=True)
 
-    # Group wanted data
-    if (type(topology) == str) or (type(topology) == int):
-        wanted_rows = topology_df[topology_df["TopologyID"] == topology]
-    elif type(topology) == list:
-        wanted_rows = topology_df[topology_df["TopologyID"].isin(topology)]
+    # Bin windows of the wanted topologies server-side
+    chrom_start, chrom_stop = data_utils.fix_bed_file_chroms(
+        chrom_length_df["Start"][0], chrom_length_df["Stop"][0])
+    nbins = int(chrom_stop / topology_window_size) if topology_window_size else 1
+    # Pick zoom pyramid level matching the visible x-range
+    visible_span = (x_range[1] - x_range[0]) if x_range else (chrom_stop - chrom_start)
+    factor = dataset_utils.pick_pyramid_factor(visible_span, topology_window_size)
+    bin_edges, binned_counts = dataset.topology_bin_counts(
+        chromosome,
+        topology,
+        chrom_start,
+        chrom_stop,
+        nbins,
+        factor=factor,
+        x_range=x_range,
+    )
 
     # Create tree graph
     heatmap_graph = make_rug_plot_figure(
-        wanted_rows,
-        topology_max_window_value,
-        topology_window_size,
+        bin_edges,
+        binned_counts,
+        chromosome,
         chrom_length_df,
         template,
         num_of_graphs_to_plot,
         color_mapping,
+        x_range=x_range,
     )
     return heatmap_graph
 
 
 def build_alt_data_graph(
     alt_data_to_graph,
-    tv_input_df,
+    dataset,
     chromosome_length_data,
     chromosome,
     template,
     topology,
     num_of_graphs_to_plot,
+    x_range=None,
 ):
     # Load in DataFrames
     chrom_length_df = pd.read_json(chromosome_length_data)
 
-    # Filter by chromosome
-    tv_input_df = tv_input_df[tv_input_df["Chromosome"] == chromosome]
-
-    # Clean up dataframes and sort after filter
-    tv_input_df.sort_values(by=["Chromosome", "Window", "TopologyID"], inplace=True)
-    tv_input_df.reset_index(drop=True, inplace=True)
+    # Window sorted rows of the chromosome
+    tv_input_df = dataset.chromosome_slice(chromosome)
 
     # Check input type and grapha accordingly
     input_type = type(tv_input_df[alt_data_to_graph].dropna().to_list()[0])
 
     if input_type == str:
+        # Copy as the figure function drops NaNs in place
         alt_data_graph_data = make_alt_data_str_figure(
             alt_data_to_graph,
-            tv_input_df,
+            tv_input_df.copy(),
             chrom_length_df,
             template,
             num_of_graphs_to_plot,
             chromosome,
         )
     else:
+        # Pick zoom pyramid level matching the visible x-range
+        chrom_windows = dataset.chromosome_windows(chromosome)
+        if x_range:
+            visible_span = x_range[1] - x_range[0]
+        else:
+            visible_span = chrom_windows[-1] - chrom_windows[0]
+        factor = dataset_utils.pick_pyramid_factor(visible_span, dataset.window_size)
+        alt_data_summary = dataset.alt_data_summary(
+            chromosome,
+            alt_data_to_graph,
+            factor=factor,
+            x_range=x_range,
+        )
         alt_data_graph_data = make_alt_data_int_figure(
             alt_data_to_graph,
-            tv_input_df,
+            alt_data_summary,
             chrom_length_df,
             template,
             num_of_graphs_to_plot,
             chromosome,
+            x_range=x_range,
         )
     return alt_data_graph_data
 
 
-def build_RF_heatmap(
-    rfdist_df,
-    template,
-    color_mapping,
-):
-    # Reset index and use to get proper window placement
-    rfdist_df.reset_index(inplace=True)
-    # Create figure + return figure
-    heatmap = make_RF_heatmap(rfdist_df, template, color_mapping)
-    return heatmap
-
-
 def no_data_graph(template):
     """This function returns a blank figure with a "NO DATA" watermark"""
     fig = go.Figure()
@@ -1061,11 +1201,9 @@ def init_RF_graph(template):
 # ---------------------------------------------------------------------------------
 # ------------------------- Graph customization functions -------------------------
 
-def set_topology_colors(f, color):
-    df = data_utils.build_file_dataframe(f)  
-    # Set colors to topologies
-    sorted_topologies = df.assign(freq=df.groupby('TopologyID')['TopologyID'].transform('count')).sort_values(by=['freq','TopologyID'],ascending=[False,True]).loc[:,['TopologyID']]
-    unique_topos = sorted_topologies["TopologyID"].unique()
+def set_topology_colors(sorted_topologies, color):
+    # Set colors to topologies, sorted_topologies is most frequent first
+    unique_topos = sorted_topologies
     color_list = color * ((len(unique_topos) // len(color)))
     color_list = color_list + color[:len(unique_topos) % len(color)]
     output_dict = dict()
@@ -1077,7 +1215,11 @@ def set_topology_colors(f, color):
 def get_RFxpos(hoverdata, window_size):
     hoverdata = hoverdata['points'][0]
     if 'customdata' in hoverdata.keys():
-        x_pos = hoverdata['customdata'][1]  # Window position
+        # Window position, either [Chromosome, Window] or Window of pre-binned traces
+        if type(hoverdata['customdata']) == list:
+            x_pos = hoverdata['customdata'][1]
+        else:
+            x_pos = hoverdata['customdata']
         return int(x_pos)
     else:
         x_pos = int(hoverdata['x']) - (window_size/2) + 1
@@ -0,0 +1,86 @@
+/*
+ * Clientside callbacks restyling graphs in the browser, so style only
+ * options (template, font size, line style and snapshot settings) don't need
+ * a server round trip. Figures are copied shallowly, trace data is shared.
+ * Template layouts and color swatches are read from dcc.Stores.
+ */
+(function() {
+    function with_template(figure, template) {
+        if (!figure) {
+            return figure;
+        }
+        var layout = Object.assign({}, figure.layout, {template: template});
+        return Object.assign({}, figure, {layout: layout});
+    }
+
+    function with_snapshot_options(config, options) {
+        config = config || {};
+        var snapshot = Object.assign({}, config.toImageButtonOptions, options);
+        return Object.assign({}, config, {toImageButtonOptions: snapshot});
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        graph_style: {
+            restyle_template: function(template, snapshot_format, figure, config, templates) {
+                if (!figure) {
+                    return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+                }
+                return [
+                    with_template(figure, templates[template]),
+                    with_snapshot_options(config, {format: snapshot_format}),
+                ];
+            },
+
+            restyle_templates: function(template, snapshot_format, figures, configs, templates) {
+                return [
+                    figures.map(function(figure) {
+                        return with_template(figure, templates[template]);
+                    }),
+                    configs.map(function(config) {
+                        return with_snapshot_options(config, {format: snapshot_format});
+                    }),
+                ];
+            },
+
+            restyle_snapshot_formats: function(snapshot_format, configs) {
+                return configs.map(function(config) {
+                    return with_snapshot_options(config, {format: snapshot_format});
+                });
+            },
+
+            // Each p-distance trace stores its swatch color index in meta.color_index
+            restyle_pdistance: function(
+                template, snapshot_format, line_width, line_color, pixel_size, scale, font_size,
+                figure, config, templates, swatches
+            ) {
+                if (!figure) {
+                    return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+                }
+                var colors = swatches[line_color];
+                var data = figure.data.map(function(trace) {
+                    var line = Object.assign({}, trace.line, {width: parseFloat(line_width)});
+                    if (trace.meta && (trace.meta.color_index !== undefined)) {
+                        line.color = colors[trace.meta.color_index];
+                    }
+                    return Object.assign({}, trace, {line: line});
+                });
+                var layout = Object.assign({}, figure.layout, {
+                    template: templates[template],
+                    font: Object.assign({}, figure.layout.font, {size: font_size}),
+                });
+                var pixels = pixel_size.split("x");
+                var snapshot = {
+                    format: snapshot_format,
+                    filename: "Graph_Name",
+                    height: parseInt(pixels[0]),
+                    width: parseInt(pixels[1]),
+                    scale: scale,
+                };
+                return [
+                    Object.assign({}, figure, {data: data, layout: layout}),
+                    with_snapshot_options(config, snapshot),
+                ];
+            },
+        },
+    });
+})();